@@ -2,27 +2,47 @@ import os
 import threading
 import queue
 import time
+BOOT_STARTED = time.perf_counter()  # Referencia para medir el arranque en frío
 import signal
+import hashlib
+from functools import partial
 from datetime import datetime
 from dotenv import load_dotenv
-from openai import OpenAI
 from src.core.agents import run_turn
 from src.security import get_security_prompt, create_threat_detector, security_logger
-from src.core.models import Message
+from src.core.models import Message, ChatMessage
 from src.core.persistence.chat_registry import ChatRegistry
 from src.core.persistence.history_manager import HistoryManager
-from src.core.persistence.memory_consolidator import consolidate_all_histories
-from src.core.persistence.extractor import run_extraction_on_all
+from src.core.persistence.post_session import run_post_session_pipeline, resume_post_session_pipeline
+from src.core.persistence.group_ledger import group_ledger_store
+from src.core.persistence.session_snapshot import SessionSnapshot, write_session_snapshot
+from src.core.persistence.conversation_memory import (
+    ConversationMemoryBuilder, render_memory_context, MEMORY_DIGEST_HEADER, MEMORY_SUMMARIES_HEADER
+)
 from src.core.producers import KeyboardProducer, TelegramProducer
 from src.core.logger import safe_print
+from src.core.performance import performance_logger
+from src.core.maintenance import start_maintenance_worker, notify_activity
+from src.core.jobs import start_background_jobs
+from src.core.llm_gateway import LLMGateway, build_openai_client
+from src.core.llm_cache import LLMResponseCache
+from src.core.tool_encoding import tool_result_encoder
+from src.core.recall_index import recall_index, schedule_history_upsert, schedule_recall_refresh
+
+IMPORTS_DONE = time.perf_counter()
 
 load_dotenv()
 
-# Configuración de la API de OpenAI/DeepSeek
-client = OpenAI(
+# Configuración de la API de OpenAI/DeepSeek: todas las llamadas pasan por el gateway
+# (pool HTTP, plazo, reintentos con jitter, cupo de concurrencia, contabilidad por llamador
+# y caché de respuestas para las llamadas deterministas que la piden)
+# El SDK se importa y el cliente se construye en diferido (ver warm_up en el arranque)
+llm_gateway = LLMGateway(client_factory=partial(
+    build_openai_client,
     api_key=os.getenv("DEEPSEEK_API_KEY"),
     base_url="https://api.deepseek.com"
-)
+), cache=LLMResponseCache.from_env())
+client = llm_gateway.for_caller("live")
 
 # Cola de mensajes centralizada
 message_queue = queue.PriorityQueue()
@@ -49,27 +69,63 @@ TU COMPORTAMIENTO GENERAL:
 
 RECUERDA: La información del perfil es para que TÚ entiendas mejor al usuario, NO para que la reveles."""
 
+IDENTITY_CONTEXT_TEMPLATE = "[CONTEXTO DE IDENTIDAD]: {context}. Usa esta información para saludar o referirte al usuario de forma natural."
+
+# Un snapshot de sesiones solo vale si el prompt del sistema no cambió entre despliegues
+PROMPT_FINGERPRINT = hashlib.sha1(
+    f"{SYSTEM_PROMPT}\n{IDENTITY_CONTEXT_TEMPLATE}\n{MEMORY_DIGEST_HEADER}\n{MEMORY_SUMMARIES_HEADER}".encode("utf-8")
+).hexdigest()
+
+# Sesiones calientes del apagado anterior (se abre en el arranque; None = sin snapshot)
+session_snapshot = None
+
+# Resúmenes incrementales de lo que desaloja la ventana del historial (se crea en el arranque)
+memory_builder = None
+
+def build_session(chat_id):
+    """Construye la sesión en frío: prompt con contexto de identidad + historial de disco."""
+    # Recuperar info del registro para personalizar el saludo/contexto
+    info = ChatRegistry.get_all().get(str(chat_id), {})
+    username = info.get("username", "Usuario")
+    title = info.get("title", "")
+    
+    context_msg = f"Estás hablando con {username}"
+    if info.get("type") == "group":
+        context_msg += f" en el grupo '{title or chat_id}'"
+    
+    # Re-construir el prompt con el contexto dinámico
+    full_prompt = f"{SYSTEM_PROMPT}\n\n{IDENTITY_CONTEXT_TEMPLATE.format(context=context_msg)}"
+    
+    # Cargar historial previo de disco
+    past_history = HistoryManager.load_session_messages(chat_id)
+    session = [ChatMessage("system", full_prompt)]
+    
+    # Memoria jerárquica: resumen de largo plazo + resúmenes de los tramos ya desalojados del historial
+    memory_context = render_memory_context(chat_id)
+    if memory_context:
+        session.append(ChatMessage("system", memory_context))
+    
+    return session + past_history
+
 def get_or_create_session(chat_id):
     with sessions_lock:
         if chat_id not in user_sessions:
-            # Recuperar info del registro para personalizar el saludo/contexto
-            info = ChatRegistry.get_all().get(str(chat_id), {})
-            username = info.get("username", "Usuario")
-            title = info.get("title", "")
-            
-            context_msg = f"Estás hablando con {username}"
-            if info.get("type") == "group":
-                context_msg += f" en el grupo '{title or chat_id}'"
-            
-            # Re-construir el prompt con el contexto dinámico
-            full_prompt = f"{SYSTEM_PROMPT}\n\n[CONTEXTO DE IDENTIDAD]: {context_msg}. Usa esta información para saludar o referirte al usuario de forma natural."
-            
-            # Cargar historial previo de disco
-            past_history = HistoryManager.load_history(chat_id)
-            
-            user_sessions[chat_id] = [{"role": "system", "content": full_prompt}] + past_history
+            # Primero el snapshot del apagado anterior (válido solo si el historial no cambió)
+            session = session_snapshot.take(chat_id) if session_snapshot else None
+            user_sessions[chat_id] = session if session is not None else build_session(chat_id)
         return user_sessions[chat_id]
 
+def refit_session(chat_id):
+    """
+    Tras un desalojo, la sesión en vivo se recorta a lo mismo que quedó en disco
+    (prompt, memoria actualizada, fijados y la cola que cabe en la ventana de tokens).
+    Se modifica en el lugar: el worker sigue usando la misma lista.
+    """
+    with sessions_lock:
+        session = user_sessions.get(chat_id)
+        if session is not None:
+            session[:] = build_session(chat_id)
+
 # --- WORKER PRINCIPAL ---
 
 def main_worker():
@@ -89,6 +145,9 @@ def main_worker():
             if is_new and os.getenv("APP_STATUS") == "development":
                 print(f"[REGISTRO] Nuevo chat descubierto: {chat_id} ({chat_type})")
 
+            # Re-armar el temporizador de inactividad del chat
+            notify_activity(chat_id)
+
             messages = get_or_create_session(chat_id)
             
             if chat_id not in turn_counters:
@@ -108,17 +167,16 @@ def main_worker():
                 send_response(f"[SEGURIDAD] {response}", msg)
                 
                 with sessions_lock:
-                    messages.append({"role": "user", "content": msg.content})
-                    messages.append({
-                        "role": "assistant",
-                        "content": f"[SISTEMA] Amenaza de seguridad detectada: {threat_type}. {response}"
-                    })
+                    messages.append(ChatMessage("user", msg.content))
+                    messages.append(ChatMessage(
+                        "assistant", f"[SISTEMA] Amenaza de seguridad detectada: {threat_type}. {response}"
+                    ))
                 message_queue.task_done()
                 continue
 
             # --- PREPARACIÓN DE HISTORIAL ---
             with sessions_lock:
-                messages.append({"role": "user", "content": msg.content})
+                messages.append(ChatMessage("user", msg.content))
 
             # Ejecutar el turno del Agente
             if os.getenv("APP_STATUS") == "development":
@@ -135,7 +193,11 @@ def main_worker():
             run_turn(turn_counters[chat_id], messages, client, message_context=msg)
             
             # Guardar el historial COMPLETO (incluyendo user y assistant)
-            HistoryManager.save_history(chat_id, messages)
+            if HistoryManager.save_history(chat_id, messages):
+                refit_session(chat_id)
+                if memory_builder:
+                    memory_builder.schedule(chat_id)
+            schedule_history_upsert(chat_id)
 
             turn_counters[chat_id] += 1
             message_queue.task_done()
@@ -149,12 +211,37 @@ def graceful_shutdown(signum=None, frame=None):
     """Handles system signals and performs cleanup."""
     safe_print("\n🛑 Señal de apagado recibida. Ejecutando limpieza...")
     
-    # 1. Extracción de Inteligencia
-    run_extraction_on_all(client)
+    # 1. Extracción de Inteligencia + 2. Consolidación de Memoria
+    # Concurrente por chat y acotado por SHUTDOWN_DEADLINE_SECONDS; lo que no alcance
+    # a procesarse queda registrado y se retoma en el próximo arranque.
+    run_post_session_pipeline(llm_gateway.for_caller("post_session"))
     
-    # 2. Consolidación de Memoria
-    consolidate_all_histories(client)
+    # 3. Snapshot de sesiones calientes (tras la consolidación, para que refleje el historial final)
+    if os.getenv("SESSION_SNAPSHOT", "true").lower() == "true":
+        try:
+            saved = write_session_snapshot(list(user_sessions), build_session, PROMPT_FINGERPRINT)
+            safe_print(f"💾 Snapshot de {saved} sesiones guardado para el próximo arranque.")
+        except Exception as e:
+            safe_print(f"⚠️ No se pudo guardar el snapshot de sesiones: {e}")
+
+    # 4. Índice de recall: escribir la última tanda de upserts (si quedó alguna sin guardar)
+    try:
+        recall_index.flush()
+    except Exception as e:
+        safe_print(f"⚠️ No se pudo guardar el índice de recall: {e}")
+
+    # 5. Volcar los diarios de parches de los ledgers de grupo (deja cada ledger autocontenido)
+    try:
+        group_ledger_store.compact_all()
+    except Exception as e:
+        safe_print(f"⚠️ No se pudieron compactar los ledgers de grupo: {e}")
     
+    safe_print(f"📊 Uso del LLM por llamador: {llm_gateway.stats()}")
+    safe_print(f"📊 Resultados de herramientas (tokens estimados): {tool_result_encoder.stats()}")
+
+    # os._exit() no ejecuta atexit: persistir métricas pendientes explícitamente
+    performance_logger.flush()
+
     safe_print("✅ Limpieza completada. Andrew Martin fuera de línea.")
     os._exit(0)
 
@@ -169,13 +256,23 @@ if __name__ == "__main__":
     print("ANDREW MARTIN - SISTEMA MULTI-CANAL ACTIVADO")
     print("="*70)
     
+    # Importar el SDK del LLM y abrir el cliente fuera del camino crítico del arranque
+    threading.Thread(target=llm_gateway.warm_up, name="llm-warm-up", daemon=True).start()
+    
+    # Sesiones calientes del apagado anterior: solo cabecera e índice; cada chat se lee al usarse
+    if os.getenv("SESSION_SNAPSHOT", "true").lower() == "true":
+        session_snapshot = SessionSnapshot.open(PROMPT_FINGERPRINT)
+        if session_snapshot:
+            print(f"Snapshot de sesiones disponible: {len(session_snapshot)} chats calientes.")
+    
     # --- AUTO-DESCUBRIMIENTO ---
+    # Solo metadatos (tamaño de archivo): los historiales se parsean al llegar el primer mensaje del chat
     active_chats = ChatRegistry.get_all()
     if active_chats:
         print(f"Memoria recuperada: {len(active_chats)} conversaciones previas encontradas.")
         for cid, info in active_chats.items():
-            hist_len = len(HistoryManager.load_history(cid, limit=100))
-            print(f"   - {info['type'].capitalize()}: {cid} ({info['source']}) | Historial: {hist_len} msgs")
+            hist_kb = HistoryManager.history_size(cid) / 1024
+            print(f"   - {info['type'].capitalize()}: {cid} ({info['source']}) | Historial: {hist_kb:.1f} KB")
     else:
         print("Memoria limpia. No se encontraron conversaciones previas.")
     print("="*70 + "\n")
@@ -193,10 +290,26 @@ if __name__ == "__main__":
     for producer in producers:
         producer.start()
     
+    ready = time.perf_counter()
+    performance_logger.log_metric("startup_imports", IMPORTS_DONE - BOOT_STARTED)
+    performance_logger.log_metric("startup_ready", ready - BOOT_STARTED)
+    safe_print(f"⚡ Listo para recibir mensajes en {(ready - BOOT_STARTED) * 1000:.0f} ms "
+               f"(imports: {(IMPORTS_DONE - BOOT_STARTED) * 1000:.0f} ms)")
+    
+    # Pool de trabajos de fondo: se pausa mientras haya mensajes en vivo pendientes o en proceso
+    background_jobs = start_background_jobs(lambda: message_queue.unfinished_tasks)
+    
+    memory_builder = ConversationMemoryBuilder(llm_gateway.for_caller("memory"), background_jobs)
+    
+    # Índice de recall: un refresco completo en segundo plano; luego solo upserts tras cada escritura
+    schedule_recall_refresh()
+    
+    # Retomar un apagado anterior que no alcanzó a terminar
+    resume_post_session_pipeline(llm_gateway.for_caller("post_session"), jobs=background_jobs)
+    
     # Iniciar monitor de mantenimiento (inactividad)
-    from src.core.maintenance import start_maintenance_worker
     inactivity_minutes = int(os.getenv("SESSION_INACTIVITY_MINUTES", "10"))
-    start_maintenance_worker(client, inactivity_minutes)
+    start_maintenance_worker(llm_gateway.for_caller("maintenance"), inactivity_minutes, jobs=background_jobs)
     
     # Mantener el hilo principal vivo
     try:
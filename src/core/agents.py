@@ -1,16 +1,13 @@
 import os
 import json
 import time
-from openai import OpenAI
 from src.core.logger import safe_print
 from src.tools.registry import tool_registry
 from src.core.skill_manager import skill_manager  # Importación activa la herramienta maestra
-from src.core.telegram_utils import escape_html_for_telegram, chunk_telegram_message
-
-def clear_reasoning_content(messages): #Limpia el contenido de 'razonamiento' de los mensajes anteriores. Esto es específico de modelos de razonamiento
-    for message in messages: # Recorre los mensajes
-        if hasattr(message, 'reasoning_content'): # Si el mensaje tiene contenido de razonamiento
-            message.reasoning_content = None # Se limpia el contenido de razonamiento
+from src.core.intent_router import intent_router
+from src.core.models import ChatMessage, to_api_messages
+from src.core.context_compactor import context_compactor
+from src.core.tool_encoding import tool_result_encoder
 
 def send_response(content, context):
     """Envia la respuesta al canal adecuado basado en el contexto."""
@@ -23,7 +20,9 @@ def send_response(content, context):
     if source == 'keyboard':
         print(f"\n[🤖 Andrew]: {content}\n")
     elif source == 'telegram':
+        # Import diferido: solo los chats de Telegram necesitan estos módulos
         from src.tools.telegram_tool import telegram_send
+        from src.core.telegram_utils import escape_html_for_telegram, chunk_telegram_message
         
         # 1. Sanitizar el texto para evitar errores de parseo HTML en Telegram
         sanitized_content = escape_html_for_telegram(content)
@@ -42,16 +41,24 @@ def send_response(content, context):
 
 def run_turn(turn, messages, client, message_context=None):
     sub_turn = 1
+    chat_id = message_context.chat_id if message_context else None
+    # Activar por adelantado los skills que el mensaje probablemente necesita
+    predicted_skills = intent_router.preactivate(message_context)
+    used_skills = set()
+    # Razonamiento y salidas grandes de turnos anteriores no se re-envían completos
+    context_compactor.compact(messages)
     while True:
+        # Solo los esquemas de los skills activos en este chat (bundle cacheado por combinación)
+        tools = skill_manager.get_tool_list(chat_id)
         response = client.chat.completions.create(
             model='deepseek-chat',
-            messages=messages,
-            tools=tool_registry.get_tool_list(),
+            messages=to_api_messages(messages),
+            tools=tools,
             extra_body={ "thinking": { "type": "enabled" } }
         )
         
         assistant_msg = response.choices[0].message
-        messages.append(assistant_msg)
+        messages.append(ChatMessage.from_api(assistant_msg))
 
         # --- DEBUG: Ver el estado del pensamiento (Solo en development) ---
         if os.getenv("APP_STATUS") == "development":
@@ -59,7 +66,7 @@ def run_turn(turn, messages, client, message_context=None):
             content = assistant_msg.content
             tool_calls = assistant_msg.tool_calls
             
-            print(f"\033[33m[DEBUG] Turno {turn}.{sub_turn}\033[0m")
+            print(f"\033[33m[DEBUG] Turno {turn}.{sub_turn} | tools v{tools.version} ({len(tools)} herramientas, {tools.size_bytes} bytes)\033[0m")
             if reasoning:
                 safe_print(f"\033[36m[🧠 RAZONAMIENTO]:\n{reasoning}\033[0m\n")
             if content:
@@ -75,11 +82,19 @@ def run_turn(turn, messages, client, message_context=None):
         tool_calls = assistant_msg.tool_calls
         
         if tool_calls is None:
+            if message_context:
+                intent_router.record_outcome(predicted_skills, used_skills)
             break
             
+        tool_call_map = tool_registry.get_tool_call_map()
         for tool in tool_calls:
-            tool_function = tool_registry.get_tool_call_map()[tool.function.name]
+            tool_function = tool_call_map[tool.function.name]
+            skill_manager.note_tool_use(chat_id, tool.function.name)
             args = json.loads(tool.function.arguments)
+            if tool.function.name == "request_skill_activation":
+                used_skills.add(args.get("skill_name"))  # Vuelta extra que el router no evitó
+            elif skill_manager.skill_for_tool(tool.function.name):
+                used_skills.add(skill_manager.skill_for_tool(tool.function.name))
             
             if message_context:
                 args['context'] = message_context
@@ -89,9 +104,6 @@ def run_turn(turn, messages, client, message_context=None):
             except Exception as e:
                 tool_result = f"Error ejecutando herramienta: {str(e)}"
             
-            messages.append({
-                "role": "tool",
-                "tool_call_id": tool.id,
-                "content": str(tool_result),
-            })
+            messages.append(ChatMessage("tool", tool_result_encoder.encode(tool.function.name, tool_result),
+                                        tool_call_id=tool.id))
         sub_turn += 1
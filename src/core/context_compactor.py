@@ -0,0 +1,81 @@
+import os
+from typing import Dict, List, Optional
+from src.core.models import ChatMessage
+from src.core.performance import performance_logger
+
+DIGEST_MARKER = "[salida compactada]"
+
+def clear_reasoning_content(messages): #Limpia el contenido de 'razonamiento' de los mensajes anteriores. Esto es específico de modelos de razonamiento
+    for message in messages: # Recorre los mensajes
+        if hasattr(message, 'reasoning_content'): # Si el mensaje tiene contenido de razonamiento
+            message.reasoning_content = None # Se limpia el contenido de razonamiento
+
+def _last_user_index(messages) -> int:
+    for i in range(len(messages) - 1, -1, -1):
+        m = messages[i]
+        role = m.get("role") if isinstance(m, dict) else getattr(m, "role", None)
+        if role == "user":
+            return i
+    return 0
+
+def _tool_names(messages) -> Dict[str, str]:
+    names = {}
+    for m in messages:
+        if isinstance(m, ChatMessage) and m.tool_calls:
+            for call_id, name, _ in m.tool_calls:
+                names[call_id] = name
+    return names
+
+def digest_tool_output(name: Optional[str], content: str, preview_chars: int) -> str:
+    """Resumen corto de una salida ya consumida: herramienta, tamaño y un extracto."""
+    excerpt = " ".join(content[:preview_chars].split())
+    return f"{DIGEST_MARKER} {name or 'herramienta'}: {len(content)} caracteres. Extracto: {excerpt}…"
+
+class ContextCompactor:
+    """
+    Compacta el contexto de turnos anteriores antes de volver a enviarlo al LLM:
+    - Quita el `reasoning_content` de los mensajes previos al último mensaje del usuario
+      (el razonamiento del turno en curso se conserva).
+    - Sustituye salidas de herramientas grandes de turnos anteriores (ya consumidas por el
+      modelo) por un resumen corto con DIGEST_MARKER.
+    Solo modifica los ChatMessage de la sesión, así el ahorro se mantiene en sub-turnos siguientes.
+    """
+
+    def __init__(self, digest_threshold_chars: Optional[int] = None, preview_chars: Optional[int] = None):
+        self.digest_threshold_chars = digest_threshold_chars if digest_threshold_chars is not None else \
+            int(os.getenv("CONTEXT_DIGEST_THRESHOLD_CHARS", "1500"))
+        self.preview_chars = preview_chars if preview_chars is not None else \
+            int(os.getenv("CONTEXT_DIGEST_PREVIEW_CHARS", "200"))
+
+    def compact(self, messages: List) -> Dict[str, int]:
+        turn_start = _last_user_index(messages)
+        previous = messages[:turn_start]
+        stats = {"reasoning_cleared": 0, "tool_outputs_digested": 0, "chars_saved": 0}
+
+        for m in previous:
+            reasoning = getattr(m, "reasoning_content", None)
+            if reasoning:
+                stats["reasoning_cleared"] += 1
+                stats["chars_saved"] += len(reasoning)
+        clear_reasoning_content(previous)
+
+        names = None
+        for m in previous:
+            if not isinstance(m, ChatMessage) or m.role != "tool":
+                continue
+            content = m.content or ""
+            if len(content) <= self.digest_threshold_chars or content.startswith(DIGEST_MARKER):
+                continue
+            if names is None:
+                names = _tool_names(previous)
+            digest = digest_tool_output(names.get(m.tool_call_id), content, self.preview_chars)
+            m.content = digest
+            stats["tool_outputs_digested"] += 1
+            stats["chars_saved"] += len(content) - len(digest)
+
+        if stats["chars_saved"]:
+            performance_logger.log_metric("context_compaction", 0.0, stats)
+        return stats
+
+# Instancia global
+context_compactor = ContextCompactor()
@@ -0,0 +1,109 @@
+import re
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Set
+from src.core.skill_manager import SKILL_MAP, skill_manager
+from src.core.utils import normalize_text, debug_print
+from src.core.performance import performance_logger
+
+# Palabras clave por skill (texto ya normalizado: minúsculas y sin tildes).
+# Un "*" final indica prefijo: "busc*" cubre buscar, busca, búsqueda...
+SKILL_KEYWORDS: Dict[str, List[str]] = {
+    "web": [
+        "busc*", "internet", "web", "google", "noticia*", "investig*", "articulo*",
+        "pagina*", "enlace*", "link*", "url", "http*", "www*", "sitio web",
+    ],
+    "social": [
+        "telegram", "grupo*", "usuario*", "perfil*", "ledger*", "secreto", "mis datos",
+        "quien soy", "registr*", "envia*", "manda*", "mensaje a", "contacto*",
+    ],
+    "utility": [
+        "hora", "horas", "fecha", "que dia", "zona horaria",
+        "clima", "temperatura", "llov*", "lluvia*", "pronostico",
+        "ciudad*", "restaurante*", "museo*", "parque*", "turis*", "visitar", "comer",
+        "lugar*", "archivo*", "editar",
+    ],
+    "system": [
+        "chats activos", "conversaciones activas", "con quien has hablado",
+        "que grupos conoces", "estado del sistema",
+    ],
+    "memory": [
+        "recuerd*", "acuerdas", "dijiste", "te dije", "mencion*", "hablamos",
+        "la vez pasada", "la otra vez",
+    ],
+}
+
+_URL_PATTERN = re.compile(r"https?://|www\.")
+
+def _compile(keywords: Iterable[str]) -> re.Pattern:
+    parts = [re.escape(k[:-1]) + r"\w*" if k.endswith("*") else re.escape(k) for k in keywords]
+    # Una sola alternancia por skill: el motor de regex la recorre como un trie
+    return re.compile(r"\b(?:" + "|".join(sorted(parts, key=len, reverse=True)) + r")\b")
+
+class IntentRouter:
+    """
+    Predice qué skills necesitará un mensaje antes de la primera llamada al LLM,
+    para activarlos por adelantado y ahorrar la vuelta de `request_skill_activation`.
+
+    - Reglas de palabras clave (SKILL_KEYWORDS) compiladas por cada skill de SKILL_MAP.
+    - Clasificadores opcionales: callables `content -> iterable de skills`.
+    - Al cerrar el turno se comparan predicción y uso real (aciertos, fallos y
+      falsos positivos) y se registran en el log de rendimiento.
+    """
+
+    def __init__(self, keywords: Optional[Dict[str, List[str]]] = None,
+                 classifiers: Optional[List[Callable[[str], Iterable[str]]]] = None):
+        keywords = SKILL_KEYWORDS if keywords is None else keywords
+        self.patterns = {skill: _compile(words) for skill, words in keywords.items() if skill in SKILL_MAP and words}
+        self.classifiers = list(classifiers or [])
+        self.stats = {"turns": 0, "hits": 0, "misses": 0, "false_positives": 0}
+        self._lock = threading.Lock()
+
+    def predict(self, content: str) -> Set[str]:
+        if not content:
+            return set()
+        text = normalize_text(content)
+        skills = {skill for skill, pattern in self.patterns.items() if pattern.search(text)}
+        if _URL_PATTERN.search(content):
+            skills.add("web")
+        for classifier in self.classifiers:
+            try:
+                skills.update(s for s in classifier(content) if s in SKILL_MAP)
+            except Exception as e:
+                debug_print(f"⚠️ [ROUTER] Clasificador falló: {e}")
+        return skills
+
+    def preactivate(self, message_context) -> Set[str]:
+        """Activa en el chat del mensaje los skills predichos; devuelve la predicción."""
+        if message_context is None:
+            return set()
+        predicted = self.predict(message_context.content)
+        for skill in predicted:
+            skill_manager.activate_skill(skill, chat_id=message_context.chat_id)
+        if predicted:
+            debug_print(f"🧭 [ROUTER] Skills pre-activados: {', '.join(sorted(predicted))}")
+        return predicted
+
+    def record_outcome(self, predicted: Set[str], used: Set[str]):
+        """`used`: skills cuyas herramientas se llamaron o que el modelo pidió activar en el turno."""
+        hits = len(predicted & used)
+        misses = len(used - predicted)
+        false_positives = len(predicted - used)
+        with self._lock:
+            self.stats["turns"] += 1
+            self.stats["hits"] += hits
+            self.stats["misses"] += misses
+            self.stats["false_positives"] += false_positives
+        performance_logger.log_metric("intent_router", 0.0, {
+            "predicted": sorted(predicted), "used": sorted(used),
+            "hits": hits, "misses": misses, "false_positives": false_positives,
+            "hit_rate": self.hit_rate()
+        })
+
+    def hit_rate(self) -> float:
+        """Fracción de skills necesarios que el router ya había activado."""
+        with self._lock:
+            needed = self.stats["hits"] + self.stats["misses"]
+            return round(self.stats["hits"] / needed, 4) if needed else 1.0
+
+# Instancia global
+intent_router = IntentRouter()
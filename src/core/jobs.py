@@ -0,0 +1,144 @@
+import itertools
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import nullcontext
+from typing import Callable, Dict, List, Optional
+from src.core.logger import safe_print
+from src.core.utils import KeyedLock
+
+# Prioridades dentro del pool de fondo (menor = antes). El tráfico en vivo no pasa
+# por aquí: siempre va antes que cualquier trabajo de este pool.
+JOB_PRIORITY_HIGH = 1
+JOB_PRIORITY_NORMAL = 5
+JOB_PRIORITY_LOW = 9
+
+_STOP = -1  # Los centinelas de parada se adelantan a cualquier trabajo pendiente
+
+class BackgroundJobPool:
+    """
+    Pool propio para trabajo de fondo (extracción, consolidación, reanudaciones...).
+
+    - Concurrencia acotada a `max_workers` hilos, separados del worker principal.
+    - Antes de arrancar cada trabajo se consulta `backlog_probe()` (mensajes en vivo
+      pendientes o en proceso); mientras supere `backlog_threshold`, el pool se pausa.
+      Un trabajo ya iniciado no se interrumpe, pero no empieza ninguno nuevo.
+    - Los trabajos con la misma `key` se coalescen mientras esperan en cola y nunca
+      se ejecutan a la vez (p. ej. dos mantenimientos del mismo chat).
+    """
+
+    def __init__(self, max_workers: Optional[int] = None, backlog_threshold: Optional[int] = None,
+                 backlog_probe: Optional[Callable[[], int]] = None, poll_seconds: float = 0.25):
+        self.max_workers = max_workers or int(os.getenv("BACKGROUND_JOB_WORKERS", "2"))
+        if backlog_threshold is None:
+            backlog_threshold = int(os.getenv("BACKGROUND_PAUSE_BACKLOG", "0"))
+        self.backlog_threshold = backlog_threshold
+        self.backlog_probe = backlog_probe or (lambda: 0)
+        self.poll_seconds = poll_seconds
+        self.running = False
+        self.stats = {"submitted": 0, "coalesced": 0, "completed": 0, "failed": 0, "paused_seconds": 0.0}
+        self._queue = queue.PriorityQueue()
+        self._seq = itertools.count()
+        self._queued: Dict[str, Future] = {}
+        self._key_locks = KeyedLock()
+        self._guard = threading.Lock()
+        self._threads: List[threading.Thread] = []
+
+    def start(self):
+        if self.running:
+            return
+        self.running = True
+        for i in range(self.max_workers):
+            thread = threading.Thread(target=self._worker_loop, name=f"background-job-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout: float = 5):
+        """Detiene los hilos; los trabajos que seguían en cola quedan cancelados."""
+        self.running = False
+        for _ in self._threads:
+            self._queue.put((_STOP, next(self._seq), None))
+        for thread in self._threads:
+            thread.join(timeout=timeout)
+        self._threads = []
+        while True:
+            try:
+                _, _, job = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if job is not None:
+                job[4].cancel()
+        with self._guard:
+            self._queued.clear()
+
+    def submit(self, fn: Callable, *args, key: Optional[str] = None,
+               priority: int = JOB_PRIORITY_NORMAL, **kwargs) -> Future:
+        """Encola un trabajo; si ya hay uno en cola con la misma `key`, devuelve su Future."""
+        with self._guard:
+            if key is not None and key in self._queued:
+                self.stats["coalesced"] += 1
+                return self._queued[key]
+            future = Future()
+            if key is not None:
+                self._queued[key] = future
+            self.stats["submitted"] += 1
+        self._queue.put((priority, next(self._seq), (fn, args, kwargs, key, future)))
+        return future
+
+    def live_backlog(self) -> int:
+        try:
+            return int(self.backlog_probe())
+        except Exception:
+            return 0
+
+    def is_paused(self) -> bool:
+        return self.live_backlog() > self.backlog_threshold
+
+    def _wait_for_quiet(self):
+        """Bloquea mientras el tráfico en vivo supere el umbral."""
+        if not self.is_paused():
+            return
+        start = time.monotonic()
+        while self.running and self.is_paused():
+            time.sleep(self.poll_seconds)
+        with self._guard:
+            self.stats["paused_seconds"] += time.monotonic() - start
+
+    def _worker_loop(self):
+        while True:
+            _, _, job = self._queue.get()
+            if job is None:
+                break
+            self._wait_for_quiet()
+            fn, args, kwargs, key, future = job
+            with self._guard:
+                # A partir de aquí, un nuevo envío con la misma clave se encola aparte
+                if key is not None and self._queued.get(key) is future:
+                    del self._queued[key]
+            if not self.running:
+                future.cancel()
+                break
+            if not future.set_running_or_notify_cancel():
+                continue
+            with (self._key_locks(key) if key is not None else nullcontext()):
+                try:
+                    future.set_result(fn(*args, **kwargs))
+                    outcome = "completed"
+                except Exception as e:
+                    safe_print(f"❌ [JOBS] Error en trabajo de fondo {key or getattr(fn, '__name__', fn)}: {e}")
+                    future.set_exception(e)
+                    outcome = "failed"
+            with self._guard:
+                self.stats[outcome] += 1
+
+# Instancia global (se arranca en main.py con la sonda de la cola en vivo)
+background_jobs = BackgroundJobPool()
+
+def start_background_jobs(backlog_probe: Optional[Callable[[], int]] = None) -> BackgroundJobPool:
+    """Conecta la sonda de tráfico en vivo y arranca el pool global."""
+    if backlog_probe is not None:
+        background_jobs.backlog_probe = backlog_probe
+    background_jobs.start()
+    return background_jobs
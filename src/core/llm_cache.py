@@ -0,0 +1,131 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Optional
+from src.core.logger import safe_print
+
+# Parámetros que no cambian la respuesta y por tanto no forman parte de la clave
+_NON_SEMANTIC_PARAMS = {"timeout", "extra_headers"}
+
+# Marca que deja read_ledger cuando entrega el perfil privado verificado
+_PRIVATE_LEDGER_MARKERS = ('"scope_delivered": "PRIVATE"', '"scope_delivered":"PRIVATE"')
+
+def _jsonable(value):
+    """Mensajes del SDK (pydantic) -> dict; el resto se deja a json.dumps."""
+    if hasattr(value, "model_dump"):
+        return value.model_dump(exclude_none=True)
+    return str(value)
+
+def make_cache_key(kwargs: dict) -> str:
+    """Hash estable de modelo + mensajes + herramientas + parámetros."""
+    tools = kwargs.get("tools")
+    payload = {
+        "model": kwargs.get("model"),
+        "messages": kwargs.get("messages"),
+        # Un ToolSchemaBundle ya trae el hash de su contenido: no se re-serializa
+        "tools": getattr(tools, "version", tools),
+        "params": {k: v for k, v in kwargs.items()
+                   if k not in ("model", "messages", "tools") and k not in _NON_SEMANTIC_PARAMS},
+    }
+    raw = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=_jsonable)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+def contains_private_ledger_data(messages) -> bool:
+    """True si algún mensaje trae el perfil privado entregado por read_ledger."""
+    for msg in messages or []:
+        content = msg.get("content") if isinstance(msg, dict) else getattr(msg, "content", None)
+        if isinstance(content, str) and any(marker in content for marker in _PRIVATE_LEDGER_MARKERS):
+            return True
+    return False
+
+class LLMResponseCache:
+    """
+    Caché exacta de respuestas del LLM: LRU acotada por `max_entries`, con TTL y
+    persistencia opcional en disco (`persist_path`, escritura atómica).
+    En memoria se guarda el objeto de respuesta tal cual, así un acierto no cuesta
+    más que un lookup en un dict.
+    """
+
+    def __init__(self, max_entries: int = 256, ttl_seconds: float = 86400, persist_path: Optional[str] = None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.persist_path = persist_path
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()  # key -> (expires_at, response)
+        self._lock = threading.Lock()
+        if persist_path:
+            self._load()
+
+    @classmethod
+    def from_env(cls) -> "LLMResponseCache":
+        return cls(
+            max_entries=int(os.getenv("LLM_CACHE_MAX_ENTRIES", "256")),
+            ttl_seconds=float(os.getenv("LLM_CACHE_TTL_SECONDS", "86400")),
+            persist_path=os.getenv("LLM_CACHE_PATH") or None,
+        )
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.time():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key: str, response: Any):
+        with self._lock:
+            self._entries[key] = (time.time() + self.ttl_seconds, response)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            if self.persist_path:
+                self._save_locked()
+
+    # --- Persistencia ---
+    @staticmethod
+    def _dump_response(response) -> dict:
+        return response.model_dump() if hasattr(response, "model_dump") else response
+
+    @staticmethod
+    def _restore_response(data):
+        try:
+            from openai.types.chat import ChatCompletion
+            return ChatCompletion.model_validate(data)
+        except Exception:
+            return data
+
+    def _save_locked(self):
+        try:
+            os.makedirs(os.path.dirname(self.persist_path) or ".", exist_ok=True)
+            tmp_path = f"{self.persist_path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump([[key, expires_at, self._dump_response(response)]
+                           for key, (expires_at, response) in self._entries.items()], f, ensure_ascii=False)
+            os.replace(tmp_path, self.persist_path)
+        except (TypeError, ValueError, OSError) as e:
+            safe_print(f"⚠️ [LLM CACHE] No se pudo persistir la caché: {e}")
+
+    def _load(self):
+        if not os.path.exists(self.persist_path):
+            return
+        try:
+            with open(self.persist_path, "r", encoding="utf-8") as f:
+                rows = json.load(f)
+        except Exception as e:
+            safe_print(f"⚠️ [LLM CACHE] Caché en disco ilegible, se ignora: {e}")
+            return
+        now = time.time()
+        for key, expires_at, data in rows[-self.max_entries:]:
+            if expires_at > now:
+                self._entries[key] = (expires_at, self._restore_response(data))
@@ -0,0 +1,240 @@
+import os
+import random
+import threading
+import time
+from typing import Callable, Dict, Optional, Tuple, TYPE_CHECKING
+from src.core.logger import safe_print
+from src.core.performance import performance_logger
+from src.core.llm_cache import LLMResponseCache, make_cache_key, contains_private_ledger_data
+
+if TYPE_CHECKING:
+    from openai import OpenAI
+
+_retryable_errors: Optional[Tuple[type, ...]] = None
+
+def retryable_errors() -> Tuple[type, ...]:
+    """Errores transitorios: 429, 5xx, timeouts y fallos de conexión (import diferido del SDK)."""
+    global _retryable_errors
+    if _retryable_errors is None:
+        from openai import APIConnectionError, APITimeoutError, InternalServerError, RateLimitError
+        _retryable_errors = (RateLimitError, APITimeoutError, APIConnectionError, InternalServerError)
+    return _retryable_errors
+
+class LLMGatewayError(Exception):
+    """El gateway no obtuvo respuesta dentro del plazo (cupo de concurrencia o reintentos agotados)."""
+
+def build_openai_client(api_key: Optional[str] = None, base_url: Optional[str] = None) -> "OpenAI":
+    """
+    Cliente OpenAI/DeepSeek con un pool HTTP dimensionado para el paralelismo del bot.
+    Los reintentos del SDK se desactivan: la política de reintentos vive en LLMGateway.
+    """
+    from openai import OpenAI
+
+    kwargs = {
+        "api_key": api_key or os.getenv("DEEPSEEK_API_KEY"),
+        "base_url": base_url or os.getenv("DEEPSEEK_BASE_URL", "https://api.deepseek.com"),
+        "max_retries": 0,
+    }
+    try:
+        import httpx
+        from openai import DefaultHttpxClient
+        connections = int(os.getenv("LLM_POOL_CONNECTIONS", "10"))
+        kwargs["http_client"] = DefaultHttpxClient(limits=httpx.Limits(
+            max_connections=connections,
+            max_keepalive_connections=connections,
+            keepalive_expiry=float(os.getenv("LLM_POOL_KEEPALIVE_SECONDS", "30")),
+        ))
+    except ImportError:
+        pass  # Sin httpx directo: se usa el pool por defecto del SDK
+    return OpenAI(**kwargs)
+
+class _Completions:
+    def __init__(self, gateway: "LLMGateway", caller: str):
+        self._gateway = gateway
+        self._caller = caller
+
+    def create(self, cache: bool = False, **kwargs):
+        return self._gateway.create(self._caller, cache=cache, **kwargs)
+
+class _Chat:
+    def __init__(self, gateway: "LLMGateway", caller: str):
+        self.completions = _Completions(gateway, caller)
+
+class LLMClientView:
+    """
+    Vista con la misma forma que OpenAI (`client.chat.completions.create`) para un llamador.
+    Permite pasarla a run_turn, extractores, etc. sin cambiar su código.
+    """
+    def __init__(self, gateway: "LLMGateway", caller: str):
+        self.gateway = gateway
+        self.caller = caller
+        self.chat = _Chat(gateway, caller)
+
+class LLMGateway:
+    """
+    Punto único de salida hacia el LLM.
+
+    - Cupo de llamadas simultáneas (`max_in_flight`), compartido por todos los llamadores.
+      Los llamadores en vivo (`live_callers`) tienen prioridad al liberarse un cupo y
+      `reserved_live_slots` cupos que el trabajo de fondo nunca ocupa.
+    - Plazo por solicitud (`deadline_seconds`) que cubre espera de cupo, reintentos y timeout HTTP.
+    - Reintento exponencial con jitter completo ante 429/5xx/timeouts/conexión.
+    - Contabilidad por llamador: llamadas, errores, reintentos, tokens y latencia.
+    - Caché de respuestas opcional (`cache`), usada solo cuando la llamada lo pide
+      con `cache=True` y nunca si los mensajes traen datos privados del ledger.
+    - Sin `client`, el SDK se importa y el cliente se construye en el primer uso (o en
+      `warm_up()`), para no cargar el SDK durante el arranque.
+    """
+
+    def __init__(self, client: Optional["OpenAI"] = None, max_in_flight: Optional[int] = None,
+                 deadline_seconds: Optional[float] = None, max_retries: Optional[int] = None,
+                 base_delay: Optional[float] = None, max_delay: Optional[float] = None,
+                 cache: Optional[LLMResponseCache] = None, sleep: Callable[[float], None] = time.sleep,
+                 client_factory: Optional[Callable[[], "OpenAI"]] = None,
+                 reserved_live_slots: Optional[int] = None, live_callers: Tuple[str, ...] = ("live",)):
+        self._client = client
+        self._client_factory = client_factory or build_openai_client
+        self._client_lock = threading.Lock()
+        self.cache = cache
+        self.max_in_flight = max_in_flight or int(os.getenv("LLM_MAX_IN_FLIGHT", "4"))
+        self.deadline_seconds = deadline_seconds if deadline_seconds is not None else float(os.getenv("LLM_DEADLINE_SECONDS", "90"))
+        self.max_retries = max_retries if max_retries is not None else int(os.getenv("LLM_MAX_RETRIES", "3"))
+        self.base_delay = base_delay if base_delay is not None else float(os.getenv("LLM_RETRY_BASE_SECONDS", "0.5"))
+        self.max_delay = max_delay if max_delay is not None else float(os.getenv("LLM_RETRY_MAX_SECONDS", "8"))
+        self._sleep = sleep
+        if reserved_live_slots is None:
+            reserved_live_slots = int(os.getenv("LLM_RESERVED_LIVE_SLOTS", "1"))
+        # Con un solo cupo no se puede reservar: el fondo lo comparte, pero cede ante el vivo
+        self.background_limit = max(1, self.max_in_flight - reserved_live_slots)
+        self.live_callers = frozenset(live_callers)
+        self._slots = threading.Condition()
+        self._in_flight = 0
+        self._live_waiting = 0
+        self._stats: Dict[str, Dict[str, float]] = {}
+        self._stats_lock = threading.Lock()
+
+    @property
+    def client(self) -> "OpenAI":
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    self._client = self._client_factory()
+        return self._client
+
+    def warm_up(self):
+        """Construye el cliente (e importa el SDK) por adelantado, p. ej. en un hilo tras el arranque."""
+        self.client
+        retryable_errors()
+
+    def for_caller(self, caller: str) -> LLMClientView:
+        return LLMClientView(self, caller)
+
+    # --- Contabilidad ---
+    def _account(self, caller: str, **deltas):
+        with self._stats_lock:
+            entry = self._stats.setdefault(caller, {
+                "calls": 0, "errors": 0, "retries": 0, "cache_hits": 0,
+                "prompt_tokens": 0, "completion_tokens": 0, "latency_seconds": 0.0
+            })
+            for name, value in deltas.items():
+                entry[name] += value
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        with self._stats_lock:
+            return {caller: dict(entry) for caller, entry in self._stats.items()}
+
+    # --- Cupo de concurrencia ---
+    def _acquire_slot(self, caller: str, timeout: float) -> bool:
+        live = caller in self.live_callers
+        limit = self.max_in_flight if live else self.background_limit
+        with self._slots:
+            if live:
+                self._live_waiting += 1
+            try:
+                acquired = self._slots.wait_for(
+                    lambda: self._in_flight < limit and (live or not self._live_waiting), timeout)
+                if acquired:
+                    self._in_flight += 1
+                return acquired
+            finally:
+                if live:
+                    self._live_waiting -= 1
+                    self._slots.notify_all()
+
+    def _release_slot(self):
+        with self._slots:
+            self._in_flight -= 1
+            self._slots.notify_all()
+
+    # --- Reintentos ---
+    def _backoff(self, attempt: int, error: Exception) -> float:
+        """Jitter completo sobre el exponencial; respeta Retry-After si el servidor lo envía."""
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+        response = getattr(error, "response", None)
+        retry_after = getattr(response, "headers", {}).get("retry-after") if response is not None else None
+        try:
+            delay = max(delay, float(retry_after)) if retry_after else delay
+        except ValueError:
+            pass
+        return min(delay, self.max_delay)
+
+    def create(self, caller: str, cache: bool = False, **kwargs):
+        """Equivalente a client.chat.completions.create con cupo, plazo, reintentos y caché opcional."""
+        cache_key = None
+        if cache and self.cache is not None and not contains_private_ledger_data(kwargs.get("messages")):
+            cache_key = make_cache_key(kwargs)
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                self._account(caller, cache_hits=1)
+                return cached
+
+        start = time.monotonic()
+        deadline = start + self.deadline_seconds
+        attempt = 0
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not self._acquire_slot(caller, remaining):
+                self._account(caller, errors=1)
+                raise LLMGatewayError(f"[{caller}] sin cupo de LLM dentro del plazo ({self.deadline_seconds:.0f}s)")
+            try:
+                request_timeout = max(0.1, deadline - time.monotonic())
+                response = self.client.chat.completions.create(timeout=request_timeout, **kwargs)
+            except Exception as e:
+                if not isinstance(e, retryable_errors()):
+                    self._account(caller, errors=1)
+                    raise
+                delay = self._backoff(attempt, e)
+                if attempt >= self.max_retries or time.monotonic() + delay >= deadline:
+                    self._account(caller, errors=1)
+                    raise
+                attempt += 1
+                self._account(caller, retries=1)
+                safe_print(f"⚠️ [LLM] {caller}: {type(e).__name__}, reintento {attempt}/{self.max_retries} en {delay:.2f}s")
+            else:
+                elapsed = time.monotonic() - start
+                usage = getattr(response, "usage", None)
+                prompt_tokens = getattr(usage, "prompt_tokens", 0) or 0
+                completion_tokens = getattr(usage, "completion_tokens", 0) or 0
+                self._account(caller, calls=1, latency_seconds=elapsed,
+                              prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
+                performance_logger.log_metric(f"llm:{caller}", elapsed, {
+                    "model": kwargs.get("model"), "retries": attempt,
+                    "tools_version": getattr(kwargs.get("tools"), "version", None),
+                    "prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens
+                })
+                if cache_key is not None:
+                    self.cache.put(cache_key, response)
+                return response
+            finally:
+                self._release_slot()
+            # El cupo se libera durante la espera para no bloquear a otros llamadores
+            self._sleep(delay)
+
+def create_completion(client, cache: bool = False, **kwargs):
+    """
+    Llamada de chat con caché opt-in. Solo el gateway cachea: con un cliente OpenAI
+    directo (scripts, pruebas) la llamada se hace tal cual.
+    """
+    if isinstance(client, LLMClientView):
+        return client.chat.completions.create(cache=cache, **kwargs)
+    return client.chat.completions.create(**kwargs)
@@ -1,85 +1,126 @@
-import os
+import heapq
 import time
 import threading
 from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple, TYPE_CHECKING
 from src.core.logger import safe_print
-from openai import OpenAI
 from src.core.persistence.chat_registry import ChatRegistry
-from src.core.persistence.extractor import IntelligenceExtractor
-from src.core.persistence.memory_consolidator import MemoryConsolidator
+from src.core.persistence.session_maintainer import maintain_chat
+from src.core.jobs import BackgroundJobPool
+
+if TYPE_CHECKING:
+    from openai import OpenAI
 
 class SessionMaintenanceWorker:
-    """Background worker that monitors chat sessions and triggers cleanup on inactivity."""
-    
-    def __init__(self, client: OpenAI, inactivity_minutes=10, check_interval_seconds=60):
+    """
+    Background worker that triggers cleanup exactly when a chat becomes inactive.
+
+    Each chat has a deadline (last activity + inactivity threshold) stored in a min-heap.
+    `touch()` re-arms the chat on every message in O(log n); stale heap entries are
+    discarded lazily through a per-chat version number. The thread sleeps until the
+    earliest deadline (or indefinitely when there are no chats), so it costs nothing
+    while idle, and a chat that becomes active again is maintained again next time.
+
+    When a `jobs` pool is given, due chats are handed to it instead of being processed
+    on the scheduler thread, so maintenance waits while live traffic is backed up.
+    """
+
+    def __init__(self, client: "OpenAI", inactivity_minutes=10, jobs: Optional[BackgroundJobPool] = None):
         self.client = client
+        self.jobs = jobs
         self.inactivity_threshold = timedelta(minutes=inactivity_minutes)
-        self.check_interval = check_interval_seconds
         self.running = False
         self.thread = None
-        self.processed_sessions = set()  # Track already processed sessions
-        
+        self._heap: List[Tuple[float, str, int]] = []  # (deadline monotonic, chat_id, version)
+        self._versions: Dict[str, int] = {}  # chat_id -> version of its current deadline
+        self._cond = threading.Condition()
+        self.last_maintained: Dict[str, datetime] = {}
+
     def start(self):
-        """Start the background monitoring thread."""
+        """Start the background scheduler thread."""
         if self.running:
             return
-        
+
         self.running = True
+        self._seed_from_registry()
         self.thread = threading.Thread(target=self._monitor_loop, daemon=True)
         self.thread.start()
         inactivity_min = int(self.inactivity_threshold.total_seconds() / 60)
         print(f"🔄 [MAINTENANCE] Monitor iniciado (inactividad: {inactivity_min} min)")
-    
+
     def stop(self):
-        """Stop the background monitoring thread."""
-        self.running = False
+        """Stop the background scheduler thread."""
+        with self._cond:
+            self.running = False
+            self._cond.notify_all()
         if self.thread:
             self.thread.join(timeout=5)
-    
-    def _monitor_loop(self):
-        """Main monitoring loop."""
-        while self.running:
-            try:
-                self._check_inactive_sessions()
-            except Exception as e:
-                safe_print(f"❌ [MAINTENANCE] Error en monitor: {e}")
-            
-            time.sleep(self.check_interval)
-    
-    def _check_inactive_sessions(self):
-        """Check all registered chats for inactivity and trigger cleanup."""
-        registry = ChatRegistry.get_all()
-        now = datetime.now()
-        
-        for chat_id, info in registry.items():
-            # Skip if already processed
-            if chat_id in self.processed_sessions:
-                continue
-            
-            # Parse last_seen timestamp
+
+    def _seed_from_registry(self):
+        """Arm one deadline per known chat from its persisted last_seen (read once at start)."""
+        for chat_id, info in ChatRegistry.get_all().items():
             try:
-                last_seen = datetime.fromisoformat(info.get("last_seen", now.isoformat()))
-            except:
+                last_seen = datetime.fromisoformat(info["last_seen"])
+            except (KeyError, TypeError, ValueError):
                 continue
-            
-            # Check if inactive
-            inactive_duration = now - last_seen
-            if inactive_duration >= self.inactivity_threshold:
-                print(f"⏰ [MAINTENANCE] Sesión inactiva detectada: {chat_id} ({inactive_duration.seconds // 60} min)")
+            self.touch(chat_id, last_seen=last_seen)
+
+    def touch(self, chat_id, last_seen: Optional[datetime] = None):
+        """Record activity for a chat and (re)arm its inactivity deadline."""
+        chat_id = str(chat_id)
+        age = (datetime.now() - last_seen).total_seconds() if last_seen else 0.0
+        deadline = time.monotonic() + self.inactivity_threshold.total_seconds() - age
+        with self._cond:
+            version = self._versions.get(chat_id, 0) + 1
+            self._versions[chat_id] = version
+            heapq.heappush(self._heap, (deadline, chat_id, version))
+            # Only wake the thread if this deadline is now the earliest one
+            if self._heap[0][1] == chat_id and self._heap[0][2] == version:
+                self._cond.notify()
+
+    def pending_count(self) -> int:
+        """Number of chats currently armed (active and not yet maintained)."""
+        with self._cond:
+            return len(self._versions)
+
+    def _next_due(self) -> Optional[str]:
+        """Block until a chat crosses its deadline; return it (or None when stopping)."""
+        with self._cond:
+            while self.running:
+                if not self._heap:
+                    self._cond.wait()
+                    continue
+                deadline, chat_id, version = self._heap[0]
+                delay = deadline - time.monotonic()
+                if delay > 0:
+                    self._cond.wait(timeout=delay)
+                    continue
+                heapq.heappop(self._heap)
+                if self._versions.get(chat_id) != version:
+                    continue  # Superseded by newer activity
+                del self._versions[chat_id]
+                return chat_id
+            return None
+
+    def _monitor_loop(self):
+        """Main scheduling loop."""
+        while self.running:
+            chat_id = self._next_due()
+            if chat_id is None:
+                break
+            inactive_min = int(self.inactivity_threshold.total_seconds() // 60)
+            print(f"⏰ [MAINTENANCE] Sesión inactiva detectada: {chat_id} (>= {inactive_min} min)")
+            if self.jobs is not None:
+                self.jobs.submit(self._process_session, chat_id, key=f"maintain:{chat_id}")
+            else:
                 self._process_session(chat_id)
-                self.processed_sessions.add(chat_id)
-    
+
     def _process_session(self, chat_id):
-        """Run extraction and consolidation for a specific session."""
+        """Run extraction and consolidation for a specific session (fused or separate, see MAINTENANCE_MODE)."""
         try:
-            # Intelligence extraction
-            extractor = IntelligenceExtractor(self.client)
-            extractor.extract_and_persist(chat_id)
-            
-            # Memory consolidation
-            consolidator = MemoryConsolidator(self.client)
-            consolidator.consolidate_chat(chat_id)
-            
+            maintain_chat(self.client, chat_id)
+            self.last_maintained[chat_id] = datetime.now()
+
             safe_print(f"✅ [MAINTENANCE] Sesión {chat_id} procesada correctamente.")
         except Exception as e:
             safe_print(f"❌ [MAINTENANCE] Error procesando {chat_id}: {e}")
@@ -87,9 +128,14 @@ class SessionMaintenanceWorker:
 # Global instance (to be initialized in main.py)
 maintenance_worker = None
 
-def start_maintenance_worker(client: OpenAI, inactivity_minutes=10):
+def start_maintenance_worker(client: "OpenAI", inactivity_minutes=10, jobs: Optional[BackgroundJobPool] = None):
     """Initialize and start the maintenance worker."""
     global maintenance_worker
-    maintenance_worker = SessionMaintenanceWorker(client, inactivity_minutes)
+    maintenance_worker = SessionMaintenanceWorker(client, inactivity_minutes, jobs=jobs)
     maintenance_worker.start()
     return maintenance_worker
+
+def notify_activity(chat_id):
+    """Re-arm the inactivity deadline of a chat (no-op until the worker is started)."""
+    if maintenance_worker is not None:
+        maintenance_worker.touch(chat_id)
@@ -1,3 +1,4 @@
+import sys
 from dataclasses import dataclass, field
 from datetime import datetime
 from typing import Literal, Optional, Any
@@ -22,3 +23,73 @@ class Message:
             return int(self.chat_id) < 0
         except ValueError:
             return self.chat_id.startswith('grp_')
+
+_ROLES = {role: sys.intern(role) for role in ("system", "user", "assistant", "tool")}
+
+class ChatMessage:
+    """
+    Mensaje de sesión en memoria. Más compacto que un dict o que el ChatCompletionMessage
+    del SDK: `__slots__`, rol internado y tool calls como tuplas (id, nombre, argumentos).
+    El contenido de una herramienta puede guardarse crudo y se codifica a texto la
+    primera vez que se lee. Se convierte a dict de la API solo al enviar la solicitud.
+    """
+    __slots__ = ("role", "_content", "tool_calls", "tool_call_id", "reasoning_content")
+
+    def __init__(self, role: str, content: Any = None, tool_calls: Optional[tuple] = None,
+                 tool_call_id: Optional[str] = None, reasoning_content: Optional[str] = None):
+        self.role = _ROLES.get(role) or sys.intern(role)
+        self._content = content
+        self.tool_calls = tool_calls or None
+        self.tool_call_id = tool_call_id
+        self.reasoning_content = reasoning_content
+
+    @property
+    def content(self) -> Optional[str]:
+        if self._content is not None and not isinstance(self._content, str):
+            self._content = str(self._content)
+        return self._content
+
+    @content.setter
+    def content(self, value):
+        self._content = value
+
+    @classmethod
+    def from_api(cls, message) -> "ChatMessage":
+        """Desde un dict de la API o un mensaje del SDK (ChatCompletionMessage)."""
+        if isinstance(message, cls):
+            return message
+        if isinstance(message, dict):
+            get = message.get
+        else:
+            get = lambda key: getattr(message, key, None)
+        tool_calls = None
+        if get("tool_calls"):
+            tool_calls = tuple(_tool_call_tuple(call) for call in get("tool_calls"))
+        return cls(get("role"), get("content"), tool_calls, get("tool_call_id"), get("reasoning_content"))
+
+    def to_api(self) -> dict:
+        """Dict listo para `messages=` de chat.completions."""
+        data = {"role": self.role, "content": self.content}
+        if self.tool_calls:
+            data["tool_calls"] = [
+                {"id": call_id, "type": "function", "function": {"name": name, "arguments": arguments}}
+                for call_id, name, arguments in self.tool_calls
+            ]
+        if self.tool_call_id is not None:
+            data["tool_call_id"] = self.tool_call_id
+        if self.reasoning_content is not None:
+            data["reasoning_content"] = self.reasoning_content
+        return data
+
+    def __repr__(self):
+        return f"ChatMessage(role={self.role!r}, content={self._content!r})"
+
+def _tool_call_tuple(call) -> tuple:
+    if isinstance(call, dict):
+        function = call.get("function") or {}
+        return call.get("id"), function.get("name"), function.get("arguments")
+    return call.id, call.function.name, call.function.arguments
+
+def to_api_messages(messages) -> list:
+    """Lista de sesión (ChatMessage, dicts u objetos del SDK) -> dicts de la API."""
+    return [m.to_api() if isinstance(m, ChatMessage) else m for m in messages]
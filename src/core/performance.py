@@ -1,12 +1,22 @@
+import atexit
 import json
 import os
+import threading
 import time
 from datetime import datetime
-from typing import Dict, Any
+from typing import Dict, Any, List
 
 class PerformanceLogger:
-    def __init__(self, log_file: str = "logs/performance.json"):
+    def __init__(self, log_file: str = "logs/performance.json", batch_size: int = None, flush_seconds: float = None):
         self.log_file = log_file
+        # Metrics are buffered and written in batches: rewriting the whole file on
+        # every call turned each @benchmark'ed tool into a disk operation, even when
+        # its result came from a cache.
+        self.batch_size = batch_size if batch_size is not None else int(os.getenv("PERFORMANCE_BATCH_SIZE", "20"))
+        self.flush_seconds = flush_seconds if flush_seconds is not None else float(os.getenv("PERFORMANCE_FLUSH_SECONDS", "5"))
+        self._buffer: List[Dict[str, Any]] = []
+        self._last_flush = time.monotonic()
+        self._lock = threading.Lock()
         self._ensure_log_file()
 
     def _ensure_log_file(self):
@@ -16,25 +26,41 @@ class PerformanceLogger:
                 json.dump([], f)
 
     def log_metric(self, name: str, duration: float, metadata: Dict[str, Any] = None):
-        """Logs a performance metric to the JSON file."""
+        """Buffers a performance metric; it is persisted when the batch fills up or the interval expires."""
         entry = {
             "timestamp": datetime.now().isoformat(),
             "metric_name": name,
             "duration_seconds": round(duration, 6),
             "metadata": metadata or {}
         }
-        
-        try:
-            with open(self.log_file, 'r+', encoding='utf-8') as f:
-                data = json.load(f)
-                if not isinstance(data, list):
-                    data = []
-                data.append(entry)
-                f.seek(0)
-                json.dump(data, f, indent=2)
-                f.truncate()
-        except (json.JSONDecodeError, IOError) as e:
-            print(f"Error logging performance metric: {e}")
+
+        with self._lock:
+            self._buffer.append(entry)
+            due = (len(self._buffer) >= self.batch_size
+                   or time.monotonic() - self._last_flush >= self.flush_seconds)
+        if due:
+            self.flush()
+
+    def flush(self):
+        """Writes all pending metrics to the JSON file."""
+        with self._lock:
+            pending, self._buffer = self._buffer, []
+            self._last_flush = time.monotonic()
+            if not pending:
+                return
+            try:
+                self._ensure_log_file()
+                with open(self.log_file, 'r+', encoding='utf-8') as f:
+                    data = json.load(f)
+                    if not isinstance(data, list):
+                        data = []
+                    data.extend(pending)
+                    f.seek(0)
+                    json.dump(data, f, indent=2)
+                    f.truncate()
+            except (json.JSONDecodeError, IOError) as e:
+                print(f"Error logging performance metric: {e}")
 
 # Global instance for shared use
 performance_logger = PerformanceLogger()
+atexit.register(performance_logger.flush)
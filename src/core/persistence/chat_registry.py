@@ -48,3 +48,14 @@ class ChatRegistry:
     @staticmethod
     def get_all():
         return ChatRegistry.load()
+
+    @staticmethod
+    def is_group(chat_id) -> bool:
+        """Tipo según el registro; si el chat no está registrado, IDs negativos = grupo (Telegram)."""
+        info = ChatRegistry.get_all().get(str(chat_id))
+        if info and info.get("type"):
+            return info["type"] == "group"
+        try:
+            return int(chat_id) < 0
+        except (TypeError, ValueError):
+            return str(chat_id).startswith("grp_")
@@ -0,0 +1,74 @@
+import os
+from concurrent.futures import Future
+from typing import Optional, TYPE_CHECKING
+from src.core.jobs import BackgroundJobPool, JOB_PRIORITY_LOW
+from src.core.persistence.history_manager import HistoryManager
+from src.core.persistence.memory_consolidator import MemoryConsolidator
+from src.core.utils import estimate_tokens
+
+if TYPE_CHECKING:
+    from openai import OpenAI
+
+MEMORY_DIGEST_HEADER = "[MEMORIA DE LARGO PLAZO]:"
+MEMORY_SUMMARIES_HEADER = "[RESÚMENES DE CONVERSACIONES ANTERIORES]:"
+
+def render_memory_context(chat_id, token_budget: Optional[int] = None) -> str:
+    """
+    Bloque compacto para inyectar en la sesión: resumen de largo plazo + los resúmenes
+    por tramo más recientes que quepan en `token_budget` ('' si el chat no tiene memoria).
+    """
+    if not HistoryManager.has_memory(chat_id):
+        return ""
+    if token_budget is None:
+        token_budget = int(os.getenv("MEMORY_CONTEXT_TOKENS", "800"))
+    memory = HistoryManager.load_memory(chat_id)
+
+    parts = []
+    digest = (memory.get("digest") or {}).get("text")
+    if digest:
+        parts.append(f"{MEMORY_DIGEST_HEADER}\n{digest}")
+        token_budget -= estimate_tokens(parts[0])
+
+    recent = []
+    for summary in reversed(memory["summaries"]):
+        line = f"- {summary['text']}"
+        cost = estimate_tokens(line)
+        if cost > token_budget:
+            break
+        token_budget -= cost
+        recent.append(line)
+    if recent:
+        parts.append(MEMORY_SUMMARIES_HEADER + "\n" + "\n".join(reversed(recent)))
+    return "\n\n".join(parts)
+
+class ConversationMemoryBuilder:
+    """
+    Construye la memoria jerárquica de cada chat de forma incremental:
+    mensajes recientes (ventana de tokens del historial) -> un resumen por cada tramo de
+    `window_messages` mensajes desalojados -> resumen de largo plazo (plegado por el
+    consolidador cuando los resúmenes pasan de HISTORY_MAX_SUMMARIES).
+
+    Los resúmenes se generan como trabajos de fondo de baja prioridad (uno en cola por
+    chat), así que esperan mientras haya tráfico en vivo.
+    """
+
+    def __init__(self, client: "OpenAI", jobs: BackgroundJobPool, window_messages: Optional[int] = None):
+        self.client = client
+        self.jobs = jobs
+        self.window_messages = window_messages or int(os.getenv("MEMORY_WINDOW_MESSAGES", "20"))
+
+    def schedule(self, chat_id) -> Optional[Future]:
+        """Encola la construcción si ya hay al menos un tramo completo de mensajes desalojados."""
+        if len(HistoryManager.load_memory(chat_id)["pending"]) < self.window_messages:
+            return None
+        return self.jobs.submit(self.build, chat_id, key=f"memory:{chat_id}", priority=JOB_PRIORITY_LOW)
+
+    def build(self, chat_id) -> int:
+        """Resume los tramos completos pendientes; devuelve cuántos resúmenes se generaron."""
+        consolidator = MemoryConsolidator(self.client)
+        built = 0
+        while len(HistoryManager.load_memory(chat_id)["pending"]) >= self.window_messages:
+            if not consolidator.summarize_evicted(chat_id, max_messages=self.window_messages):
+                break
+            built += 1
+        return built
@@ -1,30 +1,151 @@
 import json
 import os
 import re
-from openai import OpenAI
-from src.core.persistence.history_manager import HistoryManager, HISTORY_DIR
-from src.tools.user_tools import update_user_info
-from src.tools.city_tools import add_city_info
+from datetime import datetime
+from threading import Lock
+from typing import List, Optional, TYPE_CHECKING
+from src.core.persistence.history_manager import HistoryManager, HISTORY_DIR, message_fingerprint
+from src.core.persistence.chat_registry import ChatRegistry
 from src.core.logger import safe_print
+from src.core.llm_gateway import create_completion
+
+if TYPE_CHECKING:
+    from openai import OpenAI
+
+WATERMARKS_PATH = "assets/system/extraction_watermarks.json"
+# Cuántas huellas de los últimos mensajes analizados se guardan: si la consolidación
+# borra el último, cualquiera de los anteriores sigue sirviendo como marca.
+WATERMARK_DEPTH = 5
+
+class ExtractionWatermarks:
+    """Marca por chat del último mensaje ya analizado por el extractor."""
+    _lock = Lock()
+
+    @staticmethod
+    def _load_all() -> dict:
+        if not os.path.exists(WATERMARKS_PATH):
+            return {}
+        try:
+            with open(WATERMARKS_PATH, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except Exception:
+            return {}
+
+    @staticmethod
+    def get(chat_id) -> dict:
+        """{'hashes': huellas de los últimos mensajes (en orden), 'count': largo del historial al marcar}."""
+        with ExtractionWatermarks._lock:
+            return ExtractionWatermarks._load_all().get(str(chat_id), {})
+
+    @staticmethod
+    def new_messages(chat_id, history: list) -> list:
+        mark = ExtractionWatermarks.get(chat_id)
+        return new_messages_since(history, mark.get("hashes", []), mark.get("count"))
+
+    @staticmethod
+    def set(chat_id, history: list):
+        hashes = [message_fingerprint(m) for m in history[-WATERMARK_DEPTH:]]
+        with ExtractionWatermarks._lock:
+            data = ExtractionWatermarks._load_all()
+            data[str(chat_id)] = {"hashes": hashes, "count": len(history), "updated_at": datetime.now().isoformat()}
+            os.makedirs(os.path.dirname(WATERMARKS_PATH), exist_ok=True)
+            tmp_path = f"{WATERMARKS_PATH}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, indent=2, ensure_ascii=False)
+            os.replace(tmp_path, WATERMARKS_PATH)
+
+def _matches_mark(history: list, end: int, hashes: List[str]) -> bool:
+    """
+    ¿Termina en `end` la secuencia marcada? Hacia atrás, cada mensaje debe coincidir con la
+    siguiente huella pendiente; se pueden saltar huellas (mensajes que la consolidación borró)
+    pero no aparecer mensajes ajenos a la marca antes de agotarla o llegar al inicio.
+    """
+    pending = len(hashes)
+    for i in range(end, -1, -1):
+        if pending == 0:
+            return True
+        fingerprint = message_fingerprint(history[i])
+        while pending and hashes[pending - 1] != fingerprint:
+            pending -= 1
+        if pending == 0:
+            return False
+        pending -= 1
+    return True
+
+def new_messages_since(history: list, hashes: List[str], count: Optional[int] = None) -> list:
+    """
+    Mensajes posteriores a la marca (últimas huellas analizadas, en orden). La marca debe
+    coincidir como secuencia y no más allá de `count` (el historial solo se recorta por
+    delante o por consolidación), así un intercambio repetido ("ok", "Perfecto") al final
+    de los mensajes nuevos no se confunde con la marca.
+    """
+    if not hashes:
+        return history
+    last = len(history) - 1 if count is None else min(len(history), count) - 1
+    known = set(hashes)
+    for i in range(last, -1, -1):
+        if message_fingerprint(history[i]) in known and _matches_mark(history, i, hashes):
+            return history[i + 1:]
+    # La marca ya no está en el historial (recortado): se analiza todo
+    return history
+
+def apply_intelligence(intel: dict):
+    """Persiste en los ledgers los hechos extraídos ('user_updates' y 'city_updates')."""
+    # Import diferido: cargar los módulos de herramientas registra sus @tool; no hace falta al arrancar
+    from src.tools.user_tools import update_user_info
+    from src.tools.city_tools import merge_city_updates
+
+    # Aplicar actualizaciones de usuario
+    for update in intel.get("user_updates", []):
+        user = update.get("user")
+        info = update.get("updates")
+        if user and info:
+            print(f" ✨ [EXTRACTOR] Actualizando perfil de usuario: {user}")
+            update_user_info(user=user, info_json=json.dumps(info))
+
+    # Aplicar actualizaciones de ciudad (agrupadas: una escritura por ciudad)
+    updates_by_city = {}
+    for update in intel.get("city_updates", []):
+        city = update.get("city")
+        info = update.get("updates")
+        if city and info:
+            updates_by_city.setdefault(city.lower().strip(), []).append(info)
+
+    for city, infos in updates_by_city.items():
+        print(f" ✨ [EXTRACTOR] Actualizando ledger de ciudad: {city}")
+        merge_city_updates(city, infos)
 
 class IntelligenceExtractor:
-    def __init__(self, client: OpenAI):
+    def __init__(self, client: "OpenAI"):
         self.client = client
 
     def extract_and_persist(self, chat_id):
-        """Analiza la sesión de un chat y extrae información útil."""
+        """Analiza solo los mensajes nuevos de un chat (desde la última marca) y extrae información útil."""
         # Cargar historial reciente (ej: últimos 100 mensajes)
         history = HistoryManager.load_history(chat_id, limit=100)
         if not history:
             return
 
-        print(f"🔍 Extrayendo inteligencia del chat {chat_id}...")
+        new_messages = ExtractionWatermarks.new_messages(chat_id, history)
+        if not new_messages:
+            print(f"⏭️ Chat {chat_id} sin mensajes nuevos desde la última extracción.")
+            return
 
+        print(f"🔍 Extrayendo inteligencia del chat {chat_id} ({len(new_messages)} mensajes nuevos)...")
+
+        if self._extract(chat_id, new_messages):
+            ExtractionWatermarks.set(chat_id, history)
+
+    def _extract(self, chat_id, messages: list) -> bool:
         # Formatear historial
         formatted_history = ""
-        for msg in history:
+        for msg in messages:
             formatted_history += f"{msg['role'].upper()}: {msg['content']}\n"
 
+        # El registro aporta la identidad del interlocutor sin reenviar mensajes ya analizados
+        username = ChatRegistry.get_all().get(str(chat_id), {}).get("username", "")
+        identity_hint = f"Interlocutor según el registro de chats: {username}\n" if username else ""
+
         prompt = f"""Analiza la siguiente conversación de Andrew Martin (un bot asistente) con un usuario.
 Tu meta es encontrar Hechos (Facts) nuevos sobre el usuario o sobre ciudades que deban ser persistidos en sus archivos .ledger.
 
@@ -38,13 +159,17 @@ REGLAS DE EXTRACCIÓN:
    - CADA ITEM debe ser un objeto con al menos: {{ "nombre": "...", "descripcion": "..." }}
    - Ejemplo updates: {{ "experiencias_gastronomicas": [{{ "nombre": "Pizza Solar", "descripcion": "Excelente pizza en Cali" }}] }}
 
-CONVERSACIÓN:
+{identity_hint}CONVERSACIÓN (solo mensajes nuevos):
 {formatted_history}
 
 SALIDA JSON:"""
 
         try:
-            response = self.client.chat.completions.create(
+            # Respuestas deterministas (temperature=0): se cachean solo en grupos,
+            # donde la conversación nunca contiene el perfil privado de nadie
+            response = create_completion(
+                self.client,
+                cache=ChatRegistry.is_group(chat_id),
                 model="deepseek-chat",
                 messages=[{"role": "user", "content": prompt}],
                 temperature=0,
@@ -52,28 +177,13 @@ SALIDA JSON:"""
             )
             
             content = response.choices[0].message.content
-            intel = json.loads(content)
-
-            # Aplicar actualizaciones de usuario
-            for update in intel.get("user_updates", []):
-                user = update.get("user")
-                info = update.get("updates")
-                if user and info:
-                    print(f" ✨ [EXTRACTOR] Actualizando perfil de usuario: {user}")
-                    update_user_info(user=user, info_json=json.dumps(info))
-
-            # Aplicar actualizaciones de ciudad
-            for update in intel.get("city_updates", []):
-                city = update.get("city")
-                info = update.get("updates")
-                if city and info:
-                    print(f" ✨ [EXTRACTOR] Actualizando ledger de ciudad: {city}")
-                    add_city_info(city=city, info_json=json.dumps(info))
-
+            apply_intelligence(json.loads(content))
+            return True
         except Exception as e:
             safe_print(f"❌ Error extrayendo inteligencia en {chat_id}: {e}")
+            return False
 
-def run_extraction_on_all(client: OpenAI):
+def run_extraction_on_all(client: "OpenAI"):
     """Ejecuta la extracción en todos los historiales antes del cierre."""
     if not os.path.exists(HISTORY_DIR):
         return
@@ -0,0 +1,173 @@
+import json
+import os
+from threading import Lock
+from typing import Any, Dict, Optional, Tuple
+from src.core.logger import safe_print
+from src.core.utils import KeyedLock
+
+GROUPS_DIR = "./assets/groups"
+JOURNAL_SUFFIX = ".patches"
+
+def _apply_patch(data: Dict[str, Any], group_id: str, key: str, value: Any, last_update: str):
+    data[key] = value
+    metadata = data.get("group_metadata")
+    metadata = dict(metadata) if isinstance(metadata, dict) else {"group_id": group_id}
+    metadata["last_update"] = last_update
+    data["group_metadata"] = metadata
+
+def journal_path_for(ledger_path: str) -> str:
+    return ledger_path[:-len(".ledger")] + JOURNAL_SUFFIX
+
+def load_group_ledger(ledger_path: str, group_id: str) -> Tuple[Dict[str, Any], int, bool]:
+    """Ledger base + parches del diario. Devuelve (datos, parches aplicados, hubo_línea_ilegible)."""
+    data = {}
+    if os.path.exists(ledger_path):
+        with open(ledger_path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    patches, torn = 0, False
+    journal_path = journal_path_for(ledger_path)
+    if os.path.exists(journal_path):
+        with open(journal_path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                    key, value, last_update = entry["key"], entry["value"], entry["last_update"]
+                    if not isinstance(key, str):
+                        raise TypeError("clave no textual")
+                except (ValueError, KeyError, TypeError):
+                    # Línea truncada o JSON válido sin la forma de un parche: se trata igual
+                    safe_print(f"⚠️ [GROUP] Parche ilegible ignorado en {journal_path}")
+                    torn = True
+                    continue
+                _apply_patch(data, group_id, key, value, last_update)
+                patches += 1
+    return data, patches, torn
+
+class GroupLedgerStore:
+    """
+    Ledgers de grupo con un lock por grupo, caché en memoria y escritura por clave.
+
+    Cada `patch` añade una línea al diario `<id>.patches` (clave, valor, fecha) en lugar de
+    reescribir el ledger completo; cada `compact_every` parches el diario se vuelca al
+    `<id>.ledger` con escritura atómica (tmp + rename) y se borra. Una línea final truncada
+    (caída a mitad de escritura) se ignora al reproducir el diario, y reproducir un diario
+    ya volcado es inocuo porque cada parche solo asigna una clave.
+
+    La caché se valida con mtime y tamaño del ledger y del diario, así que un cambio externo
+    se detecta en la siguiente lectura (como la caché de índices de ciudad).
+    """
+
+    def __init__(self, groups_dir: str = GROUPS_DIR, compact_every: Optional[int] = None):
+        self.groups_dir = groups_dir
+        if compact_every is None:
+            compact_every = int(os.getenv("GROUP_LEDGER_COMPACT_EVERY", "20"))
+        self.compact_every = max(1, compact_every)
+        self._cache: Dict[str, Tuple[tuple, Dict[str, Any], int]] = {}  # id -> (firma, datos, parches)
+        self._cache_lock = Lock()
+        self._locks = KeyedLock()
+
+    # --- Rutas y firma ---
+    def ledger_path(self, group_id: str) -> str:
+        return os.path.join(self.groups_dir, f"{group_id}.ledger")
+
+    def journal_path(self, group_id: str) -> str:
+        return journal_path_for(self.ledger_path(group_id))
+
+    def signature(self, group_id: str) -> tuple:
+        """(mtime, tamaño) del ledger y del diario; None en cada archivo que no existe."""
+        def stat(path):
+            try:
+                st = os.stat(path)
+            except OSError:
+                return None
+            return st.st_mtime_ns, st.st_size
+        return stat(self.ledger_path(group_id)), stat(self.journal_path(group_id))
+
+    # --- Lectura ---
+    def _load(self, group_id: str) -> Tuple[Dict[str, Any], int]:
+        data, patches, torn = load_group_ledger(self.ledger_path(group_id), group_id)
+        if torn:
+            # No se sigue anexando tras una línea truncada: el próximo parche vuelca el ledger
+            patches = max(patches, self.compact_every)
+        return data, patches
+
+    def _current(self, group_id: str) -> Tuple[tuple, Dict[str, Any], int]:
+        signature = self.signature(group_id)
+        with self._cache_lock:
+            cached = self._cache.get(group_id)
+        if cached and cached[0] == signature:
+            return cached
+        data, patches = self._load(group_id)
+        entry = (signature, data, patches)
+        with self._cache_lock:
+            self._cache[group_id] = entry
+        return entry
+
+    def exists(self, group_id: str) -> bool:
+        return self.signature(group_id) != (None, None)
+
+    def read(self, group_id: str) -> Optional[Dict[str, Any]]:
+        """Ledger vigente (base + parches) o None si el grupo no tiene ledger. No modificar el resultado."""
+        group_id = str(group_id)
+        if not self.exists(group_id):
+            return None
+        return self._current(group_id)[1]
+
+    # --- Escritura ---
+    def _write_ledger(self, group_id: str, data: Dict[str, Any]):
+        ledger_path = self.ledger_path(group_id)
+        tmp_path = f"{ledger_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_path, ledger_path)
+        try:
+            os.remove(self.journal_path(group_id))
+        except FileNotFoundError:
+            pass
+
+    def patch(self, group_id: str, key: str, value: Any, last_update: Optional[str] = None) -> Dict[str, Any]:
+        """Asigna `key` en el ledger del grupo (serializado por grupo) y devuelve el ledger resultante."""
+        group_id = str(group_id)
+        if last_update is None:
+            last_update = str(os.getenv("CURRENT_TIME", "now"))
+        with self._locks(group_id):
+            os.makedirs(self.groups_dir, exist_ok=True)
+            _, data, patches = self._current(group_id)
+            data = dict(data)  # copia superficial: los lectores concurrentes conservan su versión
+            _apply_patch(data, group_id, key, value, last_update)
+
+            if patches + 1 >= self.compact_every or not os.path.exists(self.ledger_path(group_id)):
+                self._write_ledger(group_id, data)
+                patches = 0
+            else:
+                line = json.dumps({"key": key, "value": value, "last_update": last_update}, ensure_ascii=False)
+                with open(self.journal_path(group_id), "a", encoding="utf-8") as f:
+                    f.write(line + "\n")
+                patches += 1
+
+            with self._cache_lock:
+                self._cache[group_id] = (self.signature(group_id), data, patches)
+            return data
+
+    def compact(self, group_id: str) -> bool:
+        """Vuelca el diario pendiente al ledger. Devuelve False si no había parches."""
+        group_id = str(group_id)
+        with self._locks(group_id):
+            if not os.path.exists(self.journal_path(group_id)):
+                return False
+            _, data, _ = self._current(group_id)
+            self._write_ledger(group_id, data)
+            with self._cache_lock:
+                self._cache[group_id] = (self.signature(group_id), data, 0)
+            return True
+
+    def compact_all(self) -> int:
+        """Compacta todos los grupos con diario pendiente (p. ej. al apagar)."""
+        if not os.path.isdir(self.groups_dir):
+            return 0
+        group_ids = [entry.name[:-len(JOURNAL_SUFFIX)] for entry in os.scandir(self.groups_dir)
+                     if entry.name.endswith(JOURNAL_SUFFIX)]
+        return sum(self.compact(group_id) for group_id in group_ids)
+
+# Instancia global
+group_ledger_store = GroupLedgerStore()
@@ -1,16 +1,52 @@
+import hashlib
 import json
 import os
-from threading import Lock
+from datetime import datetime
+from threading import Lock, RLock
+from typing import Callable, List
 from src.core.logger import safe_print
+from src.core.models import ChatMessage
+from src.core.persistence.history_window import HistoryWindow
 
 HISTORY_DIR = "assets/history"
 history_lock = Lock()
+memory_lock = RLock()
+
+# Tope de mensajes desalojados a la espera de resumen (si el consolidador no corre, se descartan los más viejos)
+MAX_PENDING_EVICTED = 200
+MAX_SUMMARIES_KEPT = 50
+
+def message_fingerprint(msg: dict) -> str:
+    """Huella estable de un mensaje persistido (rol + contenido)."""
+    raw = f"{msg.get('role', '')}\x1f{msg.get('content', '')}"
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+def _empty_memory() -> dict:
+    return {"pinned": [], "pending": [], "summaries": [], "digest": None, "evicted_mark": None}
 
 class HistoryManager:
     @staticmethod
     def _get_path(chat_id):
         return os.path.join(HISTORY_DIR, f"{chat_id}.json")
 
+    @staticmethod
+    def history_size(chat_id) -> int:
+        """Tamaño en bytes del historial persistido (solo metadatos, sin parsear el JSON)."""
+        try:
+            return os.path.getsize(HistoryManager._get_path(chat_id))
+        except OSError:
+            return 0
+
+    @staticmethod
+    def load_session_messages(chat_id, limit=None) -> list:
+        """
+        Historial como ChatMessage dentro de la ventana de tokens, listo para una sesión en memoria.
+        Sin `limit`, el tope de mensajes es HISTORY_MAX_MESSAGES.
+        """
+        history = HistoryManager.load_history(chat_id, limit)
+        kept, _ = HistoryWindow(max_messages=limit).split(history, HistoryManager.pinned_indices(chat_id, history))
+        return [ChatMessage(m["role"], m.get("content")) for m in kept]
+
     @staticmethod
     def load_history(chat_id, limit=100) -> list:
         """Carga los últimos N mensajes del historial persistente."""
@@ -21,7 +57,7 @@ class HistoryManager:
             try:
                 with open(path, "r", encoding="utf-8") as f:
                     history = json.load(f)
-                    return history[-limit:]
+                    return history[-limit:] if limit else history
             except Exception as e:
                 safe_print(f"⚠️ Error cargando historial para {chat_id}: {e}")
                 return []
@@ -40,31 +76,141 @@ class HistoryManager:
         return res
 
     @staticmethod
-    def save_history(chat_id, messages, limit=100):
-        """Guarda la lista de mensajes (limpiando sistema y herramientas)."""
+    def save_history(chat_id, messages, limit=None) -> int:
+        """
+        Guarda la lista de mensajes (limpiando sistema y herramientas).
+        Devuelve cuántos mensajes nuevos desalojó la ventana de tokens.
+        """
         path = HistoryManager._get_path(chat_id)
         
         # Convertir todos a dict y filtrar solo user/assistant con contenido
         processed_msgs = []
         for m in messages:
+            if isinstance(m, ChatMessage):
+                # Camino directo: sin convertir el mensaje completo, solo lo que se persiste
+                if m.role in ("user", "assistant") and m.content:
+                    processed_msgs.append({"role": m.role, "content": m.content})
+                continue
             d = HistoryManager._to_dict(m)
             if d.get("role") in ["user", "assistant"] and d.get("content"):
                 processed_msgs.append(d)
         
-        # Mantener solo los últimos limit
-        persistent_msgs = processed_msgs[-limit:]
+        # Ventana por tokens (y como máximo `limit` o HISTORY_MAX_MESSAGES mensajes); lo desalojado queda para resumir
+        persistent_msgs, evicted = HistoryWindow(max_messages=limit).split(
+            processed_msgs, HistoryManager.pinned_indices(chat_id, processed_msgs)
+        )
+        newly_evicted = HistoryManager._record_evicted(chat_id, evicted) if evicted else 0
         
         with history_lock:
             os.makedirs(HISTORY_DIR, exist_ok=True)
             try:
-                with open(path, "w", encoding="utf-8") as f:
+                # tmp + rename: un apagado a mitad de escritura (os._exit tras el plazo)
+                # deja el historial anterior completo, nunca uno truncado
+                tmp_path = f"{path}.tmp"
+                with open(tmp_path, "w", encoding="utf-8") as f:
                     json.dump(persistent_msgs, f, indent=2, ensure_ascii=False)
+                os.replace(tmp_path, path)
             except Exception as e:
                 safe_print(f"⚠️ Error guardando historial para {chat_id}: {e}")
+        return newly_evicted
 
     @staticmethod
-    def add_message(chat_id, role, content, limit=100):
+    def add_message(chat_id, role, content, limit=None):
         """Añade un mensaje de forma eficiente al historial persistente."""
         history = HistoryManager.load_history(chat_id, limit=limit)
         history.append({"role": role, "content": content})
         HistoryManager.save_history(chat_id, history, limit=limit)
+
+    # --- Memoria auxiliar: mensajes fijados, desalojos pendientes y resúmenes ---
+    @staticmethod
+    def _memory_path(chat_id):
+        return os.path.join(HISTORY_DIR, "memory", f"{chat_id}.json")
+
+    @staticmethod
+    def has_memory(chat_id) -> bool:
+        """Solo metadatos: evita leer la memoria en chats que nunca desalojaron ni fijaron nada."""
+        return os.path.exists(HistoryManager._memory_path(chat_id))
+
+    @staticmethod
+    def load_memory(chat_id) -> dict:
+        path = HistoryManager._memory_path(chat_id)
+        with memory_lock:
+            if not os.path.exists(path):
+                return _empty_memory()
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    return {**_empty_memory(), **json.load(f)}
+            except Exception as e:
+                safe_print(f"⚠️ Memoria ilegible para {chat_id}, se reinicia: {e}")
+                return _empty_memory()
+
+    @staticmethod
+    def update_memory(chat_id, mutate: Callable[[dict], None]) -> dict:
+        """Lee, modifica y escribe (atómicamente) la memoria del chat bajo un mismo lock."""
+        path = HistoryManager._memory_path(chat_id)
+        with memory_lock:
+            memory = HistoryManager.load_memory(chat_id)
+            mutate(memory)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(memory, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+            return memory
+
+    @staticmethod
+    def pinned_indices(chat_id, history: List[dict]) -> List[int]:
+        if not HistoryManager.has_memory(chat_id):
+            return []
+        pinned = set(HistoryManager.load_memory(chat_id)["pinned"])
+        if not pinned:
+            return []
+        return [i for i, m in enumerate(history) if message_fingerprint(m) in pinned]
+
+    @staticmethod
+    def pin_message(chat_id, role, content):
+        """Fija un mensaje: la ventana de tokens nunca lo desaloja."""
+        fingerprint = message_fingerprint({"role": role, "content": content})
+        def mutate(memory):
+            if fingerprint not in memory["pinned"]:
+                memory["pinned"].append(fingerprint)
+        HistoryManager.update_memory(chat_id, mutate)
+
+    @staticmethod
+    def _record_evicted(chat_id, evicted: List[dict]) -> int:
+        """Encola para resumen los mensajes desalojados que no se habían registrado antes."""
+        added = 0
+        def mutate(memory):
+            nonlocal added
+            mark = memory.get("evicted_mark")
+            fresh = evicted
+            for i in range(len(evicted) - 1, -1, -1):
+                if message_fingerprint(evicted[i]) == mark:
+                    fresh = evicted[i + 1:]
+                    break
+            if not fresh:
+                return
+            memory["pending"] = (memory["pending"] + fresh)[-MAX_PENDING_EVICTED:]
+            memory["evicted_mark"] = message_fingerprint(evicted[-1])
+            added = len(fresh)
+        HistoryManager.update_memory(chat_id, mutate)
+        return added
+
+    @staticmethod
+    def add_summary(chat_id, text: str, consumed: int):
+        """Registra el resumen de los primeros `consumed` mensajes pendientes."""
+        def mutate(memory):
+            memory["pending"] = memory["pending"][consumed:]
+            memory["summaries"].append({"text": text, "messages": consumed, "created_at": datetime.now().isoformat()})
+            # Tope duro por si el resumen de largo plazo no logra plegarlos
+            memory["summaries"] = memory["summaries"][-MAX_SUMMARIES_KEPT:]
+        HistoryManager.update_memory(chat_id, mutate)
+
+    @staticmethod
+    def set_digest(chat_id, text: str, folded: int):
+        """Reemplaza el resumen de largo plazo, que ahora incluye los primeros `folded` resúmenes."""
+        def mutate(memory):
+            previous = (memory.get("digest") or {}).get("summaries", 0)
+            memory["summaries"] = memory["summaries"][folded:]
+            memory["digest"] = {"text": text, "summaries": previous + folded, "updated_at": datetime.now().isoformat()}
+        HistoryManager.update_memory(chat_id, mutate)
@@ -0,0 +1,41 @@
+import os
+from typing import Collection, List, Optional, Tuple
+from src.core.utils import estimate_tokens
+
+class HistoryWindow:
+    """
+    Ventana del historial acotada por tokens en lugar de un número fijo de mensajes.
+
+    Se conservan los mensajes más recientes mientras quepan en `token_budget` (y sin pasar
+    de `max_messages`). Los mensajes fijados (`pinned`, por índice) se conservan siempre y
+    su costo se descuenta primero del presupuesto. El mensaje más reciente se conserva
+    aunque por sí solo exceda el presupuesto.
+    """
+
+    def __init__(self, token_budget: Optional[int] = None, max_messages: Optional[int] = None):
+        self.token_budget = token_budget if token_budget is not None else int(os.getenv("HISTORY_TOKEN_BUDGET", "6000"))
+        self.max_messages = max_messages if max_messages is not None else int(os.getenv("HISTORY_MAX_MESSAGES", "100"))
+
+    @staticmethod
+    def cost(message: dict) -> int:
+        return estimate_tokens(message.get("content")) + 4  # ~4 tokens de envoltura por mensaje
+
+    def split(self, messages: List[dict], pinned: Collection[int] = ()) -> Tuple[List[dict], List[dict]]:
+        """Devuelve (conservados, desalojados), ambos en orden cronológico."""
+        pinned = {i for i in pinned if 0 <= i < len(messages)}
+        budget = self.token_budget - sum(self.cost(messages[i]) for i in pinned)
+        slots = self.max_messages - len(pinned)
+        start = len(messages)
+        for i in range(len(messages) - 1, -1, -1):
+            if i in pinned:
+                start = i
+                continue
+            cost = self.cost(messages[i])
+            if slots <= 0 or (cost > budget and start < len(messages)):
+                break
+            budget -= cost
+            slots -= 1
+            start = i
+        kept = [m for i, m in enumerate(messages) if i >= start or i in pinned]
+        evicted = [m for i, m in enumerate(messages) if i < start and i not in pinned]
+        return kept, evicted
@@ -1,18 +1,40 @@
 import os
 import json
-from openai import OpenAI
+from typing import Optional, TYPE_CHECKING
 from src.core.persistence.history_manager import HISTORY_DIR, HistoryManager
+from src.core.persistence.chat_registry import ChatRegistry
+from src.core.llm_gateway import create_completion
 from dotenv import load_dotenv
 from src.core.logger import safe_print
+from src.core.utils import KeyedLock
+
+if TYPE_CHECKING:
+    from openai import OpenAI
 
 load_dotenv()
 
+# Un resumen a la vez por chat: los trabajos de fondo y el mantenimiento comparten la cola de pendientes
+summary_locks = KeyedLock()
+
+def apply_keep_indices(chat_id, history: list, indices: list) -> list:
+    """Guarda solo los mensajes cuyos índices indicó el LLM y devuelve el historial limpio."""
+    # Crear nuevo historial filtrado (los mensajes fijados se conservan siempre)
+    keep = sorted(set(indices) | set(HistoryManager.pinned_indices(chat_id, history)))
+    new_history = [history[i] for i in keep if 0 <= i < len(history)]
+    
+    # Guardar el historial "limpio"
+    HistoryManager.save_history(chat_id, new_history)
+    safe_print(f"✅ Limpieza completada. De {len(history)} mensajes quedan {len(new_history)}.")
+    return new_history
+
 class MemoryConsolidator:
-    def __init__(self, client: OpenAI):
+    def __init__(self, client: "OpenAI"):
         self.client = client
 
     def consolidate_chat(self, chat_id):
         """Usa el LLM para limpiar el historial de un chat específico."""
+        self.summarize_evicted(chat_id)
+
         history = HistoryManager.load_history(chat_id, limit=100)
         if not history:
             return
@@ -39,7 +61,9 @@ HISTORIAL A PROCESAR:
 """
 
         try:
-            response = self.client.chat.completions.create(
+            response = create_completion(
+                self.client,
+                cache=ChatRegistry.is_group(chat_id),  # Solo grupos: sin datos privados
                 model="deepseek-chat", # O el modelo que estés usando
                 messages=[{"role": "user", "content": prompt}],
                 temperature=0,
@@ -53,20 +77,90 @@ HISTORIAL A PROCESAR:
             match = re.search(r'\[.*\]', content)
             if match:
                 indices = json.loads(match.group(0))
-                
-                # Crear nuevo historial filtrado
-                new_history = [history[i] for i in indices if i < len(history)]
-                
-                # Guardar el historial "limpio"
-                HistoryManager.save_history(chat_id, new_history)
-                safe_print(f"✅ Limpieza completada. De {len(history)} mensajes quedan {len(new_history)}.")
+                apply_keep_indices(chat_id, history, indices)
             else:
                 safe_print(f"⚠️ No se pudo interpretar la respuesta del LLM para {chat_id}")
         
         except Exception as e:
             safe_print(f"❌ Error consolidando chat {chat_id}: {e}")
 
-def consolidate_all_histories(client: OpenAI):
+    def summarize_evicted(self, chat_id, max_messages: Optional[int] = None) -> bool:
+        """
+        Resume los mensajes que la ventana de tokens desalojó del historial (todos, o solo
+        los primeros `max_messages`) y pliega los resúmenes viejos en el de largo plazo.
+        """
+        with summary_locks(str(chat_id)):
+            pending = HistoryManager.load_memory(chat_id)["pending"]
+            if max_messages:
+                pending = pending[:max_messages]
+            if not pending:
+                return False
+
+            formatted = "".join(f"{msg['role'].upper()}: {msg['content']}\n" for msg in pending)
+            summary = self._complete(chat_id, f"""Resume el siguiente tramo antiguo de una conversación de Andrew Martin (un bot asistente).
+REGLAS:
+1. Máximo 80 palabras, en un solo párrafo.
+2. Conserva hechos, decisiones, preferencias, pendientes y datos técnicos; omite saludos y relleno.
+3. Devuelve EXCLUSIVAMENTE el resumen.
+
+TRAMO:
+{formatted}""")
+            if not summary:
+                return False
+
+            HistoryManager.add_summary(chat_id, summary, consumed=len(pending))
+            print(f"📝 Resumidos {len(pending)} mensajes desalojados del chat {chat_id}.")
+            self._fold_locked(chat_id)
+            return True
+
+    def fold_summaries(self, chat_id) -> bool:
+        """Integra los resúmenes más viejos en el resumen de largo plazo cuando pasan de HISTORY_MAX_SUMMARIES."""
+        with summary_locks(str(chat_id)):
+            return self._fold_locked(chat_id)
+
+    def _fold_locked(self, chat_id) -> bool:
+        max_summaries = int(os.getenv("HISTORY_MAX_SUMMARIES", "6"))
+        memory = HistoryManager.load_memory(chat_id)
+        summaries = memory["summaries"]
+        if len(summaries) <= max_summaries:
+            return False
+        # Se pliega hasta la mitad del tope: así no hay una llamada por cada resumen nuevo
+        folded = summaries[:len(summaries) - max_summaries // 2]
+        previous = (memory.get("digest") or {}).get("text", "")
+        formatted = "\n".join(f"- {item['text']}" for item in folded)
+        digest = self._complete(chat_id, f"""Actualiza la memoria de largo plazo de una conversación de Andrew Martin (un bot asistente).
+REGLAS:
+1. Máximo 150 palabras.
+2. Integra la memoria actual con los resúmenes nuevos; si algo cambió, conserva lo más reciente.
+3. Conserva hechos duraderos, preferencias, acuerdos y pendientes; descarta detalles pasajeros.
+4. Devuelve EXCLUSIVAMENTE la memoria actualizada.
+
+MEMORIA ACTUAL:
+{previous or "(vacía)"}
+
+RESÚMENES NUEVOS:
+{formatted}""")
+        if not digest:
+            return False
+        HistoryManager.set_digest(chat_id, digest, folded=len(folded))
+        print(f"🗂️ {len(folded)} resúmenes del chat {chat_id} integrados en la memoria de largo plazo.")
+        return True
+
+    def _complete(self, chat_id, prompt: str) -> str:
+        try:
+            response = create_completion(
+                self.client,
+                cache=ChatRegistry.is_group(chat_id),  # Solo grupos: sin datos privados
+                model="deepseek-chat",
+                messages=[{"role": "user", "content": prompt}],
+                temperature=0
+            )
+            return (response.choices[0].message.content or "").strip()
+        except Exception as e:
+            safe_print(f"❌ Error resumiendo la memoria de {chat_id}: {e}")
+            return ""
+
+def consolidate_all_histories(client: "OpenAI"):
     """Itera por todos los archivos de historial y los consolida."""
     if not os.path.exists(HISTORY_DIR):
         return
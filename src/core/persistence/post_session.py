@@ -0,0 +1,181 @@
+import json
+import math
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, wait, FIRST_COMPLETED
+from datetime import datetime
+from typing import Dict, List, Optional, Union, TYPE_CHECKING
+from src.core.logger import safe_print
+from src.core.jobs import BackgroundJobPool, JOB_PRIORITY_LOW
+from src.core.persistence.history_manager import HISTORY_DIR
+from src.core.persistence.extractor import IntelligenceExtractor
+from src.core.persistence.memory_consolidator import MemoryConsolidator
+from src.core.persistence.session_maintainer import (
+    SessionMaintainer, get_maintenance_mode, MAINTENANCE_MODE_FUSED
+)
+
+if TYPE_CHECKING:
+    from openai import OpenAI
+
+PROGRESS_PATH = "assets/system/post_session_progress.json"
+
+# Etapas por chat: la extracción debe ocurrir antes de que la consolidación recorte el historial
+STAGE_PENDING = "pending"
+STAGE_EXTRACTED = "extracted"
+STAGE_DONE = "done"
+
+def list_history_chats() -> List[str]:
+    """IDs de chat con historial persistido."""
+    if not os.path.exists(HISTORY_DIR):
+        return []
+    return [f[:-len(".json")] for f in os.listdir(HISTORY_DIR) if f.endswith(".json")]
+
+class PostSessionPipeline:
+    """
+    Ejecuta extracción + consolidación por chat en paralelo con concurrencia acotada.
+
+    - Los chats se procesan en un pool de `max_workers` hilos (cada chat en orden:
+      primero extracción, luego consolidación).
+    - Un plazo global (`deadline_seconds`) corta la espera para que el apagado termine
+      dentro del periodo de gracia del contenedor.
+    - El avance se guarda en PROGRESS_PATH tras cada etapa; si el apagado se interrumpe,
+      el siguiente arranque retoma solo los chats pendientes.
+    """
+
+    def __init__(self, client: "OpenAI", max_workers: Optional[int] = None,
+                 deadline_seconds: Optional[float] = None, progress_path: str = PROGRESS_PATH):
+        self.client = client
+        self.max_workers = max_workers or int(os.getenv("POST_SESSION_WORKERS", "4"))
+        if deadline_seconds is None:
+            deadline_seconds = float(os.getenv("SHUTDOWN_DEADLINE_SECONDS", "25"))
+        self.deadline_seconds = deadline_seconds
+        self.progress_path = progress_path
+        self.progress: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    # --- Persistencia del avance ---
+    @staticmethod
+    def load_progress(progress_path: str = PROGRESS_PATH) -> Dict[str, str]:
+        if not os.path.exists(progress_path):
+            return {}
+        try:
+            with open(progress_path, "r", encoding="utf-8") as f:
+                return json.load(f).get("chats", {})
+        except Exception:
+            return {}
+
+    def _save_progress_locked(self):
+        os.makedirs(os.path.dirname(self.progress_path), exist_ok=True)
+        tmp_path = f"{self.progress_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"updated_at": datetime.now().isoformat(), "chats": self.progress}, f, ensure_ascii=False)
+        os.replace(tmp_path, self.progress_path)
+
+    def _mark(self, chat_id: str, stage: str):
+        with self._lock:
+            self.progress[chat_id] = stage
+            self._save_progress_locked()
+
+    # --- Trabajo por chat ---
+    def _process_chat(self, chat_id: str):
+        if get_maintenance_mode() == MAINTENANCE_MODE_FUSED:
+            # Una sola llamada: extracción y consolidación son atómicas por chat
+            SessionMaintainer(self.client).maintain(chat_id)
+            self._mark(chat_id, STAGE_DONE)
+            return
+
+        stage = self.progress.get(chat_id, STAGE_PENDING)
+        if stage == STAGE_PENDING:
+            IntelligenceExtractor(self.client).extract_and_persist(chat_id)
+            self._mark(chat_id, STAGE_EXTRACTED)
+        MemoryConsolidator(self.client).consolidate_chat(chat_id)
+        self._mark(chat_id, STAGE_DONE)
+
+    def _begin(self, chat_ids: List[str]) -> bool:
+        """Fija el avance inicial (respetando extracciones ya hechas); False si no hay chats."""
+        previous = self.load_progress(self.progress_path)
+        with self._lock:
+            self.progress = {
+                cid: STAGE_EXTRACTED if previous.get(cid) == STAGE_EXTRACTED else STAGE_PENDING
+                for cid in chat_ids
+            }
+            if not self.progress:
+                return False
+            self._save_progress_locked()
+            return True
+
+    def run_chat(self, chat_id: str):
+        """Procesa un solo chat (trabajo de fondo de la reanudación); al terminar el último, borra el avance."""
+        self._process_chat(chat_id)
+        with self._lock:
+            if all(stage == STAGE_DONE for stage in self.progress.values()) and os.path.exists(self.progress_path):
+                os.remove(self.progress_path)
+
+    def run(self, chat_ids: Optional[List[str]] = None) -> Dict[str, int]:
+        """Procesa los chats indicados (por defecto, todos los historiales) y retorna un resumen."""
+        start = time.monotonic()
+        if chat_ids is None:
+            chat_ids = list_history_chats()
+        if not self._begin(chat_ids):
+            return {"done": 0, "pending": 0, "elapsed_ms": 0}
+
+        safe_print(f"\n🧠 Post-sesión: {len(self.progress)} chats | {self.max_workers} workers | plazo {self.deadline_seconds:.0f}s")
+
+        executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="post-session")
+        futures = {executor.submit(self._process_chat, cid): cid for cid in self.progress}
+        pending = set(futures)
+        deadline = start + self.deadline_seconds
+        while pending:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            timeout = None if math.isinf(remaining) else remaining
+            finished, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            for future in finished:
+                if future.exception():
+                    safe_print(f"❌ [POST-SESIÓN] Error procesando {futures[future]}: {future.exception()}")
+
+        # Los chats que no terminaron quedan registrados para el próximo arranque
+        executor.shutdown(wait=False, cancel_futures=True)
+
+        with self._lock:
+            unfinished = [cid for cid, stage in self.progress.items() if stage != STAGE_DONE]
+            if unfinished:
+                self._save_progress_locked()
+            elif os.path.exists(self.progress_path):
+                os.remove(self.progress_path)
+
+        elapsed_ms = int((time.monotonic() - start) * 1000)
+        if unfinished:
+            safe_print(f"⚠️ Post-sesión interrumpida por plazo: {len(unfinished)} chats quedan pendientes para el próximo arranque.")
+        else:
+            safe_print(f"✨ Post-sesión terminada en {elapsed_ms} ms.")
+        return {"done": len(self.progress) - len(unfinished), "pending": len(unfinished), "elapsed_ms": elapsed_ms}
+
+def run_post_session_pipeline(client: "OpenAI", **kwargs) -> Dict[str, int]:
+    """Punto de entrada para el apagado: extracción y consolidación concurrentes con plazo."""
+    return PostSessionPipeline(client, **kwargs).run()
+
+def resume_post_session_pipeline(client: "OpenAI", jobs: Optional[BackgroundJobPool] = None,
+                                 progress_path: str = PROGRESS_PATH) -> Optional[Union[List[Future], threading.Thread]]:
+    """
+    Si un apagado anterior quedó a medias, retoma en segundo plano los chats pendientes.
+    Con un pool de trabajos de fondo se encola un trabajo por chat (misma clave que el
+    mantenimiento por inactividad): así rigen el tope de hilos del pool y la pausa por
+    tráfico en vivo antes de cada chat, no solo al empezar.
+    """
+    progress = PostSessionPipeline.load_progress(progress_path)
+    unfinished = [cid for cid, stage in progress.items() if stage != STAGE_DONE]
+    if not unfinished:
+        return None
+
+    safe_print(f"🔁 Retomando post-sesión interrumpida: {len(unfinished)} chats pendientes.")
+    pipeline = PostSessionPipeline(client, deadline_seconds=float("inf"), progress_path=progress_path)
+    if jobs is not None:
+        pipeline._begin(unfinished)
+        return [jobs.submit(pipeline.run_chat, cid, key=f"maintain:{cid}", priority=JOB_PRIORITY_LOW)
+                for cid in unfinished]
+    thread = threading.Thread(target=pipeline.run, args=(unfinished,), daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,132 @@
+import json
+import os
+from typing import Optional, Tuple, TYPE_CHECKING
+from src.core.logger import safe_print
+from src.core.llm_gateway import create_completion
+from src.core.persistence.history_manager import HistoryManager
+from src.core.persistence.chat_registry import ChatRegistry
+from src.core.persistence.extractor import (
+    IntelligenceExtractor, ExtractionWatermarks, apply_intelligence
+)
+from src.core.persistence.memory_consolidator import MemoryConsolidator, apply_keep_indices
+
+if TYPE_CHECKING:
+    from openai import OpenAI
+
+# "fused": una sola llamada al LLM por chat (extracción + consolidación)
+# "separate": el flujo clásico de dos llamadas (IntelligenceExtractor y luego MemoryConsolidator)
+MAINTENANCE_MODE_FUSED = "fused"
+MAINTENANCE_MODE_SEPARATE = "separate"
+
+def get_maintenance_mode() -> str:
+    mode = os.getenv("MAINTENANCE_MODE", MAINTENANCE_MODE_FUSED).lower()
+    return mode if mode in (MAINTENANCE_MODE_FUSED, MAINTENANCE_MODE_SEPARATE) else MAINTENANCE_MODE_FUSED
+
+def validate_maintenance_output(raw: dict, history_len: int) -> Tuple[dict, Optional[list]]:
+    """
+    Valida la respuesta combinada del LLM.
+    Devuelve (intel, keep_indices); keep_indices es None si no es utilizable, en cuyo
+    caso el historial NO se toca (nunca se borra con una respuesta dudosa).
+    """
+    if not isinstance(raw, dict):
+        raise ValueError("La respuesta no es un objeto JSON.")
+
+    intel = {"user_updates": [], "city_updates": []}
+    for update in raw.get("user_updates") or []:
+        if isinstance(update, dict) and isinstance(update.get("user"), str) and isinstance(update.get("updates"), dict):
+            intel["user_updates"].append(update)
+    for update in raw.get("city_updates") or []:
+        if isinstance(update, dict) and isinstance(update.get("city"), str) and isinstance(update.get("updates"), dict):
+            intel["city_updates"].append(update)
+
+    indices = raw.get("keep_indices")
+    if not isinstance(indices, list) or not all(isinstance(i, int) and not isinstance(i, bool) for i in indices):
+        return intel, None
+    keep = sorted({i for i in indices if 0 <= i < history_len})
+    if history_len and not keep:
+        # Vaciar todo el historial casi siempre es un error del modelo
+        return intel, None
+    return intel, keep
+
+class SessionMaintainer:
+    """Mantenimiento de un chat con una única llamada JSON: hechos nuevos + índices a conservar."""
+
+    def __init__(self, client: "OpenAI"):
+        self.client = client
+
+    def maintain(self, chat_id) -> bool:
+        # Tramos desalojados por la ventana de tokens (sin llamada si no hay pendientes)
+        MemoryConsolidator(self.client).summarize_evicted(chat_id)
+
+        history = HistoryManager.load_history(chat_id, limit=100)
+        if not history:
+            return True
+
+        new_messages = ExtractionWatermarks.new_messages(chat_id, history)
+        if not new_messages:
+            # La marca se fija tras la limpieza: si no hay nada nuevo, ambas tareas ya están hechas
+            print(f"⏭️ Chat {chat_id} sin cambios desde el último mantenimiento.")
+            return True
+        first_new = len(history) - len(new_messages)
+
+        print(f"🧰 Mantenimiento combinado del chat {chat_id} ({len(history)} mensajes, {len(new_messages)} nuevos)...")
+
+        formatted_history = ""
+        for i, msg in enumerate(history):
+            formatted_history += f"[{i}] {msg['role'].upper()}: {msg['content']}\n"
+
+        username = ChatRegistry.get_all().get(str(chat_id), {}).get("username", "")
+        identity_hint = f"Interlocutor según el registro de chats: {username}\n" if username else ""
+
+        prompt = f"""Analiza la conversación de Andrew Martin (un bot asistente) y realiza DOS tareas a la vez.
+
+TAREA 1 - EXTRACCIÓN DE HECHOS:
+- Extrae hechos SOLO de los mensajes con índice >= {first_new}; los anteriores ya fueron analizados y sirven solo como contexto.
+- Solo información EXPLÍCITA y RELEVANTE.
+- 'user_updates': Lista de {{ "user": "nombre.apellido", "updates": {{ "public_profile": {{ "interests": [] }}, "private_profile": {{ "goals": [] }} }} }}
+- 'city_updates': Lista de {{ "city": "nombre", "updates": {{ "categoria": [{{ "nombre": "...", "descripcion": "..." }}] }} }}
+  CATEGORÍAS VÁLIDAS: 'atractivos_culturales', 'espacios_publicos', 'parques_y_naturaleza', 'experiencias_gastronomicas', 'unidades_deportivas', 'centros_academicos', 'centros_comerciales'.
+
+TAREA 2 - LIMPIEZA DEL HISTORIAL:
+- Elimina saludos simples, confirmaciones vacías ("ok", "entendido") y ruido sin hechos.
+- MANTÉN hechos, datos técnicos, solicitudes, respuestas útiles y contexto emocional relevante.
+- 'keep_indices': lista de los índices [i] que debemos MANTENER.
+
+Devuelve EXCLUSIVAMENTE un objeto JSON con las llaves 'user_updates', 'city_updates' y 'keep_indices'.
+
+{identity_hint}HISTORIAL:
+{formatted_history}
+SALIDA JSON:"""
+
+        try:
+            response = create_completion(
+                self.client,
+                cache=ChatRegistry.is_group(chat_id),  # Solo grupos: sin datos privados
+                model="deepseek-chat",
+                messages=[{"role": "user", "content": prompt}],
+                temperature=0,
+                response_format={"type": "json_object"}
+            )
+            intel, keep = validate_maintenance_output(json.loads(response.choices[0].message.content), len(history))
+        except Exception as e:
+            safe_print(f"❌ Error en mantenimiento combinado de {chat_id}: {e}")
+            return False
+
+        apply_intelligence(intel)
+
+        if keep is not None:
+            history = apply_keep_indices(chat_id, history, keep)
+        else:
+            safe_print(f"⚠️ Índices inválidos para {chat_id}; el historial se conserva sin cambios.")
+
+        # La marca se toma del historial final, así sobrevive a la limpieza
+        ExtractionWatermarks.set(chat_id, history)
+        return True
+
+def maintain_chat(client: "OpenAI", chat_id, mode: Optional[str] = None):
+    """Ejecuta el mantenimiento de un chat según MAINTENANCE_MODE."""
+    if (mode or get_maintenance_mode()) == MAINTENANCE_MODE_FUSED:
+        SessionMaintainer(client).maintain(chat_id)
+    else:
+        IntelligenceExtractor(client).extract_and_persist(chat_id)
+        MemoryConsolidator(client).consolidate_chat(chat_id)
@@ -0,0 +1,120 @@
+import mmap
+import os
+import pickle
+import struct
+import threading
+from typing import Callable, Dict, Iterable, Optional, Tuple
+from src.core.logger import safe_print
+from src.core.persistence.history_manager import HistoryManager
+
+SNAPSHOT_PATH = "assets/system/session_snapshot.bin"
+SNAPSHOT_MAGIC = b"AMSNAP"
+SNAPSHOT_VERSION = 2
+
+# Cabecera: magic (6) | versión (H) | largo de la huella del prompt (H) | largo del índice (I)
+_HEADER = struct.Struct("<6sHHI")
+
+def _file_stat(path: str) -> Optional[Tuple[int, int]]:
+    try:
+        st = os.stat(path)
+        return st.st_mtime_ns, st.st_size
+    except OSError:
+        return None
+
+def _sources_stat(chat_id) -> Tuple[Optional[Tuple[int, int]], Optional[Tuple[int, int]]]:
+    """(mtime, tamaño) del historial y de la memoria del chat: ambos se hornean en la sesión."""
+    return (_file_stat(HistoryManager._get_path(chat_id)),
+            _file_stat(HistoryManager._memory_path(chat_id)))
+
+def write_session_snapshot(chat_ids: Iterable, build_session: Callable[[str], list], prompt_fingerprint: str,
+                           path: str = SNAPSHOT_PATH) -> int:
+    """
+    Escribe un snapshot binario de las sesiones calientes (pickle protocolo 5 por chat).
+    Debe llamarse después de persistir historiales (tras la consolidación del apagado):
+    cada entrada guarda el mtime/tamaño del historial y de la memoria (resúmenes que
+    escriben los trabajos de fondo) para invalidarse si cualquiera cambia luego.
+    """
+    blobs = []
+    index: Dict[str, Tuple[int, int, tuple]] = {}
+    offset = 0
+    for chat_id in chat_ids:
+        chat_id = str(chat_id)
+        try:
+            blob = pickle.dumps(build_session(chat_id), protocol=5)
+        except Exception as e:
+            safe_print(f"⚠️ [SNAPSHOT] Sesión {chat_id} omitida: {e}")
+            continue
+        index[chat_id] = (offset, len(blob), _sources_stat(chat_id))
+        blobs.append(blob)
+        offset += len(blob)
+
+    fingerprint = prompt_fingerprint.encode("utf-8")
+    index_blob = pickle.dumps(index, protocol=5)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, len(fingerprint), len(index_blob)))
+        f.write(fingerprint)
+        f.write(index_blob)
+        for blob in blobs:
+            f.write(blob)
+    os.replace(tmp_path, path)
+    return len(index)
+
+class SessionSnapshot:
+    """
+    Lectura perezosa del snapshot: al abrir solo se parsean cabecera e índice; cada
+    sesión se deserializa desde el mmap la primera vez que su chat la pide (y una sola vez).
+    """
+
+    def __init__(self, mapped: mmap.mmap, data_start: int, index: Dict):
+        self._mm = mapped
+        self._data_start = data_start
+        self._index = index
+        self._lock = threading.Lock()
+
+    @classmethod
+    def open(cls, prompt_fingerprint: str, path: str = SNAPSHOT_PATH) -> Optional["SessionSnapshot"]:
+        """Devuelve None si no hay snapshot, si es de otra versión o si el prompt del sistema cambió."""
+        if not os.path.exists(path) or os.path.getsize(path) < _HEADER.size:
+            return None
+        try:
+            with open(path, "rb") as f:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            magic, version, fp_len, index_len = _HEADER.unpack_from(mapped, 0)
+            if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION:
+                mapped.close()
+                return None
+            fp_start = _HEADER.size
+            if bytes(mapped[fp_start:fp_start + fp_len]).decode("utf-8") != prompt_fingerprint:
+                mapped.close()
+                return None
+            index_start = fp_start + fp_len
+            index = pickle.loads(mapped[index_start:index_start + index_len])
+            return cls(mapped, index_start + index_len, index)
+        except Exception as e:
+            safe_print(f"⚠️ [SNAPSHOT] Snapshot ilegible, se ignora: {e}")
+            return None
+
+    def __contains__(self, chat_id) -> bool:
+        return str(chat_id) in self._index
+
+    def __len__(self):
+        return len(self._index)
+
+    def take(self, chat_id) -> Optional[list]:
+        """Sesión del chat si su historial y su memoria no cambiaron desde el snapshot; None en otro caso."""
+        with self._lock:
+            entry = self._index.pop(str(chat_id), None)
+            if entry is None:
+                return None
+            offset, length, stat = entry
+            if stat != _sources_stat(chat_id):
+                return None  # Historial o memoria cambiaron (mantenimiento, resúmenes de fondo): reconstruir
+            start = self._data_start + offset
+            return pickle.loads(self._mm[start:start + length])
+
+    def close(self):
+        with self._lock:
+            self._index.clear()
+            self._mm.close()
@@ -0,0 +1,210 @@
+import json
+import os
+import time
+from threading import Lock
+from typing import Dict, List, Optional
+
+USERS_DIR = "./assets/users"
+TEMPLATE_STEM = "template"
+
+def _split_stem(stem: str):
+    """'juan.perez.2' -> ('juan.perez', 2); 'juan.perez' -> ('juan.perez', 0)."""
+    base, _, suffix = stem.rpartition(".")
+    if base and suffix.isdigit():
+        return base, int(suffix)
+    return stem, 0
+
+class UserIndex:
+    """
+    Índice en memoria del directorio de usuarios.
+
+    Mantiene nombre -> archivo, el contador de homónimos por nombre base y una caché
+    de perfiles públicos (parseados y serializados). Los datos privados nunca se
+    cachean. Se construye una vez (en el primer uso) y se mantiene
+    consistente en cada escritura hecha a través de las herramientas. Opcionalmente
+    detecta cambios externos comparando mtimes cada `poll_seconds` (sin inotify).
+    """
+
+    def __init__(self, users_dir: str = USERS_DIR, poll_seconds: Optional[float] = None):
+        self.users_dir = users_dir
+        if poll_seconds is None:
+            poll_seconds = float(os.getenv("USER_INDEX_POLL_SECONDS", "0"))
+        self.poll_seconds = poll_seconds
+        self.entries: Dict[str, str] = {}  # stem -> ruta del ledger
+        self.counters: Dict[str, int] = {}  # nombre base -> mayor sufijo usado
+        self.public_profiles: Dict[str, dict] = {}
+        self.public_views: Dict[str, dict] = {}  # respuesta PUBLIC ya armada
+        self._profile_mtimes: Dict[str, Optional[int]] = {}
+        self._generations: Dict[str, int] = {}  # se incrementa en cada escritura
+        self._sorted_users: Optional[List[str]] = None
+        self._built = False
+        self._dir_mtime: Optional[int] = None
+        self._last_poll = 0.0
+        self._lock = Lock()
+
+    # --- Construcción y sincronización ---
+    def _path_for(self, stem: str) -> str:
+        return os.path.join(self.users_dir, f"{stem}.ledger")
+
+    def _register_locked(self, stem: str):
+        self.entries[stem] = self._path_for(stem)
+        base, counter = _split_stem(stem)
+        if counter > self.counters.get(base, -1):
+            self.counters[base] = counter
+        self._sorted_users = None
+
+    def _build_locked(self):
+        self.entries.clear()
+        self.counters.clear()
+        self.public_profiles.clear()
+        self.public_views.clear()
+        self._profile_mtimes.clear()
+        self._sorted_users = None
+        if os.path.isdir(self.users_dir):
+            self._dir_mtime = os.stat(self.users_dir).st_mtime_ns
+            for entry in os.scandir(self.users_dir):
+                if entry.name.endswith(".ledger"):
+                    self._register_locked(entry.name[:-len(".ledger")])
+        self._built = True
+        self._last_poll = time.monotonic()
+
+    def build(self):
+        """(Re)construye el índice leyendo el directorio una sola vez."""
+        with self._lock:
+            self._build_locked()
+
+    def _poll_locked(self):
+        """Detecta cambios externos por mtime (directorio y perfiles cacheados)."""
+        now = time.monotonic()
+        if now - self._last_poll < self.poll_seconds:
+            return
+        self._last_poll = now
+        try:
+            dir_mtime = os.stat(self.users_dir).st_mtime_ns
+        except OSError:
+            dir_mtime = None
+        if dir_mtime != self._dir_mtime:
+            self._build_locked()
+            return
+        for stem, cached_mtime in list(self._profile_mtimes.items()):
+            if self._file_mtime(self.entries.get(stem, "")) != cached_mtime:
+                self._drop_profile_locked(stem)
+
+    def _ensure_fresh_locked(self):
+        if not self._built:
+            self._build_locked()
+        elif self.poll_seconds > 0:
+            self._poll_locked()
+
+    @staticmethod
+    def _file_mtime(path: str) -> Optional[int]:
+        try:
+            return os.stat(path).st_mtime_ns
+        except OSError:
+            return None
+
+    # --- Consultas ---
+    def list_users(self) -> List[str]:
+        with self._lock:
+            self._ensure_fresh_locked()
+            if self._sorted_users is None:
+                self._sorted_users = sorted(s for s in self.entries if s != TEMPLATE_STEM)
+            return list(self._sorted_users)
+
+    def resolve(self, user: str) -> Optional[str]:
+        """Devuelve la ruta del ledger del usuario o None si no existe."""
+        with self._lock:
+            self._ensure_fresh_locked()
+            path = self.entries.get(user)
+            if path is not None:
+                return path
+            # Archivo creado por fuera de las herramientas: se incorpora al índice
+            candidate = self._path_for(user)
+            if os.path.exists(candidate):
+                self._register_locked(user)
+                return candidate
+            return None
+
+    def load(self, user: str) -> Optional[dict]:
+        """Lee y parsea el ledger completo (sin caché: puede contener datos privados)."""
+        path = self.resolve(user)
+        if path is None:
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def get_public_profile(self, user: str) -> Optional[dict]:
+        """Perfil público cacheado; solo lee el disco en el primer acceso o tras una escritura."""
+        with self._lock:
+            self._ensure_fresh_locked()
+            if user in self.public_profiles:
+                return self.public_profiles[user]
+            generation = self._generations.get(user, 0)
+        data = self.load(user)
+        if data is None:
+            return None
+        profile = data.get("public_profile", {})
+        with self._lock:
+            # Si hubo una escritura mientras leíamos, no cacheamos una versión vieja
+            if self._generations.get(user, 0) == generation:
+                self.public_profiles[user] = profile
+                self._profile_mtimes[user] = self._file_mtime(self._path_for(user))
+        return profile
+
+    def get_public_view(self, user: str) -> Optional[dict]:
+        """
+        Respuesta PUBLIC de read_ledger armada una sola vez por versión del perfil (no
+        modificar); el codificador de resultados la serializa una vez por llamada.
+        Las vistas privadas no pasan por aquí: nunca se guardan en caché.
+        """
+        with self._lock:
+            self._ensure_fresh_locked()
+            view = self.public_views.get(user)
+            if view is not None:
+                return view
+            generation = self._generations.get(user, 0)
+        profile = self.get_public_profile(user)
+        if profile is None:
+            return None
+        view = {
+            "authorized": True,
+            "scope_delivered": "PUBLIC",
+            "profile": profile
+        }
+        with self._lock:
+            if self._generations.get(user, 0) == generation:
+                self.public_views[user] = view
+        return view
+
+    # --- Escrituras ---
+    def reserve_filename(self, base: str) -> str:
+        """Reserva el siguiente nombre libre para un homónimo: juan.perez, juan.perez.1, ..."""
+        with self._lock:
+            self._ensure_fresh_locked()
+            if base not in self.entries:
+                stem = base
+            else:
+                stem = f"{base}.{self.counters.get(base, 0) + 1}"
+            self._register_locked(stem)
+            return stem
+
+    def discard(self, stem: str):
+        """Libera una reserva cuyo archivo no llegó a escribirse."""
+        with self._lock:
+            if self.entries.pop(stem, None) is not None:
+                self._sorted_users = None
+            self._drop_profile_locked(stem)
+
+    def _drop_profile_locked(self, user: str):
+        self._generations[user] = self._generations.get(user, 0) + 1
+        self.public_profiles.pop(user, None)
+        self.public_views.pop(user, None)
+        self._profile_mtimes.pop(user, None)
+
+    def invalidate(self, user: str):
+        """Descarta la información cacheada de un usuario tras una escritura."""
+        with self._lock:
+            self._drop_profile_locked(user)
+
+# Instancia global compartida por las herramientas de usuario
+user_index = UserIndex()
@@ -4,9 +4,13 @@ import os
 from datetime import datetime
 from .base import BaseProducer
 from src.core.models import Message
-from src.tools.telegram_tool import telegram_receive
 from src.core.logger import safe_print
 
+def telegram_receive(**kwargs):
+    """Import diferido de telegram_tool (carga requests y registra herramientas) hasta el primer polling."""
+    from src.tools.telegram_tool import telegram_receive as receive
+    return receive(**kwargs)
+
 class TelegramProducer(BaseProducer):
     """Productor que realiza polling a la API de Telegram."""
     
@@ -0,0 +1,296 @@
+"""
+Memoria de recuperación (recall) sobre historiales y ledgers.
+
+Cada archivo fuente (historial de un chat, ledger de ciudad, usuario o grupo) se divide
+en fragmentos con id estable (hash del contenido). Al refrescar una fuente solo se
+calculan embeddings de los fragmentos nuevos y se borran los que ya no existen.
+La consulta nunca toca el disco ni calcula embeddings de fuentes: cada fuente se indexa
+como trabajo de fondo tras escribirse (historial tras cada guardado, ledgers desde sus
+herramientas de escritura) y al arrancar un refresco completo por mtime recoge los
+cambios hechos mientras el bot estaba apagado. El archivo del índice se escribe una vez
+por tanda (un trabajo de guardado coalescido), no por cada fuente.
+
+Alcance: los fragmentos de historial y de ledger de grupo solo se recuperan desde su
+propio chat; de los usuarios solo se indexa el perfil público.
+"""
+import hashlib
+import json
+import os
+import pickle
+import threading
+from concurrent.futures import Future
+from typing import Any, Dict, List, Optional, Tuple
+from src.core.jobs import JOB_PRIORITY_LOW, background_jobs
+from src.core.logger import safe_print
+from src.core.persistence import history_manager
+from src.core.persistence.group_ledger import journal_path_for, load_group_ledger
+from src.core.vector_index import VectorIndex, get_embedder
+
+RECALL_INDEX_PATH = "assets/system/recall_index.bin"
+LEDGER_DIRS = {"city": "./assets/cities", "user": "./assets/users", "group": "./assets/groups"}
+CHUNK_CHARS = 800
+SNIPPET_CHARS = 300
+
+Chunk = Tuple[str, str, Dict[str, Any]]  # (id, texto, metadatos)
+
+def _chunk_id(prefix: str, text: str) -> str:
+    return f"{prefix}:{hashlib.sha1(text.encode('utf-8')).hexdigest()[:16]}"
+
+def _split(text: str) -> List[str]:
+    return [text[i:i + CHUNK_CHARS] for i in range(0, len(text), CHUNK_CHARS)] or [""]
+
+def _flatten(value) -> str:
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+    return str(value)
+
+def history_chunks(chat_id: str, messages: List[dict]) -> List[Chunk]:
+    chunks = []
+    for msg in messages:
+        if not msg.get("content"):
+            continue
+        for part in _split(f"{msg['role'].upper()}: {msg['content']}"):
+            chunks.append((_chunk_id(f"history:{chat_id}", part), part, {"source": "history", "chat_id": chat_id}))
+    return chunks
+
+def ledger_chunks(kind: str, name: str, data: Dict[str, Any]) -> List[Chunk]:
+    """Ciudades: un fragmento por lugar. Usuarios: perfil público por sección. Grupos: por clave."""
+    meta = {"source": kind, {"city": "city", "user": "user", "group": "group_id"}[kind]: name}
+    texts = []
+    if kind == "city":
+        city_data = data.get(name, data) if isinstance(data, dict) else {}
+        for category, items in city_data.items():
+            for item in items if isinstance(items, list) else []:
+                if isinstance(item, dict):
+                    details = "; ".join(f"{k}: {_flatten(v)}" for k, v in item.items() if k != "nombre")
+                    texts.append(f"Ciudad {name} | {category} | {item.get('nombre', '')}: {details}")
+    elif kind == "user":
+        for section, value in (data.get("public_profile") or {}).items():
+            texts.append(f"Usuario {name} | {section}: {_flatten(value)}")
+    else:
+        for key, value in data.items():
+            texts.append(f"Grupo {name} | {key}: {_flatten(value)}")
+    return [(_chunk_id(f"{kind}:{name}", part), part, meta) for text in texts for part in _split(text)]
+
+class RecallIndex:
+    """Índice vectorial de fragmentos con refresco incremental por fuente y persistencia atómica."""
+
+    def __init__(self, embedder=None, path: Optional[str] = RECALL_INDEX_PATH):
+        self.embedder = embedder
+        self.path = path
+        self.index = VectorIndex()
+        self.source_mtimes: Dict[str, Any] = {}
+        self.source_chunks: Dict[str, List[str]] = {}
+        self._loaded = False
+        self._dirty = False
+        self._lock = threading.RLock()
+
+    # --- Carga y persistencia ---
+    def _ensure_loaded(self):
+        if self._loaded:
+            return
+        self._loaded = True
+        if self.embedder is None:
+            self.embedder = get_embedder()
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "rb") as f:
+                state = pickle.load(f)
+            if state.get("embedder") != self.embedder.name:
+                return  # Otro proveedor: los vectores no son comparables, se reindexa
+            self.index = VectorIndex.from_state(state["index"])
+            self.source_mtimes = state["source_mtimes"]
+            self.source_chunks = state["source_chunks"]
+        except Exception as e:
+            safe_print(f"⚠️ [RECALL] Índice en disco ilegible, se reconstruye: {e}")
+
+    def _save(self):
+        if not self.path:
+            return
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump({"embedder": self.embedder.name, "index": self.index.export_state(),
+                         "source_mtimes": self.source_mtimes, "source_chunks": self.source_chunks}, f, protocol=5)
+        os.replace(tmp_path, self.path)
+
+    def flush(self) -> bool:
+        """Escribe el índice si hubo cambios desde la última escritura."""
+        with self._lock:
+            if not self._dirty:
+                return False
+            self._save()
+            self._dirty = False
+            return True
+
+    def _persist(self):
+        """Una escritura por tanda: con el pool activo, los guardados en cola se coalescen."""
+        if background_jobs.running:
+            background_jobs.submit(self.flush, key="recall:flush", priority=JOB_PRIORITY_LOW)
+        else:
+            self.flush()
+
+    # --- Fuentes ---
+    def _source_path(self, kind: str, name: str) -> str:
+        if kind == "history":
+            return os.path.join(history_manager.HISTORY_DIR, f"{name}.json")
+        return os.path.join(LEDGER_DIRS[kind], f"{name}.ledger")
+
+    def _sources(self) -> Dict[str, Tuple[str, str, str]]:
+        """source_key -> (tipo, nombre, ruta) de todos los archivos indexables en disco."""
+        sources = {}
+        history_dir = history_manager.HISTORY_DIR
+        if os.path.isdir(history_dir):
+            for entry in os.scandir(history_dir):
+                if entry.is_file() and entry.name.endswith(".json"):
+                    chat_id = entry.name[:-len(".json")]
+                    sources[f"history:{chat_id}"] = ("history", chat_id, entry.path)
+        for kind, directory in LEDGER_DIRS.items():
+            if not os.path.isdir(directory):
+                continue
+            for entry in os.scandir(directory):
+                if entry.name.endswith(".ledger") and entry.name != "template.ledger":
+                    name = entry.name[:-len(".ledger")]
+                    sources[f"{kind}:{name}"] = (kind, name, entry.path)
+        return sources
+
+    @staticmethod
+    def _version(kind: str, path: str):
+        """mtime de la fuente; en grupos también el del diario de parches (cambia en cada update)."""
+        mtime = os.stat(path).st_mtime_ns
+        if kind != "group":
+            return mtime
+        try:
+            return mtime, os.stat(journal_path_for(path)).st_mtime_ns
+        except OSError:
+            return mtime, None
+
+    def _chunks_for(self, kind: str, name: str, path: str) -> List[Chunk]:
+        if kind == "group":
+            return ledger_chunks(kind, name, load_group_ledger(path, name)[0])
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if kind == "history":
+            return history_chunks(name, data)
+        return ledger_chunks(kind, name, data)
+
+    def _refresh_source_locked(self, key: str, kind: str, name: str, path: str) -> bool:
+        try:
+            mtime = self._version(kind, path)
+        except OSError:
+            return False
+        if self.source_mtimes.get(key) == mtime:
+            return False
+        try:
+            chunks = self._chunks_for(kind, name, path)
+        except (OSError, ValueError) as e:
+            # Se recuerda el mtime para no reintentar (ni avisar) hasta que el archivo cambie
+            self.source_mtimes[key] = mtime
+            safe_print(f"⚠️ [RECALL] No se pudo indexar {path}: {e}")
+            return False
+
+        fresh = [chunk for chunk in chunks if chunk[0] not in self.index]
+        if fresh:
+            vectors = self.embedder.embed([text for _, text, _ in fresh])
+            for (doc_id, text, meta), vector in zip(fresh, vectors):
+                self.index.upsert(doc_id, vector, {**meta, "text": text})
+        current = [doc_id for doc_id, _, _ in chunks]
+        for doc_id in set(self.source_chunks.get(key, [])) - set(current):
+            self.index.delete(doc_id)
+        self.source_chunks[key] = current
+        self.source_mtimes[key] = mtime
+        return True
+
+    def _drop_source_locked(self, key: str):
+        for doc_id in self.source_chunks.pop(key, []):
+            self.index.delete(doc_id)
+        self.source_mtimes.pop(key, None)
+
+    def refresh(self) -> int:
+        """Sincroniza con el disco: solo reprocesa las fuentes cuyo mtime cambió (trabajo de fondo)."""
+        with self._lock:
+            self._ensure_loaded()
+            sources = self._sources()
+            changed = sum(self._refresh_source_locked(key, *source) for key, source in sources.items())
+            for key in set(self.source_chunks) - set(sources):
+                self._drop_source_locked(key)
+                changed += 1
+            self._dirty = self._dirty or bool(changed)
+        if changed:
+            self._persist()
+        return changed
+
+    def upsert_source(self, kind: str, name) -> bool:
+        """Upsert incremental de una fuente recién escrita (o su baja si ya no existe)."""
+        name = str(name)
+        key = f"{kind}:{name}"
+        path = self._source_path(kind, name)
+        with self._lock:
+            self._ensure_loaded()
+            if os.path.exists(path):
+                if not self._refresh_source_locked(key, kind, name, path):
+                    return False
+            elif key in self.source_chunks:
+                self._drop_source_locked(key)
+            else:
+                return False
+            self._dirty = True
+        self._persist()
+        return True
+
+    def upsert_history(self, chat_id) -> bool:
+        """Upsert incremental del historial de un chat (llamado tras guardarlo)."""
+        return self.upsert_source("history", chat_id)
+
+    # --- Consulta ---
+    def search(self, query: str, k: int = 5, chat_id=None, sources: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """
+        Top-k fragmentos visibles desde `chat_id` (historial y grupo propios, ciudades, perfiles
+        públicos). Solo consulta el índice en memoria: un embedding de la consulta y el producto punto.
+        """
+        with self._lock:
+            self._ensure_loaded()
+        chat_id = str(chat_id) if chat_id is not None else None
+
+        def visible(payload):
+            source = payload["source"]
+            if sources and source not in sources:
+                return False
+            if source == "history":
+                return payload["chat_id"] == chat_id
+            if source == "group":
+                return payload["group_id"] == chat_id
+            return True
+
+        vector = self.embedder.embed([query])[0]
+        hits = []
+        for score, doc_id in self.index.search(vector, k=k, where=visible):
+            payload = self.index.payloads[doc_id]
+            hit = {key: value for key, value in payload.items() if key != "text"}
+            hit["score"] = round(score, 4)
+            hit["texto"] = payload["text"][:SNIPPET_CHARS]
+            hits.append(hit)
+        return hits
+
+def recall_enabled() -> bool:
+    return os.getenv("RECALL_INDEX", "true").lower() == "true"
+
+def schedule_source_upsert(kind: str, name) -> Optional[Future]:
+    """Indexa una fuente recién escrita como trabajo de fondo (si el pool está activo)."""
+    if not recall_enabled() or not background_jobs.running:
+        return None
+    return background_jobs.submit(recall_index.upsert_source, kind, name, key=f"recall:{kind}:{name}",
+                                  priority=JOB_PRIORITY_LOW)
+
+def schedule_history_upsert(chat_id) -> Optional[Future]:
+    return schedule_source_upsert("history", chat_id)
+
+def schedule_recall_refresh() -> Optional[Future]:
+    """Refresco completo por mtime (al arrancar): recoge cambios hechos con el bot apagado."""
+    if not recall_enabled() or not background_jobs.running:
+        return None
+    return background_jobs.submit(recall_index.refresh, key="recall:refresh", priority=JOB_PRIORITY_LOW)
+
+# Instancia global (el proveedor de embeddings y el índice en disco se cargan en el primer uso)
+recall_index = RecallIndex()
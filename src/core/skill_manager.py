@@ -1,9 +1,13 @@
 
 import importlib
+import os
 import sys
+import threading
+import time
 from typing import Dict, List, Optional
-from src.tools.registry import tool, tool_registry
+from src.tools.registry import tool, tool_registry, ToolSchemaBundle
 from src.core.logger import safe_print
+from src.core.utils import debug_print
 
 # Mapeo de Skills a módulos de herramientas
 SKILL_MAP: Dict[str, List[str]] = {
@@ -22,23 +26,40 @@ SKILL_MAP: Dict[str, List[str]] = {
     ],
     "system": [
         "src.tools.system_tools"
+    ],
+    "memory": [
+        "src.tools.recall_tools"
     ]
 }
 
 class SkillManager:
-    """Gestiona la carga dinámica de grupos de herramientas (Skills)."""
+    """
+    Gestiona la carga dinámica de grupos de herramientas (Skills).
+
+    Importar los módulos es global al proceso, pero qué skills se anuncian al LLM
+    se decide por chat: cada chat solo recibe los esquemas de los skills que activó,
+    y un skill sin uso durante `idle_seconds` deja de anunciarse en ese chat.
+    """
     
-    def __init__(self):
-        self.active_skills: List[str] = []
+    def __init__(self, idle_seconds: Optional[float] = None):
+        self.active_skills: List[str] = []  # Skills con módulos ya cargados (en cualquier chat)
         self.loaded_modules: List[str] = []
+        if idle_seconds is None:
+            idle_seconds = float(os.getenv("SKILL_IDLE_MINUTES", "30")) * 60
+        self.idle_seconds = idle_seconds
+        self.chat_skills: Dict[str, Dict[str, float]] = {}  # chat_id -> {skill: último uso (monotonic)}
+        self._skill_by_module = {module: skill for skill, modules in SKILL_MAP.items() for module in modules}
+        self._lock = threading.Lock()
 
-    def activate_skill(self, skill_name: str) -> bool:
-        """Carga los módulos asociados a un skill si no están ya cargados."""
+    def activate_skill(self, skill_name: str, chat_id=None) -> bool:
+        """Carga los módulos asociados a un skill si no están ya cargados y lo activa para `chat_id`."""
         if skill_name not in SKILL_MAP:
             safe_print(f"⚠️ Skill desconocido: {skill_name}")
             return False
         
         if skill_name in self.active_skills:
+            if chat_id is not None:
+                self._mark_used(chat_id, skill_name)
             return True
         
         safe_print(f"🧠 Activando skill: {skill_name}...")
@@ -57,15 +78,54 @@ class SkillManager:
         
         if success:
             self.active_skills.append(skill_name)
+            if chat_id is not None:
+                self._mark_used(chat_id, skill_name)
             return True
         return False
 
+    def _mark_used(self, chat_id, skill_name: str):
+        with self._lock:
+            self.chat_skills.setdefault(str(chat_id), {})[skill_name] = time.monotonic()
+
+    def skills_for(self, chat_id) -> List[str]:
+        """Skills activos en un chat; los inactivos por más de `idle_seconds` se desactivan aquí."""
+        now = time.monotonic()
+        with self._lock:
+            skills = self.chat_skills.get(str(chat_id), {})
+            expired = [name for name, last_used in skills.items() if now - last_used > self.idle_seconds]
+            for name in expired:
+                del skills[name]
+            active = list(skills)
+        if expired:
+            debug_print(f"💤 Skills desactivados por inactividad en {chat_id}: {', '.join(expired)}")
+        return active
+
+    def skill_for_tool(self, tool_name: str) -> Optional[str]:
+        """Skill al que pertenece una herramienta (None para las herramientas base)."""
+        return self._skill_by_module.get(tool_registry.tool_modules.get(tool_name))
+
+    def note_tool_use(self, chat_id, tool_name: str):
+        """Usar una herramienta mantiene vivo (o reactiva) su skill en el chat."""
+        skill = self.skill_for_tool(tool_name)
+        if skill and chat_id is not None:
+            self._mark_used(chat_id, skill)
+
+    def get_tool_list(self, chat_id=None) -> ToolSchemaBundle:
+        """Esquemas a enviar para un chat: herramientas base + skills activos del chat."""
+        if chat_id is None:
+            return tool_registry.get_tool_list()
+        active = set(self.skills_for(chat_id))
+        excluded = frozenset(
+            module for skill, modules in SKILL_MAP.items() if skill not in active for module in modules
+        )
+        return tool_registry.get_tool_list(exclude_modules=excluded)
+
 # Instancia global del SkillManager
 skill_manager = SkillManager()
 
 # Registro de la herramienta maestra
 @tool({
-    "description": "Activa un grupo de herramientas (Skill) específico para que el agente pueda usarlas. Usa esto cuando necesites realizar tareas que requieren herramientas no disponibles actualmente (ej: búsquedas web, gestión de telegram, utilidades).",
+    "description": "Activa un grupo de herramientas (Skill) específico en esta conversación para que el agente pueda usarlas. Usa esto cuando necesites realizar tareas que requieren herramientas no disponibles actualmente (ej: búsquedas web, gestión de telegram, utilidades).",
     "parameters": {
         "type": "object",
         "properties": {
@@ -78,9 +138,11 @@ skill_manager = SkillManager()
         "required": ["skill_name"]
     }
 })
-def request_skill_activation(skill_name: str) -> str:
-    """Herramienta llamada por el LLM para activar capacidades extra."""
-    if skill_manager.activate_skill(skill_name):
+def request_skill_activation(skill_name: str, **kwargs) -> str:
+    """Herramienta llamada por el LLM para activar capacidades extra en el chat actual."""
+    context = kwargs.get('context')
+    chat_id = context.chat_id if context else None
+    if skill_manager.activate_skill(skill_name, chat_id=chat_id):
         return f"Skill '{skill_name}' activado con éxito. Ahora tienes nuevas herramientas disponibles."
     else:
         return f"Error al intentar activar el skill '{skill_name}'. Revisa el nombre del skill."
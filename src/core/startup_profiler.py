@@ -0,0 +1,229 @@
+"""
+Perfil de arranque en frío de Andrew Martin.
+
+Uso:
+    python -m src.core.startup_profiler [--output reporte.json] [--budget-ms 1000]
+
+Lanza un intérprete limpio con `-X importtime` en un directorio temporal (los
+assets reales no se tocan), importa main.py, construye el registro completo de
+herramientas, carga el ChatRegistry y procesa un primer mensaje con un LLM simulado.
+Emite un reporte JSON y sale con código 1 si se excede el presupuesto.
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+REPORT_VERSION = 1
+
+# --- Análisis de -X importtime ---
+
+def parse_importtime(stderr: str) -> List[Dict]:
+    """
+    Convierte la salida de -X importtime en nodos {module, self_us, cumulative_us, children}.
+    Python imprime cada módulo después de sus hijos, con dos espacios de sangría por nivel.
+    """
+    pending: Dict[int, List[Dict]] = {}
+    roots: List[Dict] = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        fields = line[len("import time:"):].split("|")
+        if len(fields) != 3:
+            continue
+        raw_name = fields[2]
+        module = raw_name.strip()
+        depth = (len(raw_name) - len(raw_name.lstrip(" ")) - 1) // 2
+        node = {
+            "module": module,
+            "self_us": int(fields[0]),
+            "cumulative_us": int(fields[1]),
+            "children": pending.pop(depth + 1, []),
+        }
+        if depth == 0:
+            roots.append(node)
+        else:
+            pending.setdefault(depth, []).append(node)
+    return roots
+
+def _is_project_module(module: str) -> bool:
+    return module == "main" or module.startswith("src.") or module == "src"
+
+def _package_of(module: str) -> str:
+    """src.core.persistence.extractor -> src.core.persistence; src.tools.x -> src.tools."""
+    if module in ("main", "src"):
+        return module
+    parts = module.split(".")
+    return ".".join(parts[:-1]) if len(parts) > 2 else module
+
+def attribute_imports(roots: List[Dict]) -> Dict:
+    """
+    Atribuye el tiempo propio de cada import al módulo del proyecto más cercano que lo
+    provocó: p. ej. el costo de `openai` se carga a quien lo importó desde src.*.
+    """
+    by_module: Dict[str, float] = {}
+    external: Dict[str, float] = {}
+    total_us = 0
+
+    def walk(node, owner):
+        nonlocal total_us
+        module = node["module"]
+        if _is_project_module(module):
+            owner = module
+        total_us += node["self_us"]
+        if owner is not None:
+            by_module[owner] = by_module.get(owner, 0) + node["self_us"]
+        if not _is_project_module(module) and owner is not None:
+            top = module.split(".")[0]
+            external[top] = external.get(top, 0) + node["self_us"]
+        for child in node["children"]:
+            walk(child, owner)
+
+    for root in roots:
+        walk(root, None)
+
+    by_package: Dict[str, float] = {}
+    for module, us in by_module.items():
+        package = _package_of(module)
+        by_package[package] = by_package.get(package, 0) + us
+
+    def ms(mapping, limit=None):
+        items = sorted(mapping.items(), key=lambda kv: kv[1], reverse=True)[:limit]
+        return {k: round(v / 1000, 2) for k, v in items}
+
+    return {
+        "total_ms": round(total_us / 1000, 2),
+        "project_attributed_ms": round(sum(by_module.values()) / 1000, 2),
+        "by_package": ms(by_package),
+        "by_module": ms(by_module, limit=20),
+        "external": ms(external, limit=15),  # stdlib y terceros, por paquete de primer nivel
+    }
+
+# --- Proceso hijo (lo que realmente arranca) ---
+
+class _FakeCompletions:
+    def create(self, **kwargs):
+        from types import SimpleNamespace
+        message = SimpleNamespace(role="assistant", content="ok", tool_calls=None, reasoning_content=None)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=None)
+
+class _FakeLLM:
+    def __init__(self):
+        from types import SimpleNamespace
+        self.chat = SimpleNamespace(completions=_FakeCompletions())
+
+def _child(output_path: str):
+    start = time.perf_counter()
+    import main  # noqa: F401  (cuenta para el tiempo de imports)
+    imported = time.perf_counter()
+
+    from src.core.skill_manager import SKILL_MAP, skill_manager
+    from src.tools.registry import tool_registry
+    for skill in SKILL_MAP:
+        skill_manager.activate_skill(skill)
+    bundle = tool_registry.get_tool_list()
+    registry_built = time.perf_counter()
+
+    from src.core.persistence.chat_registry import ChatRegistry
+    chats = ChatRegistry.get_all()
+    registry_loaded = time.perf_counter()
+
+    import threading
+    from src.core.models import Message
+    main.client = _FakeLLM()
+    threading.Thread(target=main.main_worker, daemon=True).start()
+    enqueued = time.perf_counter()
+    main.message_queue.put(Message(priority=2, content="hola", source="keyboard", user_id="profiler", chat_id="profiler"))
+    main.message_queue.join()
+    processed = time.perf_counter()
+
+    report = {
+        "main_import_ms": round((imported - start) * 1000, 2),
+        "tool_registry": {
+            "build_ms": round((registry_built - imported) * 1000, 2),
+            "tools": len(bundle),
+            "schema_bytes": bundle.size_bytes,
+            "schema_version": bundle.version,
+        },
+        "chat_registry": {"first_load_ms": round((registry_loaded - registry_built) * 1000, 2), "chats": len(chats)},
+        "first_message": {
+            "processing_ms": round((processed - enqueued) * 1000, 2),
+            # Sin contar la construcción del registro completo, que en producción es perezosa
+            "time_to_first_message_ms": round(((imported - start) + (processed - enqueued)) * 1000, 2),
+        },
+    }
+    with open(output_path, "w", encoding="utf-8") as f:
+        json.dump(report, f)
+
+# --- Proceso padre ---
+
+def profile_startup(budget_ms: Optional[float] = None) -> Dict:
+    """Ejecuta el arranque perfilado en un intérprete limpio y devuelve el reporte."""
+    if budget_ms is None:
+        budget_ms = float(os.getenv("STARTUP_BUDGET_MS", "1000"))
+    with tempfile.TemporaryDirectory(prefix="startup-profile-") as workdir:
+        registry_file = os.path.join(ROOT, "assets", "system", "chat_registry.json")
+        if os.path.exists(registry_file):
+            os.makedirs(os.path.join(workdir, "assets", "system"))
+            shutil.copy(registry_file, os.path.join(workdir, "assets", "system"))
+
+        child_report = os.path.join(workdir, "child_report.json")
+        env = {**os.environ, "PYTHONPATH": ROOT, "DEEPSEEK_API_KEY": os.getenv("DEEPSEEK_API_KEY") or "profiler"}
+        env.pop("TELEGRAM_BOT_TOKEN", None)
+        env.pop("APP_STATUS", None)
+        started = time.perf_counter()
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-m", "src.core.startup_profiler", "--child", child_report],
+            cwd=workdir, env=env, capture_output=True, text=True, stdin=subprocess.DEVNULL
+        )
+        wall_ms = round((time.perf_counter() - started) * 1000, 2)
+        if result.returncode != 0 or not os.path.exists(child_report):
+            raise RuntimeError(f"El arranque perfilado falló:\n{result.stderr[-2000:]}")
+        with open(child_report, "r", encoding="utf-8") as f:
+            report = json.load(f)
+
+    imports = attribute_imports(parse_importtime(result.stderr))
+    measured = report["first_message"]["time_to_first_message_ms"]
+    return {
+        "version": REPORT_VERSION,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": sys.version.split()[0],
+        "process_wall_ms": wall_ms,
+        "imports": imports,
+        **report,
+        "budget": {"metric": "time_to_first_message_ms", "limit_ms": budget_ms,
+                   "measured_ms": measured, "ok": measured <= budget_ms},
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Perfil de arranque en frío (imports, registro, primer mensaje).")
+    parser.add_argument("--output", help="Ruta del reporte JSON (por defecto, stdout).")
+    parser.add_argument("--budget-ms", type=float, default=None, help="Presupuesto para el primer mensaje (STARTUP_BUDGET_MS).")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        _child(args.child)
+        return 0
+
+    report = profile_startup(args.budget_ms)
+    payload = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(payload)
+    else:
+        print(payload)
+
+    budget = report["budget"]
+    status = "✅" if budget["ok"] else "❌"
+    print(f"{status} Primer mensaje a los {budget['measured_ms']:.0f} ms (presupuesto {budget['limit_ms']:.0f} ms)", file=sys.stderr)
+    return 0 if budget["ok"] else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
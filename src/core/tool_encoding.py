@@ -0,0 +1,78 @@
+import json
+import os
+import threading
+from typing import Any, Dict, Optional
+from src.core.performance import performance_logger
+from src.core.utils import estimate_tokens
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+_EMPTY = (None, "", [], {})
+
+def _dumps(value) -> str:
+    """JSON compacto: orjson si está instalado, si no json con separadores mínimos."""
+    if ORJSON_AVAILABLE:
+        try:
+            return orjson.dumps(value, default=str).decode("utf-8")
+        except TypeError:
+            pass  # p. ej. claves no str o enteros > 64 bits: lo resuelve json
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"), default=str)
+
+def _shrink(value, omit_empty: bool, key_aliases: Dict[str, str]):
+    if isinstance(value, dict):
+        return {key_aliases.get(k, k): _shrink(v, omit_empty, key_aliases)
+                for k, v in value.items() if not (omit_empty and v in _EMPTY)}
+    if isinstance(value, (list, tuple)):
+        return [_shrink(v, omit_empty, key_aliases) for v in value]
+    return value
+
+class ToolResultEncoder:
+    """
+    Capa única que convierte el resultado de una herramienta en el texto que ve el LLM.
+
+    - dict/list -> JSON compacto (antes llegaban como repr de Python). Las herramientas
+      de lectura devuelven la estructura y este es el único punto que la serializa.
+    - El texto se deja tal cual; otros tipos pasan por str().
+    - Opcional: omitir campos vacíos (`omit_empty`) y abreviar claves (`key_aliases`).
+    - Lleva la cuenta de llamadas, caracteres y tokens estimados por herramienta.
+    """
+
+    def __init__(self, omit_empty: Optional[bool] = None, key_aliases: Optional[Dict[str, str]] = None):
+        self.omit_empty = omit_empty if omit_empty is not None else \
+            os.getenv("TOOL_RESULT_OMIT_EMPTY", "false").lower() == "true"
+        self.key_aliases = dict(key_aliases or {})
+        self._stats: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+
+    def _encode_value(self, value: Any) -> str:
+        if self.omit_empty or self.key_aliases:
+            value = _shrink(value, self.omit_empty, self.key_aliases)
+        return _dumps(value)
+
+    def encode(self, tool_name: str, result: Any) -> str:
+        if isinstance(result, (dict, list, tuple)):
+            text = self._encode_value(result)
+        elif isinstance(result, str):
+            text = result
+        else:
+            text = str(result)
+
+        tokens = estimate_tokens(text)
+        with self._lock:
+            entry = self._stats.setdefault(tool_name, {"calls": 0, "chars": 0, "tokens": 0})
+            entry["calls"] += 1
+            entry["chars"] += len(text)
+            entry["tokens"] += tokens
+        performance_logger.log_metric(f"tool_result:{tool_name}", 0.0, {"chars": len(text), "tokens": tokens})
+        return text
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        with self._lock:
+            return {tool: dict(entry) for tool, entry in self._stats.items()}
+
+# Instancia global
+tool_result_encoder = ToolResultEncoder()
@@ -1,5 +1,7 @@
 import time
 import os
+import threading
+import unicodedata
 from functools import wraps
 from .performance import performance_logger
 
@@ -38,3 +40,35 @@ def debug_print(message: str):
     """
     if os.getenv("APP_STATUS") == "development":
         print(message)
+
+def normalize_text(text) -> str:
+    """
+    Normaliza un texto para comparaciones: minúsculas, sin tildes y con espacios colapsados.
+    Ej: "  Museo  La Tertulia " -> "museo la tertulia", "Bogotá" -> "bogota"
+    """
+    decomposed = unicodedata.normalize("NFKD", str(text).lower())
+    folded = "".join(c for c in decomposed if not unicodedata.combining(c))
+    return " ".join(folded.split())
+
+def estimate_tokens(text) -> int:
+    """Aproximación barata de tokens (~4 caracteres por token), sin depender de un tokenizador."""
+    return (len(text or "") + 3) // 4
+
+class KeyedLock:
+    """
+    Un Lock independiente por clave (ciudad, usuario, grupo...), creado bajo demanda.
+    Usage:
+        city_locks = KeyedLock()
+        with city_locks("cali"):
+            ...
+    """
+    def __init__(self):
+        self._locks = {}
+        self._guard = threading.Lock()
+
+    def __call__(self, key) -> threading.Lock:
+        with self._guard:
+            lock = self._locks.get(key)
+            if lock is None:
+                lock = self._locks[key] = threading.Lock()
+            return lock
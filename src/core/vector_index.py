@@ -0,0 +1,173 @@
+"""
+Índice vectorial local (búsqueda exacta por fuerza bruta) y proveedores de embeddings.
+
+- VectorIndex: vectores normalizados (producto punto = coseno) con upsert/delete por id.
+  Usa NumPy si está instalado; si no, un recorrido en Python puro con los mismos resultados.
+- HashingEmbedder: embeddings deterministas y sin red (hashing de palabras y n-gramas
+  de caracteres). Es el proveedor por defecto y el de las pruebas.
+- OpenAIEmbedder: cualquier endpoint compatible con /embeddings (EMBEDDING_BASE_URL).
+"""
+import heapq
+import math
+import os
+import re
+import threading
+import zlib
+from array import array
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+from src.core.utils import normalize_text
+
+_numpy_module = None
+
+def _numpy():
+    """Import diferido de NumPy (opcional): no se paga en el arranque."""
+    global _numpy_module
+    if _numpy_module is None:
+        try:
+            import numpy
+            _numpy_module = numpy
+        except ImportError:
+            _numpy_module = False
+    return _numpy_module or None
+
+def _normalize(vector: Sequence[float]) -> array:
+    norm = math.sqrt(sum(v * v for v in vector))
+    return array("f", (v / norm for v in vector) if norm else vector)
+
+# --- Proveedores de embeddings ---
+
+class HashingEmbedder:
+    """Bolsa de palabras y n-gramas de 4 caracteres proyectada por hashing estable (crc32)."""
+
+    def __init__(self, dim: int = 256):
+        self.dim = dim
+        self.name = f"hashing-{dim}"
+
+    def _features(self, text: str) -> Iterable[Tuple[str, float]]:
+        for word in re.findall(r"\w+", normalize_text(text)):
+            yield word, 1.0
+            padded = f" {word} "
+            for i in range(len(padded) - 3):
+                yield padded[i:i + 4], 0.5
+
+    def embed(self, texts: List[str]) -> List[array]:
+        vectors = []
+        for text in texts:
+            vector = [0.0] * self.dim
+            for feature, weight in self._features(text):
+                h = zlib.crc32(feature.encode("utf-8"))
+                vector[h % self.dim] += weight if (h >> 31) & 1 else -weight
+            vectors.append(_normalize(vector))
+        return vectors
+
+class OpenAIEmbedder:
+    """Embeddings remotos vía SDK de OpenAI (import diferido)."""
+
+    def __init__(self, model: str, api_key: Optional[str] = None, base_url: Optional[str] = None):
+        self.model = model
+        self.name = f"openai-{model}"
+        self._api_key = api_key
+        self._base_url = base_url
+        self._client = None
+
+    def embed(self, texts: List[str]) -> List[array]:
+        if self._client is None:
+            from openai import OpenAI
+            self._client = OpenAI(api_key=self._api_key, base_url=self._base_url)
+        response = self._client.embeddings.create(model=self.model, input=texts)
+        return [_normalize(item.embedding) for item in response.data]
+
+def get_embedder():
+    """Proveedor según EMBEDDING_PROVIDER ('hashing' por defecto, u 'openai')."""
+    if os.getenv("EMBEDDING_PROVIDER", "hashing").lower() == "openai":
+        return OpenAIEmbedder(
+            model=os.getenv("EMBEDDING_MODEL", "text-embedding-3-small"),
+            api_key=os.getenv("EMBEDDING_API_KEY") or os.getenv("OPENAI_API_KEY"),
+            base_url=os.getenv("EMBEDDING_BASE_URL") or None,
+        )
+    return HashingEmbedder(int(os.getenv("EMBEDDING_DIM", "256")))
+
+# --- Índice ---
+
+class VectorIndex:
+    """
+    Búsqueda exacta por producto punto sobre vectores normalizados. Cada id lleva un
+    payload (texto + metadatos) que se puede usar para filtrar en `search`.
+    Para el tamaño de este corpus (historiales acotados y ledgers) la fuerza bruta
+    responde en milisegundos, sin índices aproximados que mantener.
+    """
+
+    def __init__(self):
+        self._ids: List[str] = []
+        self._vectors: List[array] = []
+        self._position: Dict[str, int] = {}
+        self.payloads: Dict[str, Dict[str, Any]] = {}
+        self._matrix = None  # caché NumPy, se reconstruye tras cambios
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._ids)
+
+    def __contains__(self, doc_id: str) -> bool:
+        return doc_id in self._position
+
+    def upsert(self, doc_id: str, vector: Sequence[float], payload: Dict[str, Any]):
+        vector = vector if isinstance(vector, array) else array("f", vector)
+        with self._lock:
+            position = self._position.get(doc_id)
+            if position is None:
+                self._position[doc_id] = len(self._ids)
+                self._ids.append(doc_id)
+                self._vectors.append(vector)
+            else:
+                self._vectors[position] = vector
+            self.payloads[doc_id] = payload
+            self._matrix = None
+
+    def delete(self, doc_id: str):
+        with self._lock:
+            position = self._position.pop(doc_id, None)
+            if position is None:
+                return
+            # Se mueve el último a la posición liberada: borrado O(1)
+            last_id, last_vector = self._ids.pop(), self._vectors.pop()
+            if last_id != doc_id:
+                self._ids[position] = last_id
+                self._vectors[position] = last_vector
+                self._position[last_id] = position
+            self.payloads.pop(doc_id, None)
+            self._matrix = None
+
+    def _scores(self, query: Sequence[float]) -> List[float]:
+        np = _numpy()
+        if np is not None:
+            if self._matrix is None:
+                self._matrix = np.array(self._vectors, dtype=np.float32)
+            return (self._matrix @ np.asarray(query, dtype=np.float32)).tolist()
+        return [sum(a * b for a, b in zip(vector, query)) for vector in self._vectors]
+
+    def search(self, query: Sequence[float], k: int = 5,
+               where: Optional[Callable[[Dict[str, Any]], bool]] = None) -> List[Tuple[float, str]]:
+        """Top-k (score, id) por similitud coseno, opcionalmente filtrando por payload."""
+        with self._lock:
+            if not self._ids:
+                return []
+            scored = zip(self._scores(query), self._ids)
+            if where is not None:
+                scored = ((s, i) for s, i in scored if where(self.payloads[i]))
+            return heapq.nlargest(k, scored, key=lambda item: item[0])
+
+    # --- Persistencia (estado plano, apto para pickle) ---
+    def export_state(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"ids": list(self._ids), "vectors": [v.tobytes() for v in self._vectors],
+                    "payloads": dict(self.payloads)}
+
+    @classmethod
+    def from_state(cls, state: Dict[str, Any]) -> "VectorIndex":
+        index = cls()
+        for doc_id, raw in zip(state["ids"], state["vectors"]):
+            vector = array("f")
+            vector.frombytes(raw)
+            index.upsert(doc_id, vector, state["payloads"][doc_id])
+        return index
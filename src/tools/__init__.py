@@ -4,10 +4,11 @@ Tools package for Andrew Martin assistant.
 Only exports the registry and decorator to allow lazy loading of actual tool modules.
 """
 
-from .registry import ToolRegistry, tool_registry, tool
+from .registry import ToolRegistry, ToolSchemaBundle, tool_registry, tool
 
 __all__ = [
     "ToolRegistry",
+    "ToolSchemaBundle",
     "tool_registry",
     "tool",
 ]
\ No newline at end of file
@@ -0,0 +1,196 @@
+# tools/city_search.py
+
+"""
+Índice invertido en memoria sobre los ledgers de ciudades.
+
+Permite responder "¿qué ciudad tiene una buena pizzería?" con una sola consulta
+en lugar de leer cada ledger completo. Los términos se normalizan (minúsculas,
+sin tildes) y la búsqueda tolera prefijos ("pizz") y errores de tipeo ("piza").
+"""
+
+import math
+import re
+import threading
+from bisect import bisect_left
+from typing import Dict, Any, List, Optional, Tuple
+from src.core.utils import normalize_text
+
+# Palabras demasiado frecuentes en español para aportar a la búsqueda
+STOPWORDS = {
+    "de", "la", "el", "en", "y", "los", "las", "del", "con", "para", "un", "una",
+    "por", "al", "a", "o", "se", "su", "sus", "que", "es", "lo", "como", "mas",
+}
+
+# Peso de cada campo: un término en el nombre vale más que en la descripción
+NAME_WEIGHT = 3.0
+FIELD_WEIGHT = 1.0
+
+# Peso según el tipo de coincidencia del término de la consulta
+EXACT_MATCH = 1.0
+PREFIX_MATCH = 0.7
+FUZZY_MATCH = 0.5
+
+SNIPPET_LENGTH = 160
+
+def tokenize(text) -> List[str]:
+    """Divide un texto normalizado en términos, descartando stopwords."""
+    return [t for t in re.findall(r"\w+", normalize_text(text)) if t not in STOPWORDS]
+
+def _within_distance(a: str, b: str, max_dist: int) -> bool:
+    """Levenshtein acotado: corta en cuanto la distancia supera max_dist."""
+    if abs(len(a) - len(b)) > max_dist:
+        return False
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        if min(current) > max_dist:
+            return False
+        previous = current
+    return previous[-1] <= max_dist
+
+class CitySearchIndex:
+    """Índice invertido término -> {doc_id: peso} con actualización incremental por ciudad."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.postings: Dict[str, Dict[int, float]] = {}
+        self.docs: Dict[int, Dict[str, Any]] = {}
+        self.city_docs: Dict[str, List[int]] = {}
+        self.city_mtimes: Dict[str, int] = {}
+        self._next_id = 0
+        self._vocabulary: List[str] = []
+        self._vocabulary_dirty = False
+
+    def _remove_city_locked(self, city: str):
+        for doc_id in self.city_docs.pop(city, []):
+            doc = self.docs.pop(doc_id)
+            for term in doc["terms"]:
+                posting = self.postings.get(term)
+                if posting is not None:
+                    posting.pop(doc_id, None)
+                    if not posting:
+                        del self.postings[term]
+                        self._vocabulary_dirty = True
+        self.city_mtimes.pop(city, None)
+
+    def index_city(self, city: str, city_data: Dict[str, Any], mtime: Optional[int] = None):
+        """(Re)indexa todas las entradas de una ciudad, reemplazando las anteriores."""
+        with self._lock:
+            self._remove_city_locked(city)
+            doc_ids = []
+            for category, items in city_data.items():
+                if not isinstance(items, list):
+                    continue
+                for item in items:
+                    if not isinstance(item, dict) or "nombre" not in item:
+                        continue
+                    weights: Dict[str, float] = {}
+                    for term in tokenize(item["nombre"]):
+                        weights[term] = weights.get(term, 0.0) + NAME_WEIGHT
+                    for key, value in item.items():
+                        if key == "nombre":
+                            continue
+                        values = value if isinstance(value, list) else [value]
+                        for v in values:
+                            if isinstance(v, str):
+                                for term in tokenize(v):
+                                    weights[term] = weights.get(term, 0.0) + FIELD_WEIGHT
+
+                    doc_id = self._next_id
+                    self._next_id += 1
+                    self.docs[doc_id] = {
+                        "ciudad": city,
+                        "categoria": category,
+                        "nombre": item["nombre"],
+                        "descripcion": str(item.get("descripcion", ""))[:SNIPPET_LENGTH],
+                        "terms": list(weights.keys()),
+                    }
+                    for term, weight in weights.items():
+                        if term not in self.postings:
+                            self.postings[term] = {}
+                            self._vocabulary_dirty = True
+                        self.postings[term][doc_id] = weight
+                    doc_ids.append(doc_id)
+            self.city_docs[city] = doc_ids
+            if mtime is not None:
+                self.city_mtimes[city] = mtime
+
+    def remove_city(self, city: str):
+        with self._lock:
+            self._remove_city_locked(city)
+
+    def _expand_term(self, term: str) -> List[Tuple[str, float]]:
+        """Términos del vocabulario que coinciden exactamente, por prefijo o con un typo."""
+        matches: List[Tuple[str, float]] = []
+        if term in self.postings:
+            matches.append((term, EXACT_MATCH))
+
+        # Prefijos: búsqueda binaria sobre el vocabulario ordenado
+        start = bisect_left(self._vocabulary, term)
+        for candidate in self._vocabulary[start:]:
+            if not candidate.startswith(term):
+                break
+            if candidate != term:
+                matches.append((candidate, PREFIX_MATCH))
+
+        if not matches and len(term) >= 4:
+            max_dist = 1 if len(term) <= 7 else 2
+            for candidate in self._vocabulary:
+                if _within_distance(term, candidate, max_dist):
+                    matches.append((candidate, FUZZY_MATCH))
+        return matches
+
+    def search(self, query: str, city: Optional[str] = None, category: Optional[str] = None,
+               limit: int = 5) -> List[Dict[str, Any]]:
+        """Devuelve las entradas mejor puntuadas (TF-IDF con cobertura de términos)."""
+        query_terms = list(dict.fromkeys(tokenize(query)))
+        if not query_terms:
+            return []
+
+        with self._lock:
+            if self._vocabulary_dirty:
+                self._vocabulary = sorted(self.postings.keys())
+                self._vocabulary_dirty = False
+
+            total_docs = max(len(self.docs), 1)
+            scores: Dict[int, float] = {}
+            coverage: Dict[int, int] = {}
+            for term in query_terms:
+                best_for_term: Dict[int, float] = {}
+                for candidate, match_weight in self._expand_term(term):
+                    posting = self.postings[candidate]
+                    idf = math.log(1 + total_docs / len(posting))
+                    for doc_id, weight in posting.items():
+                        score = match_weight * idf * weight
+                        if score > best_for_term.get(doc_id, 0.0):
+                            best_for_term[doc_id] = score
+                for doc_id, score in best_for_term.items():
+                    scores[doc_id] = scores.get(doc_id, 0.0) + score
+                    coverage[doc_id] = coverage.get(doc_id, 0) + 1
+
+            hits = []
+            for doc_id, score in scores.items():
+                doc = self.docs[doc_id]
+                if city and doc["ciudad"] != city:
+                    continue
+                if category and doc["categoria"] != category:
+                    continue
+                final_score = score * coverage[doc_id] / len(query_terms)
+                hits.append((final_score, doc))
+
+        hits.sort(key=lambda h: h[0], reverse=True)
+        return [
+            {
+                "ciudad": doc["ciudad"],
+                "categoria": doc["categoria"],
+                "nombre": doc["nombre"],
+                "descripcion": doc["descripcion"],
+                "score": round(score, 3),
+            }
+            for score, doc in hits[:limit]
+        ]
+
+# Instancia global compartida por city_tools
+city_search_index = CitySearchIndex()
@@ -2,10 +2,13 @@
 
 import os
 import json
-from typing import Dict, Any, List
+import threading
+from typing import Dict, Any, List, Optional
 from .registry import tool
-from src.core.utils import benchmark, debug_print
+from .city_search import city_search_index
+from src.core.utils import benchmark, debug_print, normalize_text, KeyedLock
 from src.core.logger import safe_print
+from src.core.recall_index import schedule_source_upsert
 
 # Estructura base para nuevas ciudades
 CITY_TEMPLATE = {
@@ -18,15 +21,114 @@ CITY_TEMPLATE = {
     "centros_comerciales": []
 }
 
+CITY_ASSETS_DIR = "./assets/cities"
+
+def _city_path(city_lower: str) -> str:
+    return f"{CITY_ASSETS_DIR}/{city_lower}.ledger"
+
+def _resolve_city_data(data: Dict[str, Any], city_lower: str) -> Dict[str, Any]:
+    """Ubica el diccionario de categorías dentro del ledger (con o sin llave raíz)."""
+    if city_lower in data:
+        return data[city_lower]
+    # Si el archivo existe pero no tiene el nombre de la ciudad como llave raíz
+    if len(data) == 1 and isinstance(list(data.values())[0], dict):
+        return list(data.values())[0]
+    return data # Estructura plana
+
+# --- Índice en memoria de ledgers de ciudad ---
+class CityLedgerIndex:
+    """Vista indexada de un ledger de ciudad: categoría -> items, nombres y conteos."""
+
+    def __init__(self, city_key: str, data: Dict[str, Any]):
+        self.city_key = city_key
+        city_data = _resolve_city_data(data, city_key)
+        self.categories: Dict[str, List[Dict[str, Any]]] = {
+            category: [item for item in items if isinstance(item, dict)]
+            for category, items in city_data.items()
+            if isinstance(items, list)
+        }
+        self.names: Dict[str, List[str]] = {
+            category: [item.get("nombre", "") for item in items]
+            for category, items in self.categories.items()
+        }
+        self.counts: Dict[str, int] = {category: len(items) for category, items in self.categories.items()}
+
+    def select(self, categories: Optional[List[str]] = None, fields: str = "full",
+               offset: int = 0, limit: Optional[int] = None) -> Dict[str, Any]:
+        """Devuelve solo las categorías pedidas, proyectadas y paginadas."""
+        selected = categories or list(self.categories.keys())
+        result: Dict[str, Any] = {}
+        pagination: Dict[str, Any] = {}
+        for category in selected:
+            if category not in self.categories:
+                continue
+            source = self.names[category] if fields == "nombre" else self.categories[category]
+            end = None if limit is None else offset + limit
+            result[category] = source[offset:end]
+            if offset or limit is not None:
+                pagination[category] = {"total": self.counts[category], "offset": offset, "devueltos": len(result[category])}
+        response: Dict[str, Any] = {self.city_key: result}
+        if pagination:
+            response["paginacion"] = pagination
+        return response
+
+    def summary(self) -> Dict[str, Any]:
+        """Resumen compacto: número de lugares por categoría."""
+        return {"ciudad": self.city_key, "resumen": self.counts, "total": sum(self.counts.values())}
+
+_city_index_cache: Dict[str, tuple] = {}  # file_path -> (mtime_ns, raw_data, CityLedgerIndex)
+_city_index_lock = threading.Lock()
+
+def get_city_index(city_lower: str):
+    """Devuelve (raw_data, índice) del ledger, reconstruyendo solo si el archivo cambió."""
+    file_path = _city_path(city_lower)
+    mtime = os.stat(file_path).st_mtime_ns
+    with _city_index_lock:
+        cached = _city_index_cache.get(file_path)
+        if cached and cached[0] == mtime:
+            return cached[1], cached[2]
+    with open(file_path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    index = CityLedgerIndex(city_lower, data)
+    with _city_index_lock:
+        _city_index_cache[file_path] = (mtime, data, index)
+    return data, index
+
+def invalidate_city_index(city_lower: str):
+    with _city_index_lock:
+        _city_index_cache.pop(_city_path(city_lower), None)
+
 # --- Herramienta: Leer información de ciudad (read_city_info) ---
 READ_CITY_INFO_SCHEMA = {
-    "description": "Obtiene información detallada sobre una ciudad específica leyendo su archivo ledger. Úsala SIEMPRE que necesites conocer detalles sobre atractivos, parques, gastronomía o universidades de una ciudad. Es mucho más eficiente que leer archivos genéricos.",
+    "description": "Obtiene información detallada sobre una ciudad específica leyendo su archivo ledger. Úsala SIEMPRE que necesites conocer detalles sobre atractivos, parques, gastronomía o universidades de una ciudad. Es mucho más eficiente que leer archivos genéricos. Para ahorrar contexto, filtra por 'categories', pide solo nombres con fields='nombre', pagina con offset/limit o usa summary=true para ver cuántos lugares hay por categoría.",
     "parameters": {
         "type": "object",
         "properties": {
             "city": {
                 "type": "string",
                 "description": "El nombre de la ciudad a consultar (ej: 'cali', 'bogota', 'pereira')."
+            },
+            "categories": {
+                "type": "array",
+                "items": {"type": "string", "enum": list(CITY_TEMPLATE.keys())},
+                "description": "Categorías a devolver. Si se omite, se devuelven todas."
+            },
+            "fields": {
+                "type": "string",
+                "enum": ["full", "nombre"],
+                "description": "'nombre' devuelve solo los nombres de los lugares; 'full' (por defecto) devuelve todos los campos."
+            },
+            "offset": {
+                "type": "integer",
+                "description": "Posición inicial dentro de cada categoría (paginación). Por defecto 0."
+            },
+            "limit": {
+                "type": "integer",
+                "description": "Máximo de lugares por categoría (paginación)."
+            },
+            "summary": {
+                "type": "boolean",
+                "description": "Si es true, devuelve solo el número de lugares por categoría."
             }
         },
         "required": ["city"]
@@ -35,23 +137,31 @@ READ_CITY_INFO_SCHEMA = {
 
 @benchmark
 @tool(schema=READ_CITY_INFO_SCHEMA)
-def read_city_info(city: str, **kwargs) -> str:
+def read_city_info(city: str, categories: Optional[List[str]] = None, fields: str = "full",
+                   offset: int = 0, limit: Optional[int] = None, summary: bool = False, **kwargs) -> Dict[str, Any]:
     debug_print(f"  [TOOL] Herramienta llamada: read_city_info ({city})")
     try:
         city_lower = city.lower().strip()
-        file_path = f"./assets/cities/{city_lower}.ledger"
+        file_path = _city_path(city_lower)
         
         if not os.path.exists(file_path):
-            return json.dumps({"error": f"No se encontró información para la ciudad: {city}. Puedes usar add_city_info para crearla."}, ensure_ascii=False)
+            return {"error": f"No se encontró información para la ciudad: {city}. Puedes usar add_city_info para crearla."}
             
-        with open(file_path, "r", encoding="utf-8") as f:
-            data = json.load(f)
-            
-        return json.dumps(data, indent=2, ensure_ascii=False)
+        data, index = get_city_index(city_lower)
+
+        if summary:
+            return index.summary()
+
+        if categories or fields != "full" or offset or limit is not None:
+            offset = max(int(offset or 0), 0)
+            limit = None if limit is None else max(int(limit), 0)
+            return index.select(categories, fields, offset, limit)
+
+        return data
     except json.JSONDecodeError:
-        return json.dumps({"error": f"Error: El archivo de datos de {city} está corrupto."})
+        return {"error": f"Error: El archivo de datos de {city} está corrupto."}
     except Exception as e:
-        return json.dumps({"error": f"Error al leer información de ciudad: {str(e)}"})
+        return {"error": f"Error al leer información de ciudad: {str(e)}"}
 
 # --- Herramienta: Agregar información a ciudad (add_city_info) ---
 ADD_CITY_INFO_SCHEMA = {
@@ -72,94 +182,211 @@ ADD_CITY_INFO_SCHEMA = {
     }
 }
 
+def _hashable(value):
+    """Clave hashable para valores de listas (los dicts/listas se serializan)."""
+    try:
+        hash(value)
+        return value
+    except TypeError:
+        return json.dumps(value, sort_keys=True, ensure_ascii=False)
+
+def _merge_items(city_data: Dict[str, Any], new_info: Dict[str, Any], messages: List[str]) -> bool:
+    """
+    Fusiona new_info en city_data usando índices por nombre normalizado.
+    Los índices y los sets de listas se construyen una sola vez por llamada,
+    así el costo es lineal en el tamaño de la actualización.
+    """
+    changes_made = False
+    name_indexes: Dict[str, Dict[str, Dict[str, Any]]] = {}
+    list_sets: Dict[tuple, set] = {}
+
+    for category, items in new_info.items():
+        if category not in city_data:
+            city_data[category] = []
+        
+        if not isinstance(items, list):
+             messages.append(f"⚠️ Categoría '{category}' ignorada porque el valor no es una lista.")
+             continue
+
+        if category not in name_indexes:
+            name_indexes[category] = {
+                normalize_text(item["nombre"]): item
+                for item in city_data[category]
+                if isinstance(item, dict) and "nombre" in item
+            }
+        name_index = name_indexes[category]
+
+        for new_item in items:
+            if not isinstance(new_item, dict) or "nombre" not in new_item:
+                 messages.append(f"⚠️ Item ignorado en '{category}' porque no tiene 'nombre' o no es un objeto.")
+                 continue
+            
+            # Buscar si el elemento ya existe (O(1) por nombre normalizado)
+            name_key = normalize_text(new_item["nombre"])
+            existing_item = name_index.get(name_key)
+            
+            if existing_item:
+                # Lógica de actualización
+                updated_fields = []
+                for key, value in new_item.items():
+                    if key == "nombre": continue
+                    
+                    # Si ambos son listas, combinar elementos
+                    if isinstance(value, list) and isinstance(existing_item.get(key), list):
+                         set_key = (id(existing_item), key)
+                         if set_key not in list_sets:
+                             list_sets[set_key] = {_hashable(v) for v in existing_item[key]}
+                         seen = list_sets[set_key]
+                         for v in value:
+                             hv = _hashable(v)
+                             if hv not in seen:
+                                 seen.add(hv)
+                                 existing_item[key].append(v)
+                                 updated_fields.append(f"{key} (item agregado)")
+                    # Actualizar valor si es diferente
+                    elif existing_item.get(key) != value:
+                         existing_item[key] = value
+                         updated_fields.append(key)
+                
+                if updated_fields:
+                    messages.append(f"🔄 Actualizado '{new_item['nombre']}' en '{category}': {', '.join(updated_fields)}")
+                    changes_made = True
+                else:
+                    messages.append(f"ℹ️ '{new_item['nombre']}' ya existe en '{category}' sin cambios.")
+                    
+            else:
+                # Agregar nuevo elemento
+                city_data[category].append(new_item)
+                name_index[name_key] = new_item
+                messages.append(f"✅ Agregado '{new_item['nombre']}' a '{category}'.")
+                changes_made = True
+
+    return changes_made
+
+# Serializa el ciclo lectura/escritura por ciudad (extracciones en paralelo)
+_city_write_locks = KeyedLock()
+
+def merge_city_updates(city: str, updates: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Aplica varias actualizaciones a una ciudad en un único ciclo de lectura/escritura.
+    Cada elemento de updates tiene la forma {'categoria': [{'nombre': ...}]}.
+    """
+    city_lower = city.lower().strip()
+    with _city_write_locks(city_lower):
+        return _merge_city_updates_locked(city_lower, updates)
+
+def _merge_city_updates_locked(city_lower: str, updates: List[Dict[str, Any]]) -> Dict[str, Any]:
+    os.makedirs(CITY_ASSETS_DIR, exist_ok=True)
+    file_path = _city_path(city_lower)
+    
+    # Cargar o inicializar datos
+    is_new = not os.path.exists(file_path)
+    if is_new:
+        # Crear nueva ciudad con el template estándar
+        data = {city_lower: {category: [] for category in CITY_TEMPLATE}}
+        print(f"  🆕 Creando nuevo ledger para la ciudad: {city_lower}")
+    else:
+        with open(file_path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+
+    # Buscar la estructura correcta de la ciudad dentro del archivo
+    city_data = _resolve_city_data(data, city_lower)
+
+    changes_made = False
+    messages = []
+    for new_info in updates:
+        if not isinstance(new_info, dict):
+            messages.append("⚠️ Actualización ignorada porque no es un objeto JSON.")
+            continue
+        changes_made = _merge_items(city_data, new_info, messages) or changes_made
+
+    # Si se creó el archivo por primera vez, siempre guardamos
+    if changes_made or is_new:
+        with open(file_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=4, ensure_ascii=False)
+        invalidate_city_index(city_lower)
+        # Actualización incremental del índice de búsqueda (solo esta ciudad)
+        city_search_index.index_city(city_lower, city_data, os.stat(file_path).st_mtime_ns)
+        schedule_source_upsert("city", city_lower)
+        return {"success": True, "details": messages}
+    return {"success": True, "message": "No se requirieron cambios técnicos."}
+
 @tool(schema=ADD_CITY_INFO_SCHEMA)
 def add_city_info(city: str, info_json: str, **kwargs) -> str:
     debug_print(f"  [TOOL] Herramienta llamada: add_city_info ({city})")
     try:
-        city_lower = city.lower().strip()
-        os.makedirs("./assets/cities", exist_ok=True)
-        file_path = f"./assets/cities/{city_lower}.ledger"
-        
-        # Cargar o inicializar datos
-        if os.path.exists(file_path):
-            with open(file_path, "r", encoding="utf-8") as f:
-                data = json.load(f)
-        else:
-            # Crear nueva ciudad con el template estándar
-            data = {city_lower: CITY_TEMPLATE.copy()}
-            print(f"  🆕 Creando nuevo ledger para la ciudad: {city_lower}")
-            
         try:
             new_info = json.loads(info_json)
         except json.JSONDecodeError:
             return json.dumps({"error": "El argumento info_json no es un JSON válido."})
 
-        # Buscar la estructura correcta de la ciudad dentro del archivo
-        if city_lower in data:
-            city_data = data[city_lower]
-        else:
-            # Si el archivo existe pero no tiene el nombre de la ciudad como llave raíz
-            if len(data) == 1 and isinstance(list(data.values())[0], dict):
-                city_key = list(data.keys())[0]
-                city_data = data[city_key]
-            else:
-                city_data = data # Estructura plana
+        return json.dumps(merge_city_updates(city, [new_info]), ensure_ascii=False)
 
-        changes_made = False
-        messages = []
-
-        for category, items in new_info.items():
-            if category not in city_data:
-                city_data[category] = []
-            
-            if not isinstance(items, list):
-                 messages.append(f"⚠️ Categoría '{category}' ignorada porque el valor no es una lista.")
-                 continue
+    except Exception as e:
+        return json.dumps({"error": f"Error al procesar información de ciudad: {str(e)}"})
 
-            for new_item in items:
-                if not isinstance(new_item, dict) or "nombre" not in new_item:
-                     messages.append(f"⚠️ Item ignorado en '{category}' porque no tiene 'nombre' o no es un objeto.")
-                     continue
-                
-                # Buscar si el elemento ya existe
-                existing_item = next((item for item in city_data[category] if isinstance(item, dict) and item.get("nombre") == new_item["nombre"]), None)
-                
-                if existing_item:
-                    # Lógica de actualización
-                    updated_fields = []
-                    for key, value in new_item.items():
-                        if key == "nombre": continue
-                        
-                        # Si ambos son listas, combinar elementos
-                        if isinstance(value, list) and isinstance(existing_item.get(key), list):
-                             for v in value:
-                                 if v not in existing_item[key]:
-                                     existing_item[key].append(v)
-                                     updated_fields.append(f"{key} (item agregado)")
-                        # Actualizar valor si es diferente
-                        elif existing_item.get(key) != value:
-                             existing_item[key] = value
-                             updated_fields.append(key)
-                    
-                    if updated_fields:
-                        messages.append(f"🔄 Actualizado '{new_item['nombre']}' en '{category}': {', '.join(updated_fields)}")
-                        changes_made = True
-                    else:
-                        messages.append(f"ℹ️ '{new_item['nombre']}' ya existe en '{category}' sin cambios.")
-                        
-                else:
-                    # Agregar nuevo elemento
-                    city_data[category].append(new_item)
-                    messages.append(f"✅ Agregado '{new_item['nombre']}' a '{category}'.")
-                    changes_made = True
+# --- Herramienta: Buscar en todas las ciudades (search_city_info) ---
+def _refresh_search_index():
+    """Sincroniza el índice de búsqueda con los ledgers en disco (solo reindexa los que cambiaron)."""
+    if not os.path.isdir(CITY_ASSETS_DIR):
+        return
+    seen = set()
+    for entry in os.scandir(CITY_ASSETS_DIR):
+        if not entry.name.endswith(".ledger"):
+            continue
+        city_lower = entry.name[:-len(".ledger")]
+        seen.add(city_lower)
+        mtime = entry.stat().st_mtime_ns
+        if city_search_index.city_mtimes.get(city_lower) == mtime:
+            continue
+        try:
+            data, _ = get_city_index(city_lower)
+        except (json.JSONDecodeError, OSError) as e:
+            debug_print(f"  ⚠️ No se pudo indexar {entry.name}: {e}")
+            continue
+        city_search_index.index_city(city_lower, _resolve_city_data(data, city_lower), mtime)
+    for city_lower in set(city_search_index.city_docs) - seen:
+        city_search_index.remove_city(city_lower)
 
-        # Si se creó el archivo por primera vez, siempre guardamos
-        if changes_made or not os.path.exists(file_path):
-            with open(file_path, "w", encoding="utf-8") as f:
-                json.dump(data, f, indent=4, ensure_ascii=False)
-            return json.dumps({"success": True, "details": messages}, ensure_ascii=False)
-        else:
-            return json.dumps({"success": True, "message": "No se requirieron cambios técnicos."}, ensure_ascii=False)
+SEARCH_CITY_INFO_SCHEMA = {
+    "description": "Busca lugares en los ledgers de TODAS las ciudades con una sola consulta (tolera tildes, prefijos y errores de tipeo). Úsala para preguntas como '¿qué ciudad tiene una buena pizzería?' en lugar de leer cada ciudad con read_city_info.",
+    "parameters": {
+        "type": "object",
+        "properties": {
+            "query": {
+                "type": "string",
+                "description": "Texto a buscar (ej: 'pizza', 'museo de arte', 'parque para niños')."
+            },
+            "city": {
+                "type": "string",
+                "description": "Restringir la búsqueda a una ciudad (opcional)."
+            },
+            "category": {
+                "type": "string",
+                "enum": list(CITY_TEMPLATE.keys()),
+                "description": "Restringir la búsqueda a una categoría (opcional)."
+            },
+            "limit": {
+                "type": "integer",
+                "description": "Número máximo de resultados (por defecto 5, máximo 20)."
+            }
+        },
+        "required": ["query"]
+    }
+}
 
+@benchmark
+@tool(schema=SEARCH_CITY_INFO_SCHEMA)
+def search_city_info(query: str, city: Optional[str] = None, category: Optional[str] = None,
+                     limit: int = 5, **kwargs) -> str:
+    debug_print(f"  [TOOL] Herramienta llamada: search_city_info ('{query}')")
+    try:
+        _refresh_search_index()
+        limit = min(max(int(limit or 5), 1), 20)
+        city_filter = city.lower().strip() if city else None
+        hits = city_search_index.search(query, city=city_filter, category=category, limit=limit)
+        if not hits:
+            return json.dumps({"message": f"No se encontraron lugares para '{query}'."}, ensure_ascii=False)
+        return json.dumps({"query": query, "resultados": hits}, ensure_ascii=False)
     except Exception as e:
-        return json.dumps({"error": f"Error al procesar información de ciudad: {str(e)}"})
\ No newline at end of file
+        return json.dumps({"error": f"Error al buscar información de ciudades: {str(e)}"})
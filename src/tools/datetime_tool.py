@@ -2,8 +2,6 @@
 
 from datetime import datetime as dt
 from typing import Dict, Any
-# Importamos pytz ya que el código lo usa (aunque estaba comentado en el original, estaba roto)
-import pytz 
 from .registry import tool
 from src.core.utils import debug_print
 from src.core.logger import safe_print
@@ -55,6 +53,9 @@ def datetime(timezone: str = "UTC", format: str = "full",
     debug_print("  [TOOL] Herramienta llamada: datetime")
     
     try:
+        # pytz se importa en la primera llamada, no al cargar el skill
+        import pytz
+
         # Mapeo de nombres comunes a zonas IANA
         common_timezones = {
             'bogota': 'America/Bogota',
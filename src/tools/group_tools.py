@@ -1,11 +1,9 @@
-import os
 import json
-from pathlib import Path
-from typing import Dict, Any
+from typing import Any, Dict
 from .registry import tool
 from src.core.utils import debug_print
-
-GROUP_ASSETS_DIR = "./assets/groups"
+from src.core.persistence.group_ledger import group_ledger_store
+from src.core.recall_index import schedule_source_upsert
 
 # --- Herramienta: Leer Ledger de Grupo (read_group_ledger) ---
 READ_GROUP_LEDGER_SCHEMA = {
@@ -19,31 +17,29 @@ READ_GROUP_LEDGER_SCHEMA = {
 }
 
 @tool(schema=READ_GROUP_LEDGER_SCHEMA)
-def read_group_ledger(group_id: str = None, **kwargs) -> str:
+def read_group_ledger(group_id: str = None, **kwargs) -> Dict[str, Any]:
     context = kwargs.get('context')
     # Si no se da group_id, intentar obtenerlo del contexto
     if not group_id and context:
         group_id = context.chat_id
     
     if not group_id:
-        return json.dumps({"error": "No se proporcionó group_id y no hay contexto de grupo."})
+        return {"error": "No se proporcionó group_id y no hay contexto de grupo."}
 
     debug_print(f"  [TOOL] Herramienta llamada: read_group_ledger para '{group_id}'")
     
-    file_path = os.path.join(GROUP_ASSETS_DIR, f"{group_id}.ledger")
-    
-    if not os.path.exists(file_path):
+    try:
+        data = group_ledger_store.read(group_id)
+    except Exception as e:
+        return {"error": str(e)}
+
+    if data is None:
         # Si no existe, devolver una estructura vacía sugerida
-        return json.dumps({
+        return {
             "message": "No existe un ledger para este grupo aún. Se puede crear uno nuevo.",
             "group_id": group_id
-        })
-
-    try:
-        with open(file_path, "r", encoding="utf-8") as f:
-            return json.dumps(json.load(f), indent=2, ensure_ascii=False)
-    except Exception as e:
-        return json.dumps({"error": str(e)})
+        }
+    return data
 
 # --- Herramienta: Actualizar Ledger de Grupo (update_group_ledger) ---
 UPDATE_GROUP_LEDGER_SCHEMA = {
@@ -70,28 +66,17 @@ def update_group_ledger(key: str, value: str, group_id: str = None, **kwargs) ->
 
     debug_print(f"  [TOOL] Herramienta llamada: update_group_ledger para '{group_id}'")
     
-    os.makedirs(GROUP_ASSETS_DIR, exist_ok=True)
-    file_path = os.path.join(GROUP_ASSETS_DIR, f"{group_id}.ledger")
-
-    data = {}
-    if os.path.exists(file_path):
-        with open(file_path, "r", encoding="utf-8") as f:
-            data = json.load(f)
-
     # Procesar el valor (si es JSON, convertirlo)
     try:
         processed_value = json.loads(value)
     except:
         processed_value = value
 
-    data[key] = processed_value
-    
-    # Asegurar metadatos básicos
-    if "group_metadata" not in data:
-        data["group_metadata"] = {"group_id": group_id, "last_update": ""}
-    data["group_metadata"]["last_update"] = str(os.getenv("CURRENT_TIME", "now"))
-
-    with open(file_path, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=2, ensure_ascii=False)
+    # Serializado por grupo; solo se persiste la clave cambiada (ver GroupLedgerStore)
+    try:
+        group_ledger_store.patch(group_id, key, processed_value)
+    except Exception as e:
+        return json.dumps({"error": str(e)})
+    schedule_source_upsert("group", group_id)
 
     return json.dumps({"success": True, "message": f"Campo '{key}' actualizado en el ledger del grupo {group_id}."})
@@ -0,0 +1,42 @@
+import json
+from typing import List, Optional
+from .registry import tool
+from src.core.utils import debug_print, benchmark
+from src.core.recall_index import recall_index
+
+RECALL_SCHEMA = {
+    "description": "Recupera los fragmentos más relevantes de la memoria: conversaciones anteriores de ESTE chat, el ledger de este grupo, ledgers de ciudades y perfiles públicos de usuarios. Úsala cuando el usuario se refiera a algo dicho antes o que ya no está en el contexto, en lugar de leer ledgers completos.",
+    "parameters": {
+        "type": "object",
+        "properties": {
+            "query": {
+                "type": "string",
+                "description": "Qué recordar (ej: 'restaurante que recomendé en Cali', 'fecha del viaje')."
+            },
+            "k": {
+                "type": "integer",
+                "description": "Número de fragmentos (por defecto 5, máximo 10)."
+            },
+            "sources": {
+                "type": "array",
+                "items": {"type": "string", "enum": ["history", "city", "user", "group"]},
+                "description": "Limitar a ciertas fuentes (opcional)."
+            }
+        },
+        "required": ["query"]
+    }
+}
+
+@benchmark
+@tool(schema=RECALL_SCHEMA)
+def recall(query: str, k: int = 5, sources: Optional[List[str]] = None, **kwargs) -> str:
+    debug_print(f"  [TOOL] Herramienta llamada: recall ('{query}')")
+    context = kwargs.get('context')
+    try:
+        k = min(max(int(k or 5), 1), 10)
+        hits = recall_index.search(query, k=k, chat_id=context.chat_id if context else None, sources=sources)
+        if not hits:
+            return json.dumps({"message": f"No hay recuerdos relevantes para '{query}'."}, ensure_ascii=False)
+        return json.dumps({"query": query, "resultados": hits}, ensure_ascii=False)
+    except Exception as e:
+        return json.dumps({"error": f"Error al consultar la memoria: {str(e)}"})
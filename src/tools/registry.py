@@ -1,6 +1,22 @@
 
+import hashlib
 import inspect
-from typing import List, Dict, Callable, Any
+import json
+from typing import List, Dict, Callable, Any, Optional, FrozenSet
+
+class ToolSchemaBundle(list):
+    """
+    Lista de esquemas lista para la API, calculada una vez por versión del registro.
+    Es una `list` normal (el SDK arma y serializa el cuerpo de la solicitud), y además
+    trae su tamaño en JSON compacto y una `version` (hash del contenido) estable entre
+    procesos, útil como clave de caché y para trazas. No se debe mutar: el registro
+    crea otra al cambiar.
+    """
+    def __init__(self, schemas: List[Dict[str, Any]]):
+        super().__init__(schemas)
+        encoded = json.dumps(schemas, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        self.size_bytes = len(encoded)
+        self.version = hashlib.sha256(encoded).hexdigest()[:16]
 
 # Registro global para almacenar funciones y sus esquemas
 class ToolRegistry:
@@ -8,6 +24,9 @@ class ToolRegistry:
         self.tool_functions: Dict[str, Callable] = {}
         self.tool_schemas: List[Dict[str, Any]] = []
         self.tool_call_map: Dict[str, Callable] = {}
+        self.tool_modules: Dict[str, str] = {}  # nombre -> módulo que la define (para filtrar por skill)
+        self._bundle: Optional[ToolSchemaBundle] = None
+        self._scoped_bundles: Dict[FrozenSet[str], ToolSchemaBundle] = {}
         
     def register_tool(self, func: Callable, schema: Dict[str, Any]):
         """Registra una función de herramienta y su esquema."""
@@ -30,10 +49,34 @@ class ToolRegistry:
         }
         self.tool_schemas.append(api_schema)
         self.tool_call_map[func_name] = func
+        self.tool_modules[func_name] = func.__module__
+        # Único punto de invalidación de los bundles
+        self._bundle = None
+        self._scoped_bundles = {}
         
-    def get_tool_list(self) -> List[Dict[str, Any]]:
-        """Devuelve la lista de esquemas de herramientas para la API del LLM."""
-        return self.tool_schemas
+    def get_tool_list(self, exclude_modules: Optional[FrozenSet[str]] = None) -> ToolSchemaBundle:
+        """
+        Devuelve la lista de esquemas de herramientas para la API del LLM (misma instancia por versión).
+        Con `exclude_modules` omite las herramientas de esos módulos; cada combinación también se cachea.
+        """
+        if not exclude_modules:
+            bundle = self._bundle
+            if bundle is None:
+                bundle = self._bundle = ToolSchemaBundle(self.tool_schemas)
+            return bundle
+
+        bundle = self._scoped_bundles.get(exclude_modules)
+        if bundle is None:
+            bundle = self._scoped_bundles[exclude_modules] = ToolSchemaBundle([
+                schema for schema in self.tool_schemas
+                if self.tool_modules[schema["function"]["name"]] not in exclude_modules
+            ])
+        return bundle
+
+    @property
+    def schema_version(self) -> str:
+        """Versión del bundle de esquemas vigente (cambia solo con register_tool)."""
+        return self.get_tool_list().version
         
     def get_tool_call_map(self) -> Dict[str, Callable]:
         """Devuelve el mapa de nombres de herramientas a funciones Python."""
@@ -1,4 +1,3 @@
-import json
 from typing import Dict, Any, List
 from .registry import tool
 from src.core.utils import debug_print
@@ -20,7 +19,7 @@ LIST_ACTIVE_CHATS_SCHEMA = {
 }
 
 @tool(schema=LIST_ACTIVE_CHATS_SCHEMA)
-def list_active_chats(source_filter: str = None, **kwargs) -> str:
+def list_active_chats(source_filter: str = None, **kwargs) -> Dict[str, Any]:
     """
     Consulta el Registro Central de chats.
     """
@@ -49,7 +48,7 @@ def list_active_chats(source_filter: str = None, **kwargs) -> str:
             "last_interaction": info.get("last_seen")
         })
     
-    return json.dumps({
+    return {
         "total": len(filtered_chats),
         "chats": filtered_chats
-    }, indent=2, ensure_ascii=False)
+    }
@@ -14,10 +14,8 @@ load_dotenv()
 
 # Cargar token desde .env
 TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
-if TELEGRAM_BOT_TOKEN:
-    print(f"[DEBUG] Telegram token cargado: {TELEGRAM_BOT_TOKEN[:10]}...")
-else:
-    print("[DEBUG] Telegram token NO cargado")
+# Nunca imprimir el token (ni parcial): los logs del contenedor no son privados
+debug_print(f"[DEBUG] Telegram token {'cargado' if TELEGRAM_BOT_TOKEN else 'NO cargado'}")
 
 # URL base de la API de Telegram
 TELEGRAM_API_BASE = f"https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}"
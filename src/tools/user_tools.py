@@ -2,11 +2,12 @@
 
 import os
 import json
-from pathlib import Path
 from typing import Dict, List, Any
 from .registry import tool
-from src.core.utils import benchmark, debug_print
+from src.core.utils import benchmark, debug_print, KeyedLock
 from src.core.logger import safe_print
+from src.core.persistence.user_index import user_index
+from src.core.recall_index import schedule_source_upsert
 # from security_logger import security_logger # Se deja comentado, ya que el logger no estaba siendo usado en las tools originales
 
 # --- Herramienta: Crear usuario (add_user) ---
@@ -71,21 +72,21 @@ def add_user(name: str, lastname: str, secret: str, **kwargs) -> Dict[str, Any]:
         base_filename = f"{fname}.{lname}" # Ej: juan.perez
 
         # 4. Manejo de Homónimos (Consecutivos)
-        users_dir = "./assets/users"
-        os.makedirs(users_dir, exist_ok=True)
-        
-        filename = f"{base_filename}.ledger"
-        counter = 0
-        
-        # Bucle para encontrar un nombre libre: juan.perez.ledger -> juan.perez.1.ledger -> juan.perez.2.ledger
-        while os.path.exists(os.path.join(users_dir, filename)):
-            counter += 1
-            filename = f"{base_filename}.{counter}.ledger"
+        # El índice reserva el siguiente nombre libre en O(1):
+        # juan.perez.ledger -> juan.perez.1.ledger -> juan.perez.2.ledger
+        os.makedirs(user_index.users_dir, exist_ok=True)
+        stem = user_index.reserve_filename(base_filename)
+        filename = f"{stem}.ledger"
+        file_path = os.path.join(user_index.users_dir, filename)
 
-        file_path = os.path.join(users_dir, filename)
-
-        with open(file_path, "w", encoding="utf-8") as f:
-            json.dump(user_data, f, indent=2, ensure_ascii=False)
+        try:
+            with open(file_path, "w", encoding="utf-8") as f:
+                json.dump(user_data, f, indent=2, ensure_ascii=False)
+        except Exception:
+            user_index.discard(stem)
+            raise
+        user_index.invalidate(stem)
+        schedule_source_upsert("user", stem)
 
         return {"success": True, "message": f"Usuario {name} {lastname} creado exitosamente. Archivo: {filename}"}
     except Exception as e:
@@ -99,16 +100,7 @@ LIST_USERS_SCHEMA = {
 
 @tool(schema=LIST_USERS_SCHEMA)
 def list_users(**kwargs) -> Dict[str, List[str]]:
-    path = "./assets/users"
-    usuarios = []
-    base_path = Path(path)
-    if not base_path.exists():
-        return {"usuarios": []}
-    for entry in base_path.iterdir():
-        if entry.suffix == ".ledger" and entry.name != "template.ledger":
-            usuarios.append(entry.stem)
-    usuarios.sort()
-    return {"usuarios": usuarios}
+    return {"usuarios": user_index.list_users()}
 
 # --- Herramienta: Leer ledger (read_ledger) con FIREWALL ---
 READ_LEDGER_SCHEMA = {
@@ -126,50 +118,40 @@ READ_LEDGER_SCHEMA = {
 
 @benchmark
 @tool(schema=READ_LEDGER_SCHEMA)
-def read_ledger(user: str, secret_attempt: str = None, scope: str = "PUBLIC", **kwargs):
+def read_ledger(user: str, secret_attempt: str = None, scope: str = "PUBLIC", **kwargs) -> Dict[str, Any]:
     context = kwargs.get('context')
     is_group = context.is_group() if context else False
     
     safe_print(f"  🛡️ FIREWALL: read_ledger '{user}' | Scope: {scope} | Grupo: {is_group}")
     
-    file_path = f"./assets/users/{user}.ledger"
-    if not os.path.exists(file_path):
-        return json.dumps({"error": "Usuario no encontrado"})
+    if user_index.resolve(user) is None:
+        return {"error": "Usuario no encontrado"}
         
     try:
-        with open(file_path, "r", encoding="utf-8") as f:
-            data = json.load(f)
-
         # FUERZA BRUTA DE SEGURIDAD: Si es grupo, el scope SIEMPRE es PUBLIC
+        # La vista pública sale de la caché (sin tocar disco tras la primera lectura)
         if is_group:
             safe_print("  ⚠️ Bloqueando acceso privado por contexto de GRUPO.")
-            return json.dumps({
-                "authorized": True,
-                "scope_delivered": "PUBLIC",
-                "profile": data.get("public_profile", {})
-            }, indent=2)
+            return user_index.get_public_view(user) or {"error": "Usuario no encontrado"}
 
         # Si pide PRIVADO en un Chat Privado
         if scope == "PRIVATE":
+            data = user_index.load(user)
             real_secret = data.get("private_profile", {}).get("secret", "")
             if str(secret_attempt) == str(real_secret):
-                return json.dumps({
+                return {
                     "authorized": True,
                     "scope_delivered": "PRIVATE",
                     "profile": data
-                }, indent=2)
+                }
             else:
-                return json.dumps({"authorized": False, "error": "Secreto incorrecto para acceso privado"})
+                return {"authorized": False, "error": "Secreto incorrecto para acceso privado"}
 
         # Por defecto, devolver solo lo público
-        return json.dumps({
-            "authorized": True,
-            "scope_delivered": "PUBLIC",
-            "profile": data.get("public_profile", {})
-        }, indent=2)
+        return user_index.get_public_view(user) or {"error": "Usuario no encontrado"}
 
     except Exception as e:
-        return json.dumps({"error": str(e)})
+        return {"error": str(e)}
 
 # --- Herramienta: Actualizar información de usuario (update_user_info) ---
 UPDATE_USER_INFO_SCHEMA = {
@@ -187,18 +169,18 @@ UPDATE_USER_INFO_SCHEMA = {
     }
 }
 
+# Serializa el ciclo lectura/escritura por usuario (extracciones en paralelo)
+_user_write_locks = KeyedLock()
+
 @benchmark
 @tool(schema=UPDATE_USER_INFO_SCHEMA)
 def update_user_info(user: str, info_json: str, **kwargs):
     debug_print(f"  [TOOL] Herramienta llamada: update_user_info ({user})")
     try:
-        file_path = f"./assets/users/{user}.ledger"
-        if not os.path.exists(file_path):
+        file_path = user_index.resolve(user)
+        if file_path is None:
             return json.dumps({"error": f"No se encontró el ledger para el usuario {user}"})
 
-        with open(file_path, "r", encoding="utf-8") as f:
-            data = json.load(f)
-
         try:
             updates = json.loads(info_json)
         except json.JSONDecodeError:
@@ -216,10 +198,16 @@ def update_user_info(user: str, info_json: str, **kwargs):
                 else:
                     target[key] = value
 
-        deep_merge(data, updates)
+        with _user_write_locks(user):
+            with open(file_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+
+            deep_merge(data, updates)
 
-        with open(file_path, "w", encoding="utf-8") as f:
-            json.dump(data, f, indent=2, ensure_ascii=False)
+            with open(file_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, indent=2, ensure_ascii=False)
+            user_index.invalidate(user)
+        schedule_source_upsert("user", user)
 
         return json.dumps({"success": True, "message": f"Perfil de {user} actualizado correctamente"})
 
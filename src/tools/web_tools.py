@@ -39,20 +39,20 @@ WEB_SEARCH_SCHEMA = {
 
 @benchmark
 @tool(schema=WEB_SEARCH_SCHEMA)
-def web_search(query: str, **kwargs) -> str:
+def web_search(query: str, **kwargs) -> Dict[str, Any]:
     debug_print(f"  [TOOL] Herramienta llamada: web_search ('{query}')")
     try:
         if not DDGS_AVAILABLE:
-            return json.dumps({
+            return {
                 "error": "La biblioteca 'ddgs' (o 'duckduckgo-search') no está instalada. Instálala con: pip install ddgs"
-            }, ensure_ascii=False)
+            }
 
         with DDGS() as ddgs:
             results = list(ddgs.text(query, max_results=5))
             if not results:
-                return json.dumps({
+                return {
                     "message": f"No se encontraron resultados para la búsqueda '{query}'."
-                }, ensure_ascii=False)
+                }
 
             # Formatear resultados
             formatted = [
@@ -63,11 +63,11 @@ def web_search(query: str, **kwargs) -> str:
                 }
                 for r in results
             ]
-            return json.dumps({"results": formatted}, indent=2, ensure_ascii=False)
+            return {"results": formatted}
     except Exception as e:
-        return json.dumps({
+        return {
             "error": f"Error durante la búsqueda web: {str(e)}"
-        }, ensure_ascii=False)
+        }
 
 # --- Herramienta: Leer contenido de URL (read_url) ---
 READ_URL_SCHEMA = {
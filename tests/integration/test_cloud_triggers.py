@@ -50,15 +50,15 @@ def test_inactivity_trigger():
     safe_print(f"✅ Chat simulado creado: {chat_id}")
     safe_print(f"   Última actividad: {past_time} (hace 11 minutos)\n")
     
-    # 3. Start the maintenance worker with short intervals for testing
-    worker = SessionMaintenanceWorker(client, inactivity_minutes=10, check_interval_seconds=5)
+    # 3. Start the maintenance worker (its deadline already expired, so it fires right away)
+    worker = SessionMaintenanceWorker(client, inactivity_minutes=10)
     worker.start()
     
     safe_print("⏳ Esperando que el monitor detecte inactividad (5 segundos)...\n")
-    time.sleep(6)
+    time.sleep(5)
     
     # 4. Verify that the session was processed
-    if chat_id in worker.processed_sessions:
+    if chat_id in worker.last_maintained:
         safe_print("✅ ÉXITO: El monitor detectó y procesó la sesión inactiva.")
     else:
         safe_print("❌ FALLO: La sesión no fue procesada automáticamente.")
@@ -73,8 +73,8 @@ def test_signal_handler():
     # the container orchestrator would send SIGTERM.
     safe_print("📌 En producción, SIGTERM sería enviado por el orquestador (Kubernetes, Docker, etc.)")
     print("   El handler `graceful_shutdown` ejecutaría:")
-    print("   1. run_extraction_on_all(client)")
-    print("   2. consolidate_all_histories(client)")
+    print("   1. run_post_session_pipeline(client)  (extracción + consolidación concurrentes)")
+    print("   2. performance_logger.flush()")
     print("   3. os._exit(0)")
     safe_print("\n✅ Handler registrado correctamente en main.py")
 
@@ -8,6 +8,7 @@ sys.path.append(os.getcwd())
 
 from src.tools.city_tools import read_city_info
 from src.tools.user_tools import read_ledger, list_users
+from src.core.performance import performance_logger
 
 def run_performance_test():
     print("🚀 Iniciando prueba de línea base de rendimiento...")
@@ -30,6 +31,7 @@ def run_performance_test():
         read_city_info(city=city)
     
     print("\n✅ Prueba completada.")
+    performance_logger.flush()
     
     # Verificar si el log se creó
     log_path = "logs/performance.json"
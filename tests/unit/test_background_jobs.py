@@ -0,0 +1,61 @@
+import threading
+import time
+import pytest
+from src.core.jobs import BackgroundJobPool, JOB_PRIORITY_HIGH, JOB_PRIORITY_LOW
+
+@pytest.fixture
+def make_pool():
+    pools = []
+    def factory(**kwargs):
+        pool = BackgroundJobPool(poll_seconds=0.01, **kwargs)
+        pools.append(pool)
+        return pool
+    yield factory
+    for pool in pools:
+        pool.stop(timeout=1)
+
+def test_pauses_while_live_backlog_exceeds_threshold(make_pool):
+    backlog = {"n": 3}
+    pool = make_pool(max_workers=1, backlog_threshold=1, backlog_probe=lambda: backlog["n"])
+    pool.start()
+    future = pool.submit(lambda: "hecho")
+    time.sleep(0.1)
+    assert not future.done()
+    backlog["n"] = 1
+    assert future.result(timeout=1) == "hecho"
+    assert pool.stats["paused_seconds"] > 0
+
+def test_concurrency_cap_and_priority_order(make_pool):
+    pool = make_pool(max_workers=1, backlog_threshold=0)
+    gate = threading.Event()
+    order = []
+    pool.start()
+    blocker = pool.submit(gate.wait)
+    time.sleep(0.05)  # El único worker queda ocupado
+    low = pool.submit(order.append, "low", priority=JOB_PRIORITY_LOW)
+    high = pool.submit(order.append, "high", priority=JOB_PRIORITY_HIGH)
+    gate.set()
+    for f in (blocker, low, high):
+        f.result(timeout=1)
+    assert order == ["high", "low"]
+
+def test_same_key_is_coalesced_while_queued(make_pool):
+    backlog = {"n": 5}
+    calls = []
+    pool = make_pool(max_workers=2, backlog_threshold=0, backlog_probe=lambda: backlog["n"])
+    pool.start()
+    first = pool.submit(calls.append, "a", key="maintain:1")
+    second = pool.submit(calls.append, "a", key="maintain:1")
+    assert first is second
+    backlog["n"] = 0
+    first.result(timeout=1)
+    assert calls == ["a"]
+    assert pool.stats["coalesced"] == 1
+
+def test_failures_are_reported_through_the_future(make_pool):
+    pool = make_pool(max_workers=1, backlog_threshold=0)
+    pool.start()
+    future = pool.submit(lambda: 1 / 0)
+    with pytest.raises(ZeroDivisionError):
+        future.result(timeout=1)
+    assert pool.stats["failed"] == 1
@@ -0,0 +1,46 @@
+import json
+import pytest
+import src.tools.city_tools as city_tools
+from src.tools.city_tools import add_city_info, merge_city_updates, CITY_TEMPLATE
+from src.core.utils import normalize_text
+
+@pytest.fixture
+def cities_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(city_tools, "CITY_ASSETS_DIR", str(tmp_path))
+    return tmp_path
+
+def _load(cities_dir, city):
+    return json.loads((cities_dir / f"{city}.ledger").read_text(encoding="utf-8"))[city]
+
+def test_normalize_text():
+    assert normalize_text("  Museo   La Tertulia ") == "museo la tertulia"
+    assert normalize_text("Bogotá") == "bogota"
+
+def test_duplicate_detected_by_normalized_name(cities_dir):
+    add_city_info("armenia", json.dumps({"parques_y_naturaleza": [{"nombre": "Parque Café", "tags": ["familia"]}]}))
+    result = json.loads(add_city_info("armenia", json.dumps({
+        "parques_y_naturaleza": [{"nombre": "parque  cafe", "tags": ["familia", "niños", {"x": 1}]}]
+    })))
+    assert result["success"]
+    parques = _load(cities_dir, "armenia")["parques_y_naturaleza"]
+    assert len(parques) == 1
+    assert parques[0]["tags"] == ["familia", "niños", {"x": 1}]
+
+def test_bulk_updates_single_write(cities_dir, monkeypatch):
+    writes = []
+    real_dump = city_tools.json.dump
+    monkeypatch.setattr(city_tools.json, "dump", lambda *a, **kw: (writes.append(1), real_dump(*a, **kw)))
+    updates = [
+        {"experiencias_gastronomicas": [{"nombre": f"Sitio {i}", "descripcion": "x"}]} for i in range(50)
+    ]
+    updates.append({"experiencias_gastronomicas": [{"nombre": "sitio 3", "descripcion": "nueva"}]})
+    result = merge_city_updates("manizales", updates)
+    assert result["success"]
+    assert len(writes) == 1
+    items = _load(cities_dir, "manizales")["experiencias_gastronomicas"]
+    assert len(items) == 50
+    assert items[3]["descripcion"] == "nueva"
+
+def test_new_city_does_not_mutate_template(cities_dir):
+    add_city_info("ibague", json.dumps({"espacios_publicos": [{"nombre": "Plaza", "descripcion": "x"}]}))
+    assert CITY_TEMPLATE["espacios_publicos"] == []
@@ -0,0 +1,48 @@
+import json
+import pytest
+import src.tools.city_tools as city_tools
+from src.tools.city_search import CitySearchIndex, tokenize
+from src.tools.city_tools import add_city_info, search_city_info
+
+CITY_DATA = {
+    "experiencias_gastronomicas": [
+        {"nombre": "Pizza Solar", "descripcion": "Excelente pizza artesanal"},
+        {"nombre": "Café Jesús Martín", "descripcion": "Café de origen"},
+    ],
+    "atractivos_culturales": [
+        {"nombre": "Museo La Tertulia", "descripcion": "Museo de arte moderno"},
+    ],
+}
+
+@pytest.fixture
+def index():
+    idx = CitySearchIndex()
+    idx.index_city("cali", CITY_DATA)
+    return idx
+
+def test_tokenize_folds_accents_and_drops_stopwords():
+    assert tokenize("Café de Bogotá") == ["cafe", "bogota"]
+
+def test_exact_prefix_and_fuzzy_matches(index):
+    assert index.search("pizza")[0]["nombre"] == "Pizza Solar"
+    assert index.search("pizz")[0]["nombre"] == "Pizza Solar"
+    assert index.search("piza")[0]["nombre"] == "Pizza Solar"
+    assert index.search("cafe jesus")[0]["nombre"] == "Café Jesús Martín"
+
+def test_filters_and_reindex(index):
+    assert index.search("museo", category="experiencias_gastronomicas") == []
+    index.index_city("cali", {"atractivos_culturales": []})
+    assert index.search("pizza") == []
+
+def test_search_tool_updates_incrementally(tmp_path, monkeypatch):
+    monkeypatch.setattr(city_tools, "CITY_ASSETS_DIR", str(tmp_path))
+    monkeypatch.setattr(city_tools, "city_search_index", CitySearchIndex())
+    (tmp_path / "cali.ledger").write_text(json.dumps({"cali": CITY_DATA}), encoding="utf-8")
+
+    first = json.loads(search_city_info("pizza"))
+    assert first["resultados"][0]["ciudad"] == "cali"
+
+    add_city_info("pasto", json.dumps({"experiencias_gastronomicas": [{"nombre": "Pizzería Galeras", "descripcion": "Pizza al horno"}]}))
+    hits = json.loads(search_city_info("pizza", limit=10))["resultados"]
+    assert {h["ciudad"] for h in hits} == {"cali", "pasto"}
+    assert json.loads(search_city_info("pizza", city="Pasto"))["resultados"][0]["nombre"] == "Pizzería Galeras"
@@ -0,0 +1,45 @@
+import json
+import pytest
+import src.tools.city_tools as city_tools
+from src.tools.city_tools import read_city_info, add_city_info
+
+@pytest.fixture
+def cities_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(city_tools, "CITY_ASSETS_DIR", str(tmp_path))
+    ledger = {
+        "pereira": {
+            "parques_y_naturaleza": [
+                {"nombre": f"Parque {i}", "descripcion": "Zona verde"} for i in range(5)
+            ],
+            "experiencias_gastronomicas": [
+                {"nombre": "Lucerna", "descripcion": "Pastelería tradicional"}
+            ],
+            "centros_academicos": []
+        }
+    }
+    (tmp_path / "pereira.ledger").write_text(json.dumps(ledger), encoding="utf-8")
+    return tmp_path
+
+def test_full_read_keeps_original_shape(cities_dir):
+    data = read_city_info("Pereira")
+    assert len(data["pereira"]["parques_y_naturaleza"]) == 5
+
+def test_category_filter_and_name_projection(cities_dir):
+    data = read_city_info("pereira", categories=["experiencias_gastronomicas"], fields="nombre")
+    assert data == {"pereira": {"experiencias_gastronomicas": ["Lucerna"]}}
+
+def test_pagination(cities_dir):
+    data = read_city_info("pereira", categories=["parques_y_naturaleza"], offset=2, limit=2)
+    assert [p["nombre"] for p in data["pereira"]["parques_y_naturaleza"]] == ["Parque 2", "Parque 3"]
+    assert data["paginacion"]["parques_y_naturaleza"] == {"total": 5, "offset": 2, "devueltos": 2}
+
+def test_summary_mode(cities_dir):
+    data = read_city_info("pereira", summary=True)
+    assert data["resumen"]["parques_y_naturaleza"] == 5
+    assert data["total"] == 6
+
+def test_index_refreshes_after_write(cities_dir):
+    read_city_info("pereira", summary=True)
+    add_city_info("pereira", json.dumps({"centros_academicos": [{"nombre": "UTP", "descripcion": "Universidad"}]}))
+    data = read_city_info("pereira", categories=["centros_academicos"], fields="nombre")
+    assert data["pereira"]["centros_academicos"] == ["UTP"]
@@ -58,8 +58,7 @@ result = add_city_info(city, json.dumps(append_item))
 print(f"Result Update List: {result}")
 
 print(f"\n--- 4. Verify Final State ---")
-final_data = read_city_info(city)
-data = json.loads(final_data)
+data = read_city_info(city)
 # Find our item
 items = data.get('cali', {}).get('experiencias_gastronomicas', [])
 target = next((i for i in items if i['nombre'] == "Prueba Restaurante"), None)
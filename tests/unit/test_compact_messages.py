@@ -0,0 +1,47 @@
+import json
+import pickle
+import sys
+from types import SimpleNamespace
+from src.core.models import ChatMessage, to_api_messages
+from src.core.persistence.history_manager import HistoryManager
+
+def sdk_message():
+    call = SimpleNamespace(id="call_1", function=SimpleNamespace(name="datetime", arguments='{"tz": "UTC"}'))
+    return SimpleNamespace(role="assistant", content=None, tool_calls=[call], reasoning_content="pienso")
+
+def test_from_sdk_message_round_trips_to_api_dict():
+    msg = ChatMessage.from_api(sdk_message())
+    assert not hasattr(msg, "__dict__")
+    assert msg.role is sys.intern("assistant")
+    assert msg.to_api() == {
+        "role": "assistant", "content": None, "reasoning_content": "pienso",
+        "tool_calls": [{"id": "call_1", "type": "function", "function": {"name": "datetime", "arguments": '{"tz": "UTC"}'}}],
+    }
+
+def test_tool_content_is_encoded_lazily_and_once():
+    msg = ChatMessage("tool", {"hora": "10:00"}, tool_call_id="call_1")
+    assert msg.content == "{'hora': '10:00'}"
+    assert msg.content is msg.content
+    assert to_api_messages([{"role": "system", "content": "x"}, msg])[1] == {
+        "role": "tool", "content": "{'hora': '10:00'}", "tool_call_id": "call_1"
+    }
+
+def test_save_history_keeps_only_user_and_assistant_text(tmp_path, monkeypatch):
+    monkeypatch.setattr("src.core.persistence.history_manager.HISTORY_DIR", str(tmp_path))
+    messages = [
+        ChatMessage("system", "prompt"),
+        ChatMessage("user", "hola"),
+        ChatMessage.from_api(sdk_message()),
+        ChatMessage("tool", "ok", tool_call_id="call_1"),
+        ChatMessage("assistant", "listo"),
+        {"role": "user", "content": "dict heredado"},
+    ]
+    HistoryManager.save_history("c1", messages)
+    saved = json.loads((tmp_path / "c1.json").read_text(encoding="utf-8"))
+    assert saved == [{"role": "user", "content": "hola"}, {"role": "assistant", "content": "listo"},
+                     {"role": "user", "content": "dict heredado"}]
+    assert [m.role for m in HistoryManager.load_session_messages("c1")] == ["user", "assistant", "user"]
+
+def test_pickles_for_session_snapshot():
+    msg = pickle.loads(pickle.dumps(ChatMessage.from_api(sdk_message()), protocol=5))
+    assert msg.tool_calls == (("call_1", "datetime", '{"tz": "UTC"}'),)
@@ -0,0 +1,29 @@
+import json
+from src.core.context_compactor import ContextCompactor, DIGEST_MARKER
+from src.core.models import ChatMessage, to_api_messages
+
+def tool_turn(call_id, output, reasoning="razonando " * 50):
+    return [
+        ChatMessage("assistant", None, tool_calls=((call_id, "read_url", "{}"),), reasoning_content=reasoning),
+        ChatMessage("tool", output, tool_call_id=call_id),
+        ChatMessage("assistant", "respuesta", reasoning_content=reasoning),
+    ]
+
+def test_compacts_previous_turns_only():
+    big = json.dumps({"url": "http://x", "content": "palabra " * 1000})
+    messages = [ChatMessage("system", "prompt"), ChatMessage("user", "lee x")] + tool_turn("c1", big)
+    messages += [ChatMessage("user", "y ahora y")] + tool_turn("c2", big)
+    before = sum(len(json.dumps(m, ensure_ascii=False)) for m in to_api_messages(messages))
+
+    stats = ContextCompactor(digest_threshold_chars=1500, preview_chars=40).compact(messages)
+
+    assert stats["reasoning_cleared"] == 2 and stats["tool_outputs_digested"] == 1
+    old_tool, current_tool = messages[3], messages[7]
+    assert old_tool.content.startswith(f"{DIGEST_MARKER} read_url: {len(big)} caracteres")
+    assert current_tool.content == big
+    assert messages[2].reasoning_content is None and messages[6].reasoning_content is not None
+    after = sum(len(json.dumps(m, ensure_ascii=False)) for m in to_api_messages(messages))
+    assert after < before / 1.8 and stats["chars_saved"] > 8000
+
+    # Idempotente: una segunda pasada no encuentra nada que compactar
+    assert ContextCompactor(digest_threshold_chars=10).compact(messages)["chars_saved"] == 0
@@ -0,0 +1,66 @@
+from types import SimpleNamespace
+import pytest
+from src.core.persistence.conversation_memory import (
+    ConversationMemoryBuilder, render_memory_context, MEMORY_DIGEST_HEADER, MEMORY_SUMMARIES_HEADER
+)
+from src.core.persistence.history_manager import HistoryManager
+
+@pytest.fixture
+def history_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr("src.core.persistence.history_manager.HISTORY_DIR", str(tmp_path))
+    monkeypatch.setenv("HISTORY_TOKEN_BUDGET", "100")  # ~7 mensajes de 40 caracteres
+    monkeypatch.setenv("HISTORY_MAX_SUMMARIES", "2")
+    return tmp_path
+
+class FakeClient:
+    def __init__(self):
+        self.prompts = []
+        self.chat = SimpleNamespace(completions=self)
+
+    def create(self, **kwargs):
+        prompt = kwargs["messages"][0]["content"]
+        self.prompts.append(prompt)
+        text = "memoria integrada" if "MEMORIA ACTUAL" in prompt else f"resumen {len(self.prompts)}"
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=text))])
+
+class InlineJobs:
+    def __init__(self):
+        self.keys = []
+
+    def submit(self, fn, *args, key=None, priority=None):
+        self.keys.append(key)
+        return fn(*args)
+
+def test_builds_window_summaries_then_long_term_digest(history_dir):
+    client, jobs = FakeClient(), InlineJobs()
+    builder = ConversationMemoryBuilder(client, jobs, window_messages=2)
+    session = []
+    for i in range(14):
+        session.append({"role": "user", "content": f"{i:03d}" + "x" * 37})
+        if HistoryManager.save_history("c", session):
+            builder.schedule("c")
+
+    memory = HistoryManager.load_memory("c")
+    assert set(jobs.keys) == {"memory:c"}
+    assert len(memory["pending"]) < 2  # Solo queda un tramo incompleto
+    assert memory["digest"]["text"] == "memoria integrada"
+    assert len(memory["summaries"]) <= 2
+    assert memory["digest"]["summaries"] + len(memory["summaries"]) == 3  # 7 desalojados / tramos de 2
+
+    context = render_memory_context("c")
+    assert context.startswith(f"{MEMORY_DIGEST_HEADER}\nmemoria integrada")
+    assert MEMORY_SUMMARIES_HEADER in context
+
+def test_schedule_waits_for_a_full_window(history_dir):
+    jobs = InlineJobs()
+    builder = ConversationMemoryBuilder(FakeClient(), jobs, window_messages=50)
+    HistoryManager.save_history("c", [{"role": "user", "content": "y" * 400}] * 3)
+    assert builder.schedule("c") is None and jobs.keys == []
+
+def test_render_respects_token_budget(history_dir):
+    for i in range(5):
+        HistoryManager.add_summary("c", f"resumen número {i} " + "z" * 40, consumed=0)
+    context = render_memory_context("c", token_budget=40)
+    assert context.splitlines()[0] == MEMORY_SUMMARIES_HEADER
+    assert "resumen número 4" in context and "resumen número 0" not in context
+    assert render_memory_context("sin-memoria") == ""
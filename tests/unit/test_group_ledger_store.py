@@ -0,0 +1,87 @@
+import json
+import threading
+import pytest
+import src.tools.group_tools as group_tools
+from src.core.persistence.group_ledger import GroupLedgerStore
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    store = GroupLedgerStore(str(tmp_path), compact_every=5)
+    monkeypatch.setattr(group_tools, "group_ledger_store", store)
+    return store
+
+def test_first_update_creates_ledger_then_patches_journal(store):
+    store.patch("-1", "destino", "Buga", last_update="t1")
+    assert json.loads(open(store.ledger_path("-1"), encoding="utf-8").read())["destino"] == "Buga"
+
+    store.patch("-1", "fecha", "diciembre", last_update="t2")
+    base = json.loads(open(store.ledger_path("-1"), encoding="utf-8").read())
+    assert "fecha" not in base  # solo se anexó la clave, el ledger no se reescribió
+    assert store.read("-1")["fecha"] == "diciembre"
+    assert store.read("-1")["group_metadata"] == {"group_id": "-1", "last_update": "t2"}
+
+    # Otra instancia (p. ej. tras reiniciar) reproduce el diario
+    assert GroupLedgerStore(store.groups_dir).read("-1") == store.read("-1")
+
+def test_journal_compacted_every_n_patches(store):
+    store.patch("-1", "k0", 0)  # crea el ledger
+    for i in range(1, 5):
+        store.patch("-1", f"k{i}", i)
+    assert store.signature("-1")[1]
+    store.patch("-1", "k5", 5)
+    assert not store.signature("-1")[1]  # el diario se volcó y se borró
+    base = json.loads(open(store.ledger_path("-1"), encoding="utf-8").read())
+    assert {f"k{i}" for i in range(6)} <= set(base)
+
+    store.patch("-1", "extra", True)
+    assert store.compact("-1")
+    assert json.loads(open(store.ledger_path("-1"), encoding="utf-8").read())["extra"] is True
+    assert not store.compact("-1")
+
+def test_torn_journal_line_is_ignored_and_flushed(store):
+    store.patch("-1", "a", 1)
+    store.patch("-1", "b", 2)
+    with open(store.journal_path("-1"), "a", encoding="utf-8") as f:
+        f.write('{"key": "c", "val')
+    fresh = GroupLedgerStore(store.groups_dir, compact_every=5)
+    assert fresh.read("-1")["b"] == 2
+    fresh.patch("-1", "d", 4)
+    assert fresh.signature("-1")[1] is None  # no se anexa tras la línea truncada
+    assert {"a", "b", "d"} <= set(GroupLedgerStore(store.groups_dir).read("-1"))
+
+@pytest.mark.parametrize("line", ['{"key": "c"}', '["c", 3]', '{"key": 1, "value": 2, "last_update": "t"}', '42'])
+def test_malformed_journal_entries_are_skipped(store, line):
+    store.patch("-1", "a", 1)
+    store.patch("-1", "b", 2)
+    with open(store.journal_path("-1"), "a", encoding="utf-8") as f:
+        f.write(line + "\n")
+    store.patch("-1", "d", 4)  # anexado tras la línea corrupta, en la misma instancia
+    data = group_tools.read_group_ledger(group_id="-1")
+    assert "error" not in data and {"a", "b", "d"} <= set(data)
+    assert GroupLedgerStore(store.groups_dir).read("-1") == data
+
+def test_concurrent_updates_do_not_lose_writes(store):
+    def worker(n):
+        for i in range(10):
+            group_tools.update_group_ledger(f"k{n}_{i}", json.dumps({"n": n, "i": i}), group_id="-9")
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    data = group_tools.read_group_ledger(group_id="-9")
+    assert sum(key.startswith("k") for key in data) == 80
+    assert GroupLedgerStore(store.groups_dir).read("-9") == data
+
+def test_external_edit_invalidates_cache(store):
+    store.patch("-1", "a", 1)
+    assert store.read("-1")["a"] == 1
+    with open(store.ledger_path("-1"), "w", encoding="utf-8") as f:
+        f.write(json.dumps({"a": 2, "extra": "manual"}))
+    assert store.read("-1")["extra"] == "manual"
+
+def test_read_missing_group(store):
+    assert store.read("-404") is None
+    assert "No existe un ledger" in group_tools.read_group_ledger(group_id="-404")["message"]
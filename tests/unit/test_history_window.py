@@ -0,0 +1,104 @@
+import json
+from types import SimpleNamespace
+import pytest
+from src.core.models import ChatMessage
+from src.core.persistence.history_manager import HistoryManager
+from src.core.persistence.history_window import HistoryWindow
+from src.core.persistence.memory_consolidator import MemoryConsolidator, apply_keep_indices
+
+def msg(i, size=40):
+    return {"role": "user" if i % 2 == 0 else "assistant", "content": f"{i:03d}" + "x" * (size - 3)}
+
+@pytest.fixture
+def history_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr("src.core.persistence.history_manager.HISTORY_DIR", str(tmp_path))
+    monkeypatch.setenv("HISTORY_TOKEN_BUDGET", "100")  # 40 caracteres = 10 + 4 tokens por mensaje
+    return tmp_path
+
+def test_window_keeps_newest_within_budget_and_pins():
+    messages = [msg(i) for i in range(10)]
+    kept, evicted = HistoryWindow(token_budget=100, max_messages=100).split(messages)
+    assert kept == messages[-7:] and evicted == messages[:3]
+
+    kept, evicted = HistoryWindow(token_budget=100, max_messages=100).split(messages, pinned=[0])
+    assert kept == [messages[0]] + messages[-6:] and evicted == messages[1:4]
+
+    kept, _ = HistoryWindow(token_budget=100, max_messages=3).split(messages)
+    assert kept == messages[-3:]
+
+def test_newest_message_is_kept_even_if_over_budget():
+    huge = {"role": "assistant", "content": "y" * 4000}
+    kept, evicted = HistoryWindow(token_budget=100, max_messages=100).split([msg(0), huge])
+    assert kept == [huge] and evicted == [msg(0)]
+
+def test_save_bounds_disk_and_queues_each_evicted_message_once(history_dir):
+    session = [msg(i) for i in range(8)]
+    HistoryManager.save_history("c", session)
+    session += [msg(8), msg(9)]
+    HistoryManager.save_history("c", session)
+
+    saved = json.loads((history_dir / "c.json").read_text(encoding="utf-8"))
+    assert saved == session[-7:]
+    assert HistoryManager.load_memory("c")["pending"] == session[:3]
+    assert [m.content for m in HistoryManager.load_session_messages("c")] == [m["content"] for m in saved]
+
+def test_pinned_message_survives_window_and_consolidation(history_dir):
+    session = [msg(i) for i in range(10)]
+    HistoryManager.pin_message("c", **session[0])
+    HistoryManager.save_history("c", session)
+    history = HistoryManager.load_history("c")
+    assert history[0] == session[0]
+    assert apply_keep_indices("c", history, [len(history) - 1]) == [session[0], session[-1]]
+
+class FakeClient:
+    def __init__(self, text):
+        self.prompts = []
+        self.chat = SimpleNamespace(completions=self)
+        self.text = text
+
+    def create(self, **kwargs):
+        self.prompts.append(kwargs["messages"][0]["content"])
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=self.text))])
+
+def test_consolidator_summarizes_evicted_range(history_dir):
+    HistoryManager.save_history("c", [msg(i) for i in range(10)])
+    client = FakeClient("  El usuario pidió X.  ")
+    assert MemoryConsolidator(client).summarize_evicted("c") is True
+    assert "000xxx" in client.prompts[0]
+    memory = HistoryManager.load_memory("c")
+    assert memory["pending"] == [] and memory["summaries"][0]["messages"] == 3
+    assert memory["summaries"][0]["text"] == "El usuario pidió X."
+    assert MemoryConsolidator(client).summarize_evicted("c") is False  # Nada pendiente: sin llamada
+    assert len(client.prompts) == 1
+
+def test_interrupted_save_keeps_previous_history(history_dir, monkeypatch):
+    HistoryManager.save_history("c", [msg(0), msg(1)])
+
+    def broken_dump(obj, f, **kwargs):
+        f.write('[{"role": "user", "con')  # escritura cortada a la mitad
+        raise OSError("disco lleno")
+    with monkeypatch.context() as patch:
+        patch.setattr("src.core.persistence.history_manager.json.dump", broken_dump)
+        HistoryManager.save_history("c", [msg(0), msg(1), msg(2)])
+
+    assert HistoryManager.load_history("c") == [msg(0), msg(1)]
+
+def test_history_max_messages_env_applies_by_default(history_dir, monkeypatch):
+    monkeypatch.setenv("HISTORY_TOKEN_BUDGET", "100000")
+    monkeypatch.setenv("HISTORY_MAX_MESSAGES", "4")
+    HistoryManager.save_history("c", [msg(i) for i in range(10)])
+    assert HistoryManager.load_history("c") == [msg(i) for i in range(6, 10)]
+    assert len(HistoryManager.load_session_messages("c")) == 4
+
+def test_live_session_is_refit_after_eviction(history_dir, monkeypatch):
+    import main
+    monkeypatch.setattr(main, "user_sessions", {})
+    session = main.get_or_create_session("c")
+    for i in range(12):
+        session.append(ChatMessage(msg(i)["role"], msg(i)["content"]))
+        if HistoryManager.save_history("c", session):
+            main.refit_session("c")
+
+    assert main.user_sessions["c"] is session  # misma lista: el worker la sigue usando
+    assert session[0].role == "system"
+    assert [m.content for m in session if m.role != "system"] == [msg(i)["content"] for i in range(5, 12)]
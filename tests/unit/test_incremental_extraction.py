@@ -0,0 +1,70 @@
+import json
+import pytest
+from unittest.mock import MagicMock
+import src.core.persistence.extractor as extractor
+from src.core.persistence.extractor import IntelligenceExtractor, new_messages_since, message_fingerprint
+from src.core.persistence.history_manager import HistoryManager
+
+def _fake_client():
+    client = MagicMock()
+    response = MagicMock()
+    response.choices[0].message.content = json.dumps({"user_updates": [], "city_updates": []})
+    client.chat.completions.create.return_value = response
+    return client
+
+@pytest.fixture
+def history(monkeypatch, tmp_path):
+    monkeypatch.setattr(extractor, "WATERMARKS_PATH", str(tmp_path / "watermarks.json"))
+    store = {"chat": [{"role": "user", "content": f"mensaje {i}"} for i in range(4)]}
+    monkeypatch.setattr(HistoryManager, "load_history", staticmethod(lambda cid, limit=100: list(store[cid])))
+    return store
+
+def _sent_prompt(client):
+    return client.chat.completions.create.call_args.kwargs["messages"][0]["content"]
+
+def test_only_new_messages_are_sent(history):
+    client = _fake_client()
+    IntelligenceExtractor(client).extract_and_persist("chat")
+    assert "mensaje 0" in _sent_prompt(client)
+
+    history["chat"].append({"role": "assistant", "content": "respuesta nueva"})
+    IntelligenceExtractor(client).extract_and_persist("chat")
+    prompt = _sent_prompt(client)
+    assert "respuesta nueva" in prompt
+    assert "mensaje 0" not in prompt
+
+def test_skip_when_nothing_changed(history):
+    client = _fake_client()
+    IntelligenceExtractor(client).extract_and_persist("chat")
+    IntelligenceExtractor(client).extract_and_persist("chat")
+    assert client.chat.completions.create.call_count == 1
+
+def test_watermark_survives_consolidation():
+    history = [{"role": "user", "content": c} for c in ("a", "b", "c", "d")]
+    hashes = [message_fingerprint(m) for m in history[:3]]
+    # La consolidación borró "c" (la última marca) pero "b" sigue presente
+    consolidated = [history[0], history[1], history[3]]
+    assert new_messages_since(consolidated, hashes) == [history[3]]
+    assert new_messages_since(history, []) == history
+
+def _msgs(*pairs):
+    return [{"role": role, "content": content} for role, content in pairs]
+
+def test_repeated_tail_is_not_mistaken_for_watermark():
+    old = _msgs(("user", "hola"), ("assistant", "Hola!"), ("user", "ok"), ("assistant", "Perfecto"))
+    new = _msgs(("user", "vivo en Cali"), ("assistant", "Genial"), ("user", "ok"), ("assistant", "Perfecto"))
+    hashes = [message_fingerprint(m) for m in old]
+    assert new_messages_since(old + new, hashes) == new
+    assert new_messages_since(old + new, hashes, count=len(old)) == new
+    # Los mensajes nuevos repiten la ventana marcada completa: solo el conteo la distingue
+    assert new_messages_since(old + old, hashes, count=len(old)) == old
+
+def test_repeated_tail_end_to_end(history):
+    history["chat"] = _msgs(("user", "hola"), ("assistant", "Hola!"), ("user", "ok"), ("assistant", "Perfecto"))
+    client = _fake_client()
+    IntelligenceExtractor(client).extract_and_persist("chat")
+
+    history["chat"] += _msgs(("user", "vivo en Cali"), ("assistant", "Genial"), ("user", "ok"), ("assistant", "Perfecto"))
+    IntelligenceExtractor(client).extract_and_persist("chat")
+    assert client.chat.completions.create.call_count == 2
+    assert "vivo en Cali" in _sent_prompt(client)
@@ -0,0 +1,37 @@
+import pytest
+from src.core.intent_router import IntentRouter
+from src.core.skill_manager import skill_manager
+from src.core.models import Message
+
+@pytest.fixture
+def router(monkeypatch):
+    monkeypatch.setattr("src.core.intent_router.performance_logger.log_metric", lambda *a, **kw: None)
+    return IntentRouter()
+
+@pytest.mark.parametrize("content, expected", [
+    ("¿Puedes buscar en internet las últimas noticias?", {"web"}),
+    ("Lee esto: https://example.com/articulo", {"web"}),
+    ("¿Qué hora es en Tokio?", {"utility"}),
+    ("Recomiéndame un museo en Bogotá", {"utility"}),
+    ("Muéstrame mi perfil de usuario", {"social"}),
+    ("¿Con quién has hablado? Dame los chats activos", {"system"}),
+    ("Hola, buenos días", set()),
+])
+def test_predicts_skills_from_keywords(router, content, expected):
+    assert router.predict(content) == expected
+
+def test_optional_classifiers_extend_predictions(router):
+    router.classifiers.append(lambda text: ["web", "desconocido"] if "?" in text else [])
+    assert router.predict("¿y eso?") == {"web"}
+
+def test_preactivation_is_scoped_to_the_message_chat(router):
+    msg = Message(priority=2, content="¿Qué hora es?", source="telegram", user_id="55", chat_id="55")
+    assert router.preactivate(msg) == {"utility"}
+    assert "utility" in skill_manager.skills_for("55")
+    assert "datetime" in {t["function"]["name"] for t in skill_manager.get_tool_list("55")}
+
+def test_hit_rate_accounting(router):
+    router.record_outcome({"web"}, {"web"})
+    router.record_outcome({"utility"}, {"web"})
+    assert router.stats == {"turns": 2, "hits": 1, "misses": 1, "false_positives": 1}
+    assert router.hit_rate() == 0.5
@@ -0,0 +1,27 @@
+import os
+import subprocess
+import sys
+from src.core.llm_gateway import LLMGateway
+from src.core.persistence.history_manager import HistoryManager
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+def test_core_imports_do_not_load_sdk_or_tool_modules():
+    code = ("import sys, src.core.agents, src.core.producers, src.core.maintenance, src.core.persistence.post_session; "
+            "print(sorted(m for m in ('openai', 'requests', 'pytz', 'src.tools.telegram_tool', 'src.tools.user_tools') "
+            "if m in sys.modules))")
+    out = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True)
+    assert out.stdout.strip().splitlines()[-1] == "[]"
+
+def test_gateway_builds_its_client_on_first_use():
+    built = []
+    gateway = LLMGateway(client_factory=lambda: built.append(1) or object())
+    assert built == []
+    client = gateway.client
+    assert gateway.client is client and built == [1]
+
+def test_history_size_reads_only_metadata(tmp_path, monkeypatch):
+    monkeypatch.setattr("src.core.persistence.history_manager.HISTORY_DIR", str(tmp_path))
+    (tmp_path / "42.json").write_text("[]", encoding="utf-8")
+    assert HistoryManager.history_size("42") == 2
+    assert HistoryManager.history_size("missing") == 0
@@ -0,0 +1,72 @@
+import json
+import time
+import pytest
+from types import SimpleNamespace
+from src.core.llm_cache import LLMResponseCache, make_cache_key, contains_private_ledger_data
+from src.core.llm_gateway import LLMGateway, create_completion
+
+class CountingClient:
+    def __init__(self):
+        self.calls = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, **kwargs):
+        self.calls += 1
+        return SimpleNamespace(usage=None, choices=[SimpleNamespace(message=SimpleNamespace(content=f"r{self.calls}"))])
+
+@pytest.fixture(autouse=True)
+def quiet_metrics(monkeypatch):
+    monkeypatch.setattr("src.core.llm_gateway.performance_logger.log_metric", lambda *a, **kw: None)
+
+REQUEST = {"model": "deepseek-chat", "messages": [{"role": "user", "content": "hola"}], "temperature": 0}
+
+def test_key_covers_model_messages_tools_and_params_but_not_timeout():
+    base = make_cache_key(REQUEST)
+    assert make_cache_key({**REQUEST, "timeout": 5}) == base
+    assert make_cache_key({**REQUEST, "model": "otro"}) != base
+    assert make_cache_key({**REQUEST, "temperature": 1}) != base
+    assert make_cache_key({**REQUEST, "tools": [{"type": "function"}]}) != base
+    assert make_cache_key({**REQUEST, "messages": [{"role": "user", "content": "adiós"}]}) != base
+
+def test_lru_bound_and_ttl():
+    cache = LLMResponseCache(max_entries=2, ttl_seconds=0.05)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1  # "b" queda como el menos reciente
+    cache.put("c", 3)
+    assert cache.get("b") is None and len(cache) == 2
+    time.sleep(0.06)
+    assert cache.get("a") is None
+
+def test_gateway_caches_only_opted_in_calls():
+    client = CountingClient()
+    gateway = LLMGateway(client, cache=LLMResponseCache())
+    view = gateway.for_caller("maintenance")
+    first = create_completion(view, cache=True, **REQUEST)
+    assert create_completion(view, cache=True, **REQUEST) is first
+    create_completion(view, **REQUEST)  # Sin opt-in: siempre va a la API
+    assert client.calls == 2
+    assert gateway.stats()["maintenance"]["cache_hits"] == 1
+
+def test_private_ledger_data_is_never_cached():
+    client = CountingClient()
+    gateway = LLMGateway(client, cache=LLMResponseCache())
+    private = json.dumps({"user": "ana.gomez", "scope_delivered": "PRIVATE", "profile": {}})
+    request = {**REQUEST, "messages": [{"role": "tool", "content": private}]}
+    assert contains_private_ledger_data(request["messages"])
+    gateway.create("live", cache=True, **request)
+    gateway.create("live", cache=True, **request)
+    assert client.calls == 2 and len(gateway.cache) == 0
+
+def test_direct_clients_ignore_the_cache_flag():
+    client = CountingClient()
+    create_completion(client, cache=True, **REQUEST)
+    create_completion(client, cache=True, **REQUEST)
+    assert client.calls == 2
+
+def test_persists_to_disk(tmp_path):
+    path = tmp_path / "llm_cache.json"
+    cache = LLMResponseCache(persist_path=str(path))
+    cache.put("k", {"choices": [{"message": {"content": "ok"}}]})
+    reloaded = LLMResponseCache(persist_path=str(path))
+    assert len(reloaded) == 1 and reloaded.get("k") is not None
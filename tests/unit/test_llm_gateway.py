@@ -0,0 +1,122 @@
+import threading
+import time
+import pytest
+from types import SimpleNamespace
+from openai import RateLimitError, BadRequestError
+from src.core.llm_gateway import LLMGateway, LLMGatewayError
+
+def _error(cls):
+    # Los errores del SDK exigen una respuesta HTTP; para la prueba basta la instancia
+    error = cls.__new__(cls)
+    error.response = None
+    return error
+
+def _response(prompt=10, completion=5):
+    return SimpleNamespace(usage=SimpleNamespace(prompt_tokens=prompt, completion_tokens=completion),
+                           choices=[SimpleNamespace(message=SimpleNamespace(content="ok"))])
+
+class FakeClient:
+    def __init__(self, outcomes, delay=0.0):
+        self.outcomes = list(outcomes)
+        self.delay = delay
+        self.kwargs = []
+        self.in_flight = 0
+        self.max_seen = 0
+        self._lock = threading.Lock()
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, **kwargs):
+        with self._lock:
+            self.kwargs.append(kwargs)
+            self.in_flight += 1
+            self.max_seen = max(self.max_seen, self.in_flight)
+            outcome = self.outcomes.pop(0) if self.outcomes else _response()
+        time.sleep(self.delay)
+        with self._lock:
+            self.in_flight -= 1
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+@pytest.fixture(autouse=True)
+def quiet_metrics(monkeypatch):
+    monkeypatch.setattr("src.core.llm_gateway.performance_logger.log_metric", lambda *a, **kw: None)
+
+def test_retries_transient_errors_with_backoff_and_accounts_per_caller():
+    sleeps = []
+    client = FakeClient([_error(RateLimitError), _error(RateLimitError), _response(7, 3)])
+    gateway = LLMGateway(client, max_retries=3, base_delay=0.01, max_delay=0.05, sleep=sleeps.append)
+    view = gateway.for_caller("maintenance")
+    assert view.chat.completions.create(model="deepseek-chat", messages=[]).usage.prompt_tokens == 7
+    assert len(sleeps) == 2 and all(0 <= s <= 0.05 for s in sleeps)
+    assert all("timeout" in kw for kw in client.kwargs)
+    stats = gateway.stats()["maintenance"]
+    assert (stats["calls"], stats["retries"], stats["errors"]) == (1, 2, 0)
+    assert (stats["prompt_tokens"], stats["completion_tokens"]) == (7, 3)
+
+def test_gives_up_after_max_retries():
+    client = FakeClient([_error(RateLimitError)] * 5)
+    gateway = LLMGateway(client, max_retries=2, base_delay=0, sleep=lambda s: None)
+    with pytest.raises(RateLimitError):
+        gateway.create("live", model="m", messages=[])
+    assert len(client.kwargs) == 3
+    assert gateway.stats()["live"]["errors"] == 1
+
+def test_non_transient_errors_are_not_retried():
+    client = FakeClient([_error(BadRequestError)])
+    gateway = LLMGateway(client, max_retries=3, sleep=lambda s: None)
+    with pytest.raises(BadRequestError):
+        gateway.create("live", model="m", messages=[])
+    assert len(client.kwargs) == 1
+
+def test_semaphore_caps_in_flight_calls():
+    client = FakeClient([], delay=0.05)
+    gateway = LLMGateway(client, max_in_flight=2, reserved_live_slots=0)
+    threads = [threading.Thread(target=gateway.create, args=("jobs",), kwargs={"model": "m"}) for _ in range(6)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert client.max_seen == 2
+    assert gateway.stats()["jobs"]["calls"] == 6
+
+def test_background_callers_leave_live_slot_free():
+    client = FakeClient([], delay=0.2)
+    gateway = LLMGateway(client, max_in_flight=3, reserved_live_slots=1)
+    threads = [threading.Thread(target=gateway.create, args=("maintenance",)) for _ in range(4)]
+    for t in threads:
+        t.start()
+    time.sleep(0.05)
+    assert client.max_seen == 2  # el tercer cupo queda para el chat en vivo
+    gateway.create("live")
+    assert client.max_seen == 3  # la llamada en vivo corrió junto al fondo, sin esperar cupo
+    for t in threads:
+        t.join()
+
+def test_live_caller_goes_first_when_a_slot_frees():
+    client = FakeClient([], delay=0.1)
+    gateway = LLMGateway(client, max_in_flight=1)
+    order = []
+    def call(caller):
+        gateway.create(caller)
+        order.append(caller)
+    blocker = threading.Thread(target=call, args=("maintenance",))
+    blocker.start()
+    time.sleep(0.02)
+    waiting = [threading.Thread(target=call, args=(caller,)) for caller in ("memory", "live")]
+    for t in waiting:
+        t.start()
+        time.sleep(0.02)
+    for t in [blocker] + waiting:
+        t.join()
+    assert order == ["maintenance", "live", "memory"]
+
+def test_deadline_bounds_waiting_for_a_slot():
+    client = FakeClient([], delay=0.3)
+    gateway = LLMGateway(client, max_in_flight=1, deadline_seconds=0.1)
+    blocker = threading.Thread(target=gateway.create, args=("live",))
+    blocker.start()
+    time.sleep(0.02)
+    with pytest.raises(LLMGatewayError):
+        gateway.create("maintenance")
+    blocker.join()
@@ -0,0 +1,52 @@
+import time
+import threading
+from datetime import datetime, timedelta
+from unittest.mock import patch
+import pytest
+from src.core.maintenance import SessionMaintenanceWorker
+
+@pytest.fixture
+def worker():
+    processed = []
+    done = threading.Event()
+    with patch("src.core.maintenance.ChatRegistry.get_all", return_value={
+        "old": {"last_seen": (datetime.now() - timedelta(hours=1)).isoformat()},
+        "broken": {"last_seen": "no-es-fecha"},
+    }):
+        w = SessionMaintenanceWorker(None, inactivity_minutes=0.005)  # 0.3 s
+        def fake_process(chat_id):
+            processed.append(chat_id)
+            done.set()
+        w._process_session = fake_process
+        w.processed = processed
+        w.start()
+    yield w
+    w.stop()
+
+def _wait_until(predicate, timeout=3.0):
+    end = time.monotonic() + timeout
+    while time.monotonic() < end:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return False
+
+def test_overdue_chat_from_registry_fires_immediately(worker):
+    assert _wait_until(lambda: "old" in worker.processed, timeout=0.2)
+    assert "broken" not in worker.processed
+
+def test_activity_rearms_deadline(worker):
+    worker.touch("chat")
+    for _ in range(4):
+        time.sleep(0.15)
+        worker.touch("chat")  # Sigue activo: nunca cruza el umbral
+    assert "chat" not in worker.processed
+    assert _wait_until(lambda: "chat" in worker.processed)
+    assert worker.processed.count("chat") == 1
+
+def test_chat_is_maintained_again_after_new_activity(worker):
+    worker.touch("chat")
+    assert _wait_until(lambda: worker.processed.count("chat") == 1)
+    worker.touch("chat")
+    assert _wait_until(lambda: worker.processed.count("chat") == 2)
+    assert worker.pending_count() == 0
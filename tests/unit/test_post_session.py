@@ -0,0 +1,90 @@
+import json
+import threading
+import time
+import pytest
+import src.core.persistence.post_session as post_session
+from src.core.persistence.post_session import PostSessionPipeline, STAGE_DONE, STAGE_EXTRACTED
+
+calls = []
+release = threading.Event()  # Desbloquea los chats lentos
+blocked = []  # Hilos que quedaron en un chat lento
+
+class FakeExtractor:
+    def __init__(self, client):
+        pass
+    def extract_and_persist(self, chat_id):
+        calls.append(("extract", chat_id))
+        if chat_id.startswith("slow"):
+            blocked.append(threading.current_thread())
+            release.wait(timeout=5)
+        else:
+            time.sleep(0.1)
+
+class FakeConsolidator:
+    def __init__(self, client):
+        pass
+    def consolidate_chat(self, chat_id):
+        calls.append(("consolidate", chat_id))
+
+@pytest.fixture(autouse=True)
+def fakes(monkeypatch):
+    calls.clear()
+    blocked.clear()
+    release.clear()
+    monkeypatch.setenv("MAINTENANCE_MODE", "separate")
+    monkeypatch.setattr(post_session, "IntelligenceExtractor", FakeExtractor)
+    monkeypatch.setattr(post_session, "MemoryConsolidator", FakeConsolidator)
+    yield
+    # Ningún worker abandonado por el plazo sigue vivo en la prueba siguiente
+    release.set()
+    for thread in blocked:
+        thread.join(timeout=5)
+
+def test_chats_run_concurrently(tmp_path):
+    progress = tmp_path / "progress.json"
+    pipeline = PostSessionPipeline(None, max_workers=8, deadline_seconds=10, progress_path=str(progress))
+    start = time.monotonic()
+    summary = pipeline.run([f"chat{i}" for i in range(8)])
+    assert time.monotonic() - start < 0.5  # 8 x 100ms en paralelo, no en serie
+    assert summary == {"done": 8, "pending": 0, "elapsed_ms": summary["elapsed_ms"]}
+    assert not progress.exists()
+    # Cada chat se extrae antes de consolidarse
+    for i in range(8):
+        assert calls.index(("extract", f"chat{i}")) < calls.index(("consolidate", f"chat{i}"))
+
+def test_deadline_records_pending_chats(tmp_path):
+    progress = tmp_path / "progress.json"
+    pipeline = PostSessionPipeline(None, max_workers=1, deadline_seconds=0.3, progress_path=str(progress))
+    summary = pipeline.run(["fast", "slow1", "slow2"])
+    assert summary["done"] == 1 and summary["pending"] == 2
+    saved = json.loads(progress.read_text())["chats"]
+    assert saved == {"fast": STAGE_DONE, "slow1": "pending", "slow2": "pending"}
+
+    # El worker abandonado termina su chat; el que nunca empezó quedó cancelado
+    release.set()
+    for thread in blocked:
+        thread.join(timeout=5)
+    assert calls == [("extract", "fast"), ("consolidate", "fast"), ("extract", "slow1"), ("consolidate", "slow1")]
+
+def test_resume_skips_completed_extraction(tmp_path):
+    progress = tmp_path / "progress.json"
+    progress.write_text(json.dumps({"chats": {"a": STAGE_EXTRACTED, "b": STAGE_DONE}}))
+    PostSessionPipeline(None, deadline_seconds=10, progress_path=str(progress)).run(["a"])
+    assert calls == [("consolidate", "a")]
+
+def test_resume_submits_one_background_job_per_chat(tmp_path):
+    progress = tmp_path / "progress.json"
+    progress.write_text(json.dumps({"chats": {"a": STAGE_EXTRACTED, "b": "pending", "c": STAGE_DONE}}))
+
+    class FakeJobs:
+        def __init__(self):
+            self.submitted = []
+        def submit(self, fn, *args, key=None, priority=None):
+            self.submitted.append(key)
+            fn(*args)
+
+    jobs = FakeJobs()
+    post_session.resume_post_session_pipeline(None, jobs=jobs, progress_path=str(progress))
+    assert jobs.submitted == ["maintain:a", "maintain:b"]
+    assert calls == [("consolidate", "a"), ("extract", "b"), ("consolidate", "b")]
+    assert not progress.exists()
@@ -27,8 +27,7 @@ def test_read_ledger_group_context_blocks_private(mock_ledger_file):
     context = Message(priority=2, content="hi", source="telegram", user_id="1", chat_id="-100") # Negative chat_id = Group
     
     # Even if we request PRIVATE with the correct secret, it should be blocked
-    result_json = read_ledger(user="test.user", secret_attempt="12345", scope="PRIVATE", context=context)
-    result = json.loads(result_json)
+    result = read_ledger(user="test.user", secret_attempt="12345", scope="PRIVATE", context=context)
     
     assert result["authorized"] == True
     assert result["scope_delivered"] == "PUBLIC"
@@ -40,8 +39,7 @@ def test_read_ledger_dm_context_allows_private(mock_ledger_file):
     context = Message(priority=2, content="hi", source="telegram", user_id="1", chat_id="1") 
     
     # Should allow PRIVATE access with correct secret
-    result_json = read_ledger(user="test.user", secret_attempt="12345", scope="PRIVATE", context=context)
-    result = json.loads(result_json)
+    result = read_ledger(user="test.user", secret_attempt="12345", scope="PRIVATE", context=context)
     
     assert result["authorized"] == True
     assert result["scope_delivered"] == "PRIVATE"
@@ -52,8 +50,7 @@ def test_read_ledger_dm_context_denies_wrong_secret(mock_ledger_file):
     context = Message(priority=2, content="hi", source="telegram", user_id="1", chat_id="1") 
     
     # Should deny PRIVATE access with wrong secret
-    result_json = read_ledger(user="test.user", secret_attempt="WRONG", scope="PRIVATE", context=context)
-    result = json.loads(result_json)
+    result = read_ledger(user="test.user", secret_attempt="WRONG", scope="PRIVATE", context=context)
     
     assert result["authorized"] == False
     assert "error" in result
@@ -0,0 +1,49 @@
+import json
+import pytest
+from unittest.mock import patch
+import src.tools.user_tools as user_tools
+from src.core.performance import PerformanceLogger
+from src.core.persistence.user_index import UserIndex
+from src.core.models import Message
+
+GROUP = Message(priority=2, content="hi", source="telegram", user_id="1", chat_id="-100")
+DM = Message(priority=2, content="hi", source="telegram", user_id="1", chat_id="1")
+
+@pytest.fixture
+def index(tmp_path, monkeypatch):
+    (tmp_path / "ana.gomez.ledger").write_text(json.dumps({
+        "public_profile": {"name": "Ana Gómez"},
+        "private_profile": {"secret": "s3", "age": 30}
+    }), encoding="utf-8")
+    idx = UserIndex(str(tmp_path), poll_seconds=0)
+    monkeypatch.setattr(user_tools, "user_index", idx)
+    return idx
+
+def test_group_reads_hit_disk_once(index, monkeypatch):
+    monkeypatch.setattr("src.core.utils.performance_logger.log_metric", lambda *a, **kw: None)
+    first = user_tools.read_ledger(user="ana.gomez", context=GROUP)
+    with patch("builtins.open", side_effect=AssertionError("lectura de disco inesperada")):
+        for _ in range(5):
+            assert user_tools.read_ledger(user="ana.gomez", context=GROUP) is first
+    assert first["profile"] == {"name": "Ana Gómez"}
+
+def test_private_view_is_never_cached(index):
+    user_tools.read_ledger(user="ana.gomez", context=GROUP)
+    result = user_tools.read_ledger(user="ana.gomez", secret_attempt="s3", scope="PRIVATE", context=DM)
+    assert result["scope_delivered"] == "PRIVATE"
+    assert all("s3" not in json.dumps(view) for view in index.public_views.values())
+
+def test_update_user_info_invalidates_public_view(index):
+    user_tools.read_ledger(user="ana.gomez", context=GROUP)
+    user_tools.update_user_info("ana.gomez", json.dumps({"public_profile": {"location": "Cali"}}))
+    result = user_tools.read_ledger(user="ana.gomez", context=GROUP)
+    assert result["profile"]["location"] == "Cali"
+
+def test_performance_logger_batches_writes(tmp_path):
+    log_file = tmp_path / "perf.json"
+    perf = PerformanceLogger(str(log_file), batch_size=3, flush_seconds=3600)
+    perf.log_metric("a", 0.1)
+    perf.log_metric("b", 0.1)
+    assert json.loads(log_file.read_text()) == []
+    perf.log_metric("c", 0.1)
+    assert [m["metric_name"] for m in json.loads(log_file.read_text())] == ["a", "b", "c"]
@@ -0,0 +1,116 @@
+import json
+import pytest
+from src.core import vector_index
+from src.core.recall_index import RecallIndex
+from src.core.vector_index import HashingEmbedder, VectorIndex
+
+@pytest.fixture
+def assets(tmp_path, monkeypatch):
+    history = tmp_path / "history"
+    history.mkdir()
+    monkeypatch.setattr("src.core.persistence.history_manager.HISTORY_DIR", str(history))
+    dirs = {kind: tmp_path / kind for kind in ("city", "user", "group")}
+    for d in dirs.values():
+        d.mkdir()
+    monkeypatch.setattr("src.core.recall_index.LEDGER_DIRS", {k: str(v) for k, v in dirs.items()})
+
+    (history / "42.json").write_text(json.dumps([
+        {"role": "user", "content": "Mi perro se llama Firulais y le encanta el parque"},
+        {"role": "assistant", "content": "Qué bonito nombre para un perro"},
+    ]), encoding="utf-8")
+    (history / "99.json").write_text(json.dumps([{"role": "user", "content": "El perro de otro chat se llama Rex"}]), encoding="utf-8")
+    (dirs["city"] / "cali.ledger").write_text(json.dumps({"cali": {"experiencias_gastronomicas": [
+        {"nombre": "Pizza Solar", "descripcion": "Excelente pizza artesanal"}]}}), encoding="utf-8")
+    (dirs["user"] / "john.doe.ledger").write_text(json.dumps({
+        "public_profile": {"interests": ["guitarra"]}, "private_profile": {"secret_goal": "comprar un velero"}}), encoding="utf-8")
+    (dirs["group"] / "-7.ledger").write_text(json.dumps({"destino": "Buga en diciembre"}), encoding="utf-8")
+    (dirs["user"] / "template.ledger").write_text("{ roto", encoding="utf-8")
+    return tmp_path
+
+def test_hashing_embedder_is_deterministic_and_normalized():
+    a, b = HashingEmbedder(64).embed(["museo de arte", "museo de arte"])
+    assert list(a) == list(b)
+    assert abs(sum(v * v for v in a) - 1) < 1e-5
+
+@pytest.mark.parametrize("use_numpy", [True, False])
+def test_vector_index_upsert_delete_and_filter(monkeypatch, use_numpy):
+    if use_numpy and vector_index._numpy() is None:
+        pytest.skip("numpy no instalado")
+    if not use_numpy:
+        monkeypatch.setattr(vector_index, "_numpy_module", False)
+    index = VectorIndex()
+    index.upsert("a", [1, 0], {"tag": "x"})
+    index.upsert("b", [0, 1], {"tag": "y"})
+    index.upsert("c", [0.6, 0.8], {"tag": "x"})
+    assert [doc for _, doc in index.search([1, 0], k=2)] == ["a", "c"]
+    assert [doc for _, doc in index.search([1, 0], k=5, where=lambda p: p["tag"] == "y")] == ["b"]
+    index.delete("a")
+    assert [doc for _, doc in index.search([1, 0], k=1)] == ["c"] and len(index) == 2
+    restored = VectorIndex.from_state(index.export_state())
+    assert [doc for _, doc in restored.search([0, 1], k=2)] == ["b", "c"]
+
+def test_recall_is_scoped_to_the_chat_and_public_data(assets):
+    recall = RecallIndex(embedder=HashingEmbedder(256), path=str(assets / "recall.bin"))
+    recall.refresh()
+    hits = recall.search("como se llama mi perro", k=3, chat_id="42")
+    assert hits[0]["source"] == "history" and "Firulais" in hits[0]["texto"]
+    assert all("Rex" not in h["texto"] for h in hits)
+
+    texts = " ".join(h["texto"] for h in recall.search("velero guitarra destino buga pizza", k=20, chat_id="42"))
+    assert "guitarra" in texts and "Pizza Solar" in texts
+    assert "velero" not in texts and "Buga" not in texts  # perfil privado y grupo ajeno
+    assert any("Buga" in h["texto"] for h in recall.search("destino del viaje", k=3, chat_id="-7"))
+
+def test_upserts_are_incremental_and_persisted(assets):
+    embedder = HashingEmbedder(256)
+    calls = []
+    original = embedder.embed
+    embedder.embed = lambda texts: calls.append(len(texts)) or original(texts)
+    path = str(assets / "recall.bin")
+    recall = RecallIndex(embedder=embedder, path=path)
+    assert recall.refresh() > 0
+    assert recall.refresh() == 0  # Nada cambió: ni lectura ni embeddings
+
+    history = assets / "history" / "42.json"
+    messages = json.loads(history.read_text(encoding="utf-8")) + [{"role": "user", "content": "Nuevo dato: vivo en Cali"}]
+    history.write_text(json.dumps(messages), encoding="utf-8")
+    calls.clear()
+    assert recall.upsert_history("42") is True
+    assert calls == [1]  # Solo el fragmento nuevo
+
+    reloaded = RecallIndex(embedder=HashingEmbedder(256), path=path)
+    reloaded._ensure_loaded()
+    assert len(reloaded.index) == len(recall.index)
+
+def test_search_never_touches_sources_and_writes_are_indexed_incrementally(assets, monkeypatch):
+    recall = RecallIndex(embedder=HashingEmbedder(256), path=str(assets / "recall.bin"))
+    recall.refresh()
+    (assets / "city" / "buga.ledger").write_text(json.dumps({"buga": {"atractivos_culturales": [
+        {"nombre": "Basílica del Señor de los Milagros"}]}}), encoding="utf-8")
+
+    monkeypatch.setattr(recall, "refresh", lambda: pytest.fail("la consulta no debe refrescar"))
+    assert not any("Basílica" in h["texto"] for h in recall.search("basílica milagros", k=3))
+    assert recall.upsert_source("city", "buga") is True
+    assert "Basílica" in recall.search("basílica milagros", k=1)[0]["texto"]
+
+    (assets / "city" / "buga.ledger").unlink()
+    assert recall.upsert_source("city", "buga") is True
+    assert not any("Basílica" in h["texto"] for h in recall.search("basílica milagros", k=3))
+
+def test_index_file_is_written_once_per_batch(assets, monkeypatch):
+    import src.core.recall_index as recall_module
+    submitted = []
+    fake_jobs = type("Jobs", (), {"running": True, "submit": lambda self, fn, *a, key=None, priority=None: submitted.append(key)})()
+    monkeypatch.setattr(recall_module, "background_jobs", fake_jobs)
+    recall = RecallIndex(embedder=HashingEmbedder(256), path=str(assets / "recall.bin"))
+    saves = []
+    monkeypatch.setattr(recall, "_save", lambda: saves.append(1))
+
+    recall.refresh()
+    recall.upsert_source("history", "42")  # sin cambios: no ensucia
+    history = assets / "history" / "99.json"
+    history.write_text(json.dumps([{"role": "user", "content": "otro mensaje"}]), encoding="utf-8")
+    recall.upsert_source("history", "99")
+    assert saves == [] and set(submitted) == {"recall:flush"}  # el pool coalesce las escrituras en cola
+    assert recall.flush() is True and recall.flush() is False
+    assert saves == [1]
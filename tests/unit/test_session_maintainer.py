@@ -0,0 +1,58 @@
+import json
+import pytest
+from unittest.mock import MagicMock
+import src.core.persistence.extractor as extractor
+import src.core.persistence.session_maintainer as session_maintainer
+from src.core.persistence.session_maintainer import SessionMaintainer, validate_maintenance_output
+from src.core.persistence.history_manager import HistoryManager
+
+def _client(payload):
+    client = MagicMock()
+    response = MagicMock()
+    response.choices[0].message.content = json.dumps(payload)
+    client.chat.completions.create.return_value = response
+    return client
+
+@pytest.fixture
+def store(monkeypatch, tmp_path):
+    monkeypatch.setattr(extractor, "WATERMARKS_PATH", str(tmp_path / "watermarks.json"))
+    data = {"chat": [
+        {"role": "user", "content": "hola"},
+        {"role": "user", "content": "me encanta la pizza de Pizza Solar en Cali"},
+        {"role": "assistant", "content": "ok"},
+    ]}
+    monkeypatch.setattr(HistoryManager, "load_history", staticmethod(lambda cid, limit=100: list(data[cid])))
+    monkeypatch.setattr(HistoryManager, "save_history", staticmethod(lambda cid, msgs, limit=100: data.__setitem__(cid, list(msgs))))
+    applied = []
+    monkeypatch.setattr(session_maintainer, "apply_intelligence", applied.append)
+    data["applied"] = applied
+    return data
+
+def test_single_call_applies_facts_and_consolidates(store):
+    client = _client({
+        "user_updates": [],
+        "city_updates": [{"city": "cali", "updates": {"experiencias_gastronomicas": [{"nombre": "Pizza Solar"}]}}],
+        "keep_indices": [1],
+    })
+    assert SessionMaintainer(client).maintain("chat")
+    assert client.chat.completions.create.call_count == 1
+    assert store["chat"] == [{"role": "user", "content": "me encanta la pizza de Pizza Solar en Cali"}]
+    assert store["applied"][0]["city_updates"][0]["city"] == "cali"
+
+    # Sin mensajes nuevos no hay segunda llamada
+    SessionMaintainer(client).maintain("chat")
+    assert client.chat.completions.create.call_count == 1
+
+def test_invalid_indices_keep_history(store):
+    client = _client({"user_updates": "x", "city_updates": [{"city": 3}], "keep_indices": ["0"]})
+    assert SessionMaintainer(client).maintain("chat")
+    assert len(store["chat"]) == 3
+    assert store["applied"][0] == {"user_updates": [], "city_updates": []}
+
+def test_validation_rules():
+    intel, keep = validate_maintenance_output({"keep_indices": [2, 0, 2, 99, -1]}, 3)
+    assert keep == [0, 2]
+    assert validate_maintenance_output({"keep_indices": []}, 3)[1] is None
+    assert validate_maintenance_output({"keep_indices": [True]}, 3)[1] is None
+    with pytest.raises(ValueError):
+        validate_maintenance_output([1, 2], 3)
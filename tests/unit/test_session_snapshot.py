@@ -0,0 +1,51 @@
+import json
+import pytest
+from src.core.persistence.history_manager import HistoryManager
+from src.core.persistence.session_snapshot import SessionSnapshot, write_session_snapshot
+
+@pytest.fixture
+def history_dir(tmp_path, monkeypatch):
+    hist = tmp_path / "history"
+    hist.mkdir()
+    monkeypatch.setattr("src.core.persistence.history_manager.HISTORY_DIR", str(hist))
+    for chat in ("1", "2"):
+        (hist / f"{chat}.json").write_text(json.dumps([{"role": "user", "content": f"hola {chat}"}]), encoding="utf-8")
+    return hist
+
+def build(chat_id):
+    return [{"role": "system", "content": f"prompt {chat_id}"}, {"role": "user", "content": f"hola {chat_id}"}]
+
+def test_round_trip_is_lazy_and_one_shot(tmp_path, history_dir):
+    path = str(tmp_path / "snap.bin")
+    assert write_session_snapshot(["1", "2"], build, "fp", path=path) == 2
+    snapshot = SessionSnapshot.open("fp", path=path)
+    assert len(snapshot) == 2 and "1" in snapshot
+    assert snapshot.take("1") == build("1")
+    assert snapshot.take("1") is None  # Cada sesión se entrega una sola vez
+    assert "2" in snapshot
+    snapshot.close()
+
+def test_changed_history_invalidates_the_entry(tmp_path, history_dir):
+    path = str(tmp_path / "snap.bin")
+    write_session_snapshot(["1", "2"], build, "fp", path=path)
+    (history_dir / "2.json").write_text(json.dumps([{"role": "user", "content": "otra cosa más larga"}]), encoding="utf-8")
+    snapshot = SessionSnapshot.open("fp", path=path)
+    assert snapshot.take("1") == build("1")
+    assert snapshot.take("2") is None
+
+def test_memory_written_after_snapshot_invalidates_the_entry(tmp_path, history_dir):
+    path = str(tmp_path / "snap.bin")
+    write_session_snapshot(["1", "2"], build, "fp", path=path)
+    # Un trabajo de fondo resumió mensajes desalojados del chat 2 tras el snapshot
+    HistoryManager.add_summary("2", "resumen nuevo", consumed=0)
+    snapshot = SessionSnapshot.open("fp", path=path)
+    assert snapshot.take("1") == build("1")
+    assert snapshot.take("2") is None
+
+def test_prompt_or_format_change_discards_the_snapshot(tmp_path, history_dir):
+    path = tmp_path / "snap.bin"
+    write_session_snapshot(["1"], build, "fp", path=str(path))
+    assert SessionSnapshot.open("otro-prompt", path=str(path)) is None
+    path.write_bytes(b"XXXXXX" + path.read_bytes()[6:])
+    assert SessionSnapshot.open("fp", path=str(path)) is None
+    assert SessionSnapshot.open("fp", path=str(tmp_path / "missing.bin")) is None
@@ -0,0 +1,37 @@
+import time
+from src.core.skill_manager import SkillManager, request_skill_activation, skill_manager
+from src.core.models import Message
+
+def names(bundle):
+    return {t["function"]["name"] for t in bundle}
+
+def test_skills_are_scoped_per_chat():
+    manager = SkillManager(idle_seconds=60)
+    assert manager.activate_skill("utility", chat_id="a")
+    in_a, in_b = names(manager.get_tool_list("a")), names(manager.get_tool_list("b"))
+    assert {"datetime", "read_city_info", "request_skill_activation"} <= in_a
+    assert "request_skill_activation" in in_b
+    assert not in_b & {"datetime", "read_city_info"}
+
+def test_same_skill_set_reuses_the_same_bundle():
+    manager = SkillManager(idle_seconds=60)
+    manager.activate_skill("utility", chat_id="a")
+    manager.activate_skill("utility", chat_id="b")
+    assert manager.get_tool_list("a") is manager.get_tool_list("b")
+
+def test_idle_skills_are_deactivated_and_tool_use_keeps_them_alive():
+    manager = SkillManager(idle_seconds=0.1)
+    manager.activate_skill("utility", chat_id="a")
+    manager.activate_skill("utility", chat_id="b")
+    time.sleep(0.06)
+    manager.note_tool_use("a", "datetime")
+    time.sleep(0.06)
+    assert manager.skills_for("a") == ["utility"]
+    assert manager.skills_for("b") == []
+    assert "datetime" not in names(manager.get_tool_list("b"))
+
+def test_activation_tool_uses_the_message_chat():
+    msg = Message(priority=2, content="x", source="telegram", user_id="7", chat_id="7")
+    assert "activado con éxito" in request_skill_activation(skill_name="system", context=msg)
+    assert "system" in skill_manager.skills_for("7")
+    assert "list_active_chats" in names(skill_manager.get_tool_list("7"))
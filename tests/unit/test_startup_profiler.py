@@ -0,0 +1,31 @@
+from src.core.startup_profiler import parse_importtime, attribute_imports, profile_startup
+
+SAMPLE = """import time: self [us] | cumulative | imported package
+import time:       100 |        100 |     pydantic_core
+import time:       400 |        500 |   openai
+import time:       200 |        700 | src.core.llm_gateway
+import time:        50 |         50 |   json
+import time:        30 |        780 | main
+import time:        10 |         10 | src.tools.city_tools
+"""
+
+def test_parse_builds_the_import_tree():
+    roots = parse_importtime(SAMPLE)
+    assert [r["module"] for r in roots] == ["src.core.llm_gateway", "main", "src.tools.city_tools"]
+    gateway = roots[0]
+    assert gateway["children"][0]["module"] == "openai"
+    assert gateway["children"][0]["children"][0]["module"] == "pydantic_core"
+
+def test_external_imports_are_attributed_to_the_project_module_that_caused_them():
+    imports = attribute_imports(parse_importtime(SAMPLE))
+    assert imports["by_module"]["src.core.llm_gateway"] == 0.7
+    assert imports["by_package"] == {"src.core": 0.7, "main": 0.08, "src.tools": 0.01}
+    assert imports["external"] == {"openai": 0.4, "pydantic_core": 0.1, "json": 0.05}
+    assert imports["total_ms"] == 0.79
+
+def test_end_to_end_report_is_machine_readable():
+    report = profile_startup(budget_ms=60000)
+    assert report["budget"]["ok"]
+    assert report["tool_registry"]["tools"] > 0
+    assert report["first_message"]["processing_ms"] >= 0
+    assert "src.core" in report["imports"]["by_package"]
@@ -0,0 +1,32 @@
+import pytest
+from src.core import tool_encoding
+from src.core.tool_encoding import ToolResultEncoder, estimate_tokens
+
+@pytest.fixture(params=[True, False], ids=["orjson", "json"])
+def encoder(request, monkeypatch):
+    if request.param and not tool_encoding.ORJSON_AVAILABLE:
+        pytest.skip("orjson no instalado")
+    monkeypatch.setattr(tool_encoding, "ORJSON_AVAILABLE", request.param)
+    return ToolResultEncoder(omit_empty=False)
+
+def test_dicts_become_compact_json_instead_of_repr(encoder):
+    assert encoder.encode("datetime", {"hora": "10:00", "ok": True}) == '{"hora":"10:00","ok":true}'
+
+def test_plain_text_and_other_types(encoder):
+    assert encoder.encode("x", "hola {mundo") == "hola {mundo"
+    assert encoder.encode("x", "{roto") == "{roto"
+    assert encoder.encode("x", '{"texto": 1}') == '{"texto": 1}'
+    assert encoder.encode("x", 42) == "42"
+
+def test_optional_empty_omission_and_key_aliases():
+    encoder = ToolResultEncoder(omit_empty=True, key_aliases={"description": "desc"})
+    result = {"description": "d", "extra": None, "items": [{"tags": [], "n": 0}]}
+    assert encoder.encode("x", result) == '{"desc":"d","items":[{"n":0}]}'
+
+def test_counts_tokens_per_tool():
+    encoder = ToolResultEncoder(omit_empty=False)
+    encoder.encode("web_search", {"results": ["a" * 40]})
+    encoder.encode("web_search", "texto")
+    stats = encoder.stats()["web_search"]
+    assert stats["calls"] == 2
+    assert stats["tokens"] == estimate_tokens('{"results":["' + "a" * 40 + '"]}') + estimate_tokens("texto")
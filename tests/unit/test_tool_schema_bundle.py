@@ -0,0 +1,40 @@
+import json
+from src.tools.registry import ToolRegistry
+from src.core.llm_cache import make_cache_key
+
+SCHEMA = {"description": "Herramienta de prueba con una descripción larga en español.",
+          "parameters": {"type": "object", "properties": {}}}
+
+def alpha():
+    pass
+
+def beta():
+    pass
+
+def test_bundle_is_reused_until_register_tool():
+    registry = ToolRegistry()
+    registry.register_tool(alpha, SCHEMA)
+    bundle = registry.get_tool_list()
+    assert registry.get_tool_list() is bundle
+    assert bundle.size_bytes == len(json.dumps(list(bundle), ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+
+    registry.register_tool(beta, SCHEMA)
+    updated = registry.get_tool_list()
+    assert updated is not bundle
+    assert [t["function"]["name"] for t in updated] == ["alpha", "beta"]
+    assert registry.schema_version == updated.version != bundle.version
+
+def test_version_depends_only_on_content():
+    first, second = ToolRegistry(), ToolRegistry()
+    first.register_tool(alpha, SCHEMA)
+    second.register_tool(alpha, SCHEMA)
+    assert first.schema_version == second.schema_version
+
+def test_cache_key_uses_bundle_version():
+    registry = ToolRegistry()
+    registry.register_tool(alpha, SCHEMA)
+    bundle = registry.get_tool_list()
+    request = {"model": "m", "messages": [], "tools": bundle}
+    assert make_cache_key(request) == make_cache_key({**request, "tools": registry.get_tool_list()})
+    registry.register_tool(beta, SCHEMA)
+    assert make_cache_key(request) != make_cache_key({**request, "tools": registry.get_tool_list()})
@@ -0,0 +1,46 @@
+import json
+import os
+import pytest
+import src.tools.user_tools as user_tools
+from src.core.persistence.user_index import UserIndex
+
+@pytest.fixture
+def index(tmp_path, monkeypatch):
+    for stem in ("juan.perez", "juan.perez.1", "ana.gomez", "template"):
+        (tmp_path / f"{stem}.ledger").write_text(json.dumps({
+            "public_profile": {"name": stem},
+            "private_profile": {"secret": "s"}
+        }), encoding="utf-8")
+    idx = UserIndex(str(tmp_path), poll_seconds=0)
+    monkeypatch.setattr(user_tools, "user_index", idx)
+    return idx
+
+def test_list_users_excludes_template(index):
+    assert user_tools.list_users() == {"usuarios": ["ana.gomez", "juan.perez", "juan.perez.1"]}
+
+def test_homonym_slot_without_probing(index, monkeypatch):
+    monkeypatch.setattr(os.path, "exists", lambda p: pytest.fail("no debería sondear el disco"))
+    assert index.reserve_filename("juan.perez") == "juan.perez.2"
+    assert index.reserve_filename("luis.diaz") == "luis.diaz"
+
+def test_add_user_registers_in_index(index):
+    result = user_tools.add_user("Juan", "Pérez", "123")
+    assert result["success"]
+    assert "juan.pérez" in user_tools.list_users()["usuarios"]
+
+def test_public_profile_cached_until_update(index):
+    assert index.get_public_profile("ana.gomez") == {"name": "ana.gomez"}
+    with open(index.entries["ana.gomez"], "w", encoding="utf-8") as f:
+        f.write("{}")
+    # Cambio externo sin polling: se sigue sirviendo desde la caché
+    assert index.get_public_profile("ana.gomez") == {"name": "ana.gomez"}
+
+    user_tools.update_user_info("ana.gomez", json.dumps({"public_profile": {"location": "Cali"}}))
+    assert index.get_public_profile("ana.gomez") == {"location": "Cali"}
+
+def test_mtime_polling_detects_external_files(tmp_path):
+    idx = UserIndex(str(tmp_path), poll_seconds=0.000001)
+    assert idx.list_users() == []
+    (tmp_path / "nuevo.usuario.ledger").write_text("{}", encoding="utf-8")
+    os.utime(tmp_path, ns=(1, 1))
+    assert idx.list_users() == ["nuevo.usuario"]
@@ -27,17 +27,15 @@ def test_import_and_registration():
     print("✅ web_tools registration test passed")
     return True
 
-def test_web_search_returns_json():
-    """Test that web_search returns a valid JSON string (even if error due to missing deps)."""
+def test_web_search_returns_dict():
+    """Test that web_search returns a dict (even if error due to missing deps)."""
     from src.tools.web_tools import web_search
-    import json
     result = web_search("test query")
-    # Should be a JSON string
-    parsed = json.loads(result)
-    assert isinstance(parsed, dict)
+    # The tool result encoder serializes it for the LLM
+    assert isinstance(result, dict)
     # Either contains 'results' or 'error'
-    assert 'results' in parsed or 'error' in parsed
-    print("✅ web_search returns valid JSON")
+    assert 'results' in result or 'error' in result
+    print("✅ web_search returns a dict")
 
 def test_read_url_returns_json():
     """Test that read_url returns a valid JSON string."""
@@ -128,7 +126,7 @@ def test_telegram_send_document_with_mock():
 if __name__ == '__main__':
     try:
         test_import_and_registration()
-        test_web_search_returns_json()
+        test_web_search_returns_dict()
         test_read_url_returns_json()
         test_telegram_send_document_registration()
         test_telegram_send_document_with_mock()